@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+
+from core.batch_runner import BatchRunner, load_rooms
+from core.export import GeoJsonWriter, GraphMLWriter
+from core.projection import LocalProjection
+from core.room_profiler import SlowRoomProfiler
+from core.std_vals import *
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Calculates the navigation paths for a batch of rooms.')
+    parser.add_argument('inputs', nargs='+', help='JSON / JSON lines files or directories of rooms')
+    parser.add_argument('-o', '--output', help='output file for the results (default: standard output)')
+    parser.add_argument('-f', '--format', choices=['jsonl', 'geojson', 'graphml'], default='jsonl',
+                        help='JSON lines of the results, newline-delimited GeoJSON, or GraphML of the nav graphs')
+    parser.add_argument('--origin', type=float, nargs=2, metavar=('LON', 'LAT'),
+                        help='WGS84 origin of the local frame of the rooms, to write GeoJSON in WGS84')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-t', '--timeout', type=float, help='time limit per room in seconds')
+    parser.add_argument('--nat-dist', type=float, default=natural_distance, help='natural distance in meters')
+    parser.add_argument('--sharp-angle', type=float, default=double_corner_points_angle, help='sharp angle in degree')
+    parser.add_argument('--tile-size', type=float, help='tile size in meters for very large rooms')
+    parser.add_argument('--backend', help='geometry backend (python, shapely, or numpy)')
+    parser.add_argument('--memory-budget', type=int, help='memory budget in bytes for the nav edges of a room')
+    parser.add_argument('--nearest', type=int, help='number of nearest nav points per sector for quick previews')
+    parser.add_argument('--split-virtual', action='store_true',
+                        help='split self-intersecting virtual polygons and fail on cut off doors')
+    parser.add_argument('--profile-dir', help='directory to capture and profile slow rooms in')
+    parser.add_argument('--profile-threshold', type=float, default=10.,
+                        help='time in seconds above which a room is captured (with --profile-dir)')
+    parser.add_argument('--profile', choices=['sample', 'cprofile', 'none'], default='sample',
+                        help='profiling mode of the rooms, whose profiles are saved for slow rooms: sampled stacks '
+                             'with little overhead, or cProfile, which slows every room down (with --profile-dir)')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    rooms = [room for path in args.inputs for room in load_rooms(path)]
+    options = {}
+    if args.tile_size is not None:
+        options['tile_size'] = args.tile_size
+    if args.backend is not None:
+        options['backend'] = args.backend
+    if args.memory_budget is not None:
+        options['memory_budget'] = args.memory_budget
+    if args.nearest is not None:
+        options['nearest'] = args.nearest
+    if args.split_virtual:
+        options['split_virtual'] = True
+    profiler = None
+    if args.profile_dir:
+        profiler = SlowRoomProfiler(args.profile_dir, args.profile_threshold,
+                                    profile=None if args.profile == 'none' else args.profile)
+    runner = BatchRunner(args.nat_dist, args.sharp_angle, args.workers, args.timeout, profiler, **options)
+
+    output = open(args.output, 'w', buffering=1 << 20) if args.output else sys.stdout
+    try:
+        if args.format == 'jsonl':
+            summary = runner.run(rooms, output)
+        else:
+            if args.format == 'geojson':
+                projection = LocalProjection(*args.origin) if args.origin is not None else None
+                writer = GeoJsonWriter(output, projection=projection)
+            else:
+                writer = GraphMLWriter(output)
+            with writer:
+                summary = runner.run(rooms, writer)
+    finally:
+        if args.output:
+            output.close()
+    print(f'Finished {len(rooms)} rooms:', ', '.join(f'{count} {status}' for status, count in summary.items()),
+          file=sys.stderr)
+    return 0 if summary['error'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
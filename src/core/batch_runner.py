@@ -0,0 +1,300 @@
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Optional, TextIO, Union
+
+from core.edge_store import EdgeStore
+from core.export import RoomWriter
+from core.room import Room
+from core.room_profiler import SlowRoomProfiler
+from core.room_paths import RoomPaths
+
+
+class RoomTimeout(Exception):
+    """
+    Raised in a worker when a room takes longer than its time limit.
+    """
+
+
+def estimate_cost(room: Room) -> float:
+    """
+    Estimates the relative cost of `find_paths` for a room before its virtualization.
+
+    The nav points are the doors plus the reflex corners (inner corners of the boundary, outer corners of the
+    barriers). Each of their pairs is checked against every wall edge.
+    """
+    reflex_corners = sum(1 for corner in room.boundary.corners if corner.angle > 180)
+    reflex_corners += sum(1 for barrier in room.barriers for corner in barrier.corners if corner.angle > 180)
+    nav_points = reflex_corners + len(room.doors)
+    walls = len(room.boundary.edges) + sum(len(barrier.edges) for barrier in room.barriers)
+    return nav_points ** 2 * walls
+
+
+def load_rooms(path: str) -> list[tuple[str, dict]]:
+    """
+    Loads the rooms (as dictionaries of `Room.to_dict`) with an id from a JSON file, a JSON lines file, or a directory
+    of such files. A JSON file may contain a single room or a list of rooms.
+    """
+    if os.path.isdir(path):
+        rooms = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.json') or name.endswith('.jsonl'):
+                rooms += load_rooms(os.path.join(path, name))
+        return rooms
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(path) as file:
+        if path.endswith('.jsonl'):
+            data = [json.loads(line) for line in file if line.strip()]
+        else:
+            data = json.load(file)
+    if isinstance(data, dict):
+        return [(data.get('id', stem), data)]
+    return [(room.get('id', f'{stem}-{i}'), room) for i, room in enumerate(data)]
+
+
+def _raise_timeout(signum, frame):
+    raise RoomTimeout()
+
+
+def _write_paths_file(room: Room) -> str:
+    """
+    Writes the results of `find_paths` of a room to a new temporary JSON file and returns its path.
+    """
+    handle, path = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(handle, 'w') as file:
+            room.write_paths(file)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def run_room(room_id: str, room_data: dict, nat_dist: float, sharp_angle: float,
+             timeout: Optional[float] = None, profiler: Optional[SlowRoomProfiler] = None, **options) -> dict:
+    """
+    Runs `find_paths` for a room given as dictionary and returns the result as dictionary.
+
+    The time limit is enforced by an alarm signal where the platform supports it (SIGALRM). Signals are only handled
+    on the main thread of a process, so the time limit is ignored when this runs on another thread; the worker
+    processes of `BatchRunner` run it on their main thread.
+    If a profiler is given, rooms above its threshold are captured, with the profile of this run in its profiling
+    mode (timed out rooms with the profile up to the time limit).
+
+    If the nav_edges are kept in an `EdgeStore` (with a memory budget), the results are written chunk by chunk to a
+    temporary JSON file instead, and its path is returned as `paths_file` (see `BatchRunner.run`).
+    """
+    start = time.perf_counter()
+    use_alarm = timeout is not None and hasattr(signal, 'SIGALRM') and \
+        threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    profile = None
+    result = None
+    try:
+        try:
+            # the alarm is set inside, so that even a time limit that runs out at once is reported as timeout
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            room = Room.from_dict(room_data)
+            with profiler.profiling() if profiler is not None else nullcontext() as profile:
+                room.find_paths(nat_dist, sharp_angle, **options)
+            if isinstance(room.nav_edges, EdgeStore):
+                result = {'id': room_id, 'status': 'ok', 'paths_file': _write_paths_file(room)}
+            else:
+                result = {'id': room_id, 'status': 'ok', 'paths': room.paths_to_dict()}
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        finally:
+            # the alarm may go off after the last statement, it is then caught as timeout below
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except RoomTimeout:
+        if result is not None and 'paths_file' in result:
+            os.remove(result['paths_file'])
+        result = {'id': room_id, 'status': 'timeout'}
+    except Exception as error:
+        result = {'id': room_id, 'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous_handler)
+    result['seconds'] = time.perf_counter() - start
+    if profiler is not None and result['status'] != 'error' and result['seconds'] > profiler.threshold:
+        result['capture'] = profiler.capture(Room.from_dict(room_data), room_id, nat_dist, sharp_angle,
+                                             result['seconds'], profile, **options)
+    return result
+
+
+def compute_paths_threaded(rooms: list[Room], nat_dist: float, sharp_angle: float, workers: Optional[int] = None,
+                           **options) -> list[RoomPaths]:
+    """
+    Calculates the results of `find_paths` for many rooms on a pool of threads, without modifying the rooms (see
+    `Room.compute_paths`), and returns them in the order of the rooms.
+
+    Unlike `BatchRunner`, the rooms are neither pickled nor copied to other processes. The threads only run in
+    parallel on free-threaded Python builds or while a geometry backend releases the GIL. The first error of a room
+    is raised, and no time limit is enforced.
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda room: room.compute_paths(nat_dist, sharp_angle, **options), rooms))
+
+
+class BatchRunner:
+    """
+    A class to run `find_paths` for many rooms on a pool of worker processes.
+
+    The rooms are started from the most to the least expensive one (see `estimate_cost`), so that no expensive room
+    is left running alone at the end of a batch. Results are streamed to the output as soon as they are finished.
+    Rooms are tracked by their position, so that rooms with equal ids are all run. If a worker process dies (e.g. it
+    runs out of memory), the rooms that were still pending get an error result.
+
+    Args
+    ----
+    nat_dist : float
+        The natural distance passed to `find_paths`.
+    sharp_angle : float
+        The sharp angle passed to `find_paths`.
+    workers : int
+        The number of worker processes.
+    timeout : float, optional
+        The time limit per room in [seconds].
+    profiler : SlowRoomProfiler, optional
+        The profiler that captures slow rooms and keeps the slowest ones.
+    options : dict
+        Further keyword options passed to `find_paths`.
+
+    Attributes
+    ----------
+    nat_dist : float
+        The natural distance passed to `find_paths`.
+    sharp_angle : float
+        The sharp angle passed to `find_paths`.
+    workers : int
+        The number of worker processes.
+    timeout : float, optional
+        The time limit per room in [seconds].
+    profiler : SlowRoomProfiler, optional
+        The profiler that captures slow rooms and keeps the slowest ones.
+    options : dict
+        Further keyword options passed to `find_paths`.
+    """
+
+    def __init__(self, nat_dist: float, sharp_angle: float, workers: int = 1, timeout: Optional[float] = None,
+                 profiler: Optional[SlowRoomProfiler] = None, **options):
+        self.nat_dist: float = nat_dist
+        self.sharp_angle: float = sharp_angle
+        self.workers: int = workers
+        self.timeout: Optional[float] = timeout
+        self.profiler: Optional[SlowRoomProfiler] = profiler
+        self.options: dict = options
+
+    def schedule(self, rooms: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        """
+        Orders the rooms from the most to the least expensive one.
+        """
+        costs = []
+        for room_id, room_data in rooms:
+            try:
+                costs.append(estimate_cost(Room.from_dict(room_data)))
+            except Exception:
+                # corrupted rooms fail fast in the workers anyway
+                costs.append(0.)
+        return [rooms[i] for i in sorted(range(len(rooms)), key=lambda i: costs[i], reverse=True)]
+
+    def _results(self, rooms: list[tuple[str, dict]]):
+        """
+        Yields the data and the result of all rooms as soon as they are finished.
+        """
+        arguments = (self.nat_dist, self.sharp_angle, self.timeout, self.profiler)
+        if self.workers <= 1:
+            for room_id, room_data in rooms:
+                try:
+                    result = run_room(room_id, room_data, *arguments, **self.options)
+                except Exception as error:
+                    result = {'id': room_id, 'status': 'error', 'seconds': 0.,
+                              'error': f'{type(error).__name__}: {error}'}
+                yield room_data, result
+            return
+        with ProcessPoolExecutor(self.workers) as executor:
+            futures = {executor.submit(run_room, room_id, room_data, *arguments, **self.options): (room_id, room_data)
+                       for room_id, room_data in rooms}
+            for future in as_completed(futures):
+                room_id, room_data = futures[future]
+                # a broken pool or any other failure of a worker only fails its room, not the batch
+                try:
+                    result = future.result()
+                except Exception as error:
+                    result = {'id': room_id, 'status': 'error', 'seconds': 0.,
+                              'error': f'{type(error).__name__}: {error}'}
+                yield room_data, result
+
+    def _write_result(self, output: Union[TextIO, RoomWriter], room_data: dict, result: dict):
+        """
+        Writes the result of a room to the output (see `run`).
+
+        Results written to a file by the worker (see `run_room`) are copied chunk by chunk to a text output, and the
+        file is deleted afterwards.
+        """
+        paths_file = result.pop('paths_file', None)
+        try:
+            if not isinstance(output, RoomWriter):
+                if paths_file is None:
+                    output.write(json.dumps(result) + '\n')
+                    return
+                # the results are inserted as the last key of the JSON line
+                output.write(json.dumps(result)[:-1] + ', "paths": ')
+                with open(paths_file) as file:
+                    shutil.copyfileobj(file, output)
+                output.write('}\n')
+            elif result['status'] == 'ok':
+                room = Room.from_dict(room_data)
+                if paths_file is None:
+                    room.restore_paths(result['paths'])
+                else:
+                    with open(paths_file) as file:
+                        room.restore_paths(json.load(file), self.options.get('memory_budget'))
+                output.write_room(room, str(result['id']))
+        finally:
+            if paths_file is not None:
+                os.remove(paths_file)
+
+    def run(self, rooms: list[tuple[str, dict]], output: Union[TextIO, RoomWriter],
+            progress: Optional[TextIO] = sys.stderr, progress_interval: float = 1.) -> dict[str, int]:
+        """
+        Runs all rooms, writes each result to the output, and reports the progress.
+
+        The output is either a text file, to which each result is written as JSON line, or a room writer of
+        `core.export`, to which each finished room is written (failed rooms are only counted).
+
+        If the runner has a profiler, the slow rooms are captured in the workers and the summary of the slowest rooms
+        is written at the end (see `SlowRoomProfiler`).
+
+        Returns the number of rooms per result status.
+        """
+        rooms = self.schedule(rooms)
+        summary = {'ok': 0, 'timeout': 0, 'error': 0}
+        start = last_report = time.perf_counter()
+        for done, (room_data, result) in enumerate(self._results(rooms), 1):
+            self._write_result(output, room_data, result)
+            summary[result['status']] += 1
+            if self.profiler is not None:
+                self.profiler.record(result['id'], result['seconds'])
+            now = time.perf_counter()
+            if progress is not None and (now - last_report >= progress_interval or done == len(rooms)):
+                last_report = now
+                progress.write(f'{done}/{len(rooms)} rooms, {done / (now - start):.1f} rooms/s, '
+                               f'{summary["timeout"]} timeouts, {summary["error"]} errors\n')
+                progress.flush()
+        if not isinstance(output, RoomWriter):
+            output.flush()
+        if self.profiler is not None:
+            self.profiler.write_summary()
+        return summary
@@ -0,0 +1,463 @@
+import math
+from typing import Optional
+
+from core.closures import ClosureLayer
+from core.nav_graph import NavGraph
+from core.point import Point
+from core.polygon import Polygon
+from core.room import Room
+from core.std_vals import *
+
+
+class Floor:
+    """
+    A class to represent a floor of a building with its rooms.
+
+    Rooms on the same floor are connected by the doors they share (doors within `door_tolerance` of each other).
+
+    Args
+    ----
+    level : int
+        The level of the floor.
+    rooms : list[Room]
+        The rooms on the floor.
+
+    Attributes
+    ----------
+    level : int
+        The level of the floor.
+    rooms : list[Room]
+        The rooms on the floor.
+    """
+
+    def __init__(self, level: int, rooms: list[Room]):
+        self.level: int = level
+        self.rooms: list[Room] = rooms
+
+    def __repr__(self) -> str:
+        return f'Floor {self.level}: {len(self.rooms)} rooms'
+
+
+class Connector:
+    """
+    A class to represent a vertical connection like stairs or an elevator between doors on two floors.
+
+    Args
+    ----
+    kind : str
+        The kind of the connection, e.g. 'stairs' or 'elevator'.
+    level1 : int
+        The level of the first floor.
+    door1 : Point
+        The door on the first floor.
+    level2 : int
+        The level of the second floor.
+    door2 : Point
+        The door on the second floor.
+    cost : float
+        The cost of using the connection in [meter] of walking distance.
+
+    Attributes
+    ----------
+    kind : str
+        The kind of the connection, e.g. 'stairs' or 'elevator'.
+    level1 : int
+        The level of the first floor.
+    door1 : Point
+        The door on the first floor.
+    level2 : int
+        The level of the second floor.
+    door2 : Point
+        The door on the second floor.
+    cost : float
+        The cost of using the connection in [meter] of walking distance.
+    """
+
+    def __init__(self, kind: str, level1: int, door1: Point, level2: int, door2: Point, cost: float):
+        self.kind: str = kind
+        self.level1: int = level1
+        self.door1: Point = door1
+        self.level2: int = level2
+        self.door2: Point = door2
+        self.cost: float = cost
+
+    def __repr__(self) -> str:
+        return f'{self.kind}: {self.level1}{self.door1} -- {self.level2}{self.door2}'
+
+
+class Building:
+    """
+    A class to represent a building with several floors that are connected by stairs and elevators.
+
+    Routing uses a two level hierarchy. Every room has its own exact navigation graph. On top of that, the overlay
+    graph only consists of the doors and connectors, connected by the precomputed shortest distances through the rooms.
+    A query only searches the rooms it starts and ends in and the overlay graph in between.
+
+    Doors, connectors, and zones can be closed temporarily (see `core.closures`). A closure only masks the affected
+    nodes and edges and updates the overlay distances of the rooms it touches, nothing is rebuilt.
+
+    Args
+    ----
+    floors : list[Floor]
+        The floors of the building. Their rooms must have been processed by `find_paths`.
+    connectors : list[Connector]
+        The vertical connections between the floors.
+
+    Attributes
+    ----------
+    floors : dict[int, Floor]
+        The floors of the building by level.
+    connectors : list[Connector]
+        The vertical connections between the floors.
+    overlay : NavGraph
+        The graph connecting all doors of the building.
+    overlay_levels : list[int]
+        The level of every overlay node.
+    closures : ClosureLayer
+        The temporary closures of the overlay graph.
+    """
+
+    def __init__(self, floors: list[Floor], connectors: list[Connector]):
+        self.floors: dict[int, Floor] = {floor.level: floor for floor in floors}
+        self.connectors: list[Connector] = connectors
+        self.overlay: NavGraph = NavGraph([], [])
+        self.overlay_levels: list[int] = []
+        # the overlay nodes in every cell (level and position) of a grid with the door tolerance as cell size
+        self._door_cells: dict[tuple[int, int, int], list[int]] = {}
+        self._overlay_origins: list[tuple] = []
+        self._room_graphs: dict[tuple[int, int], NavGraph] = {}
+        self._room_overlay_edges: dict[tuple[int, int], list[int]] = {}
+        self._build_overlay()
+        self.closures: ClosureLayer = ClosureLayer(self.overlay)
+        self._room_closures: dict[tuple[int, int], ClosureLayer] = {}
+        self._closures: dict[int, tuple[list[tuple[ClosureLayer, int]], list[tuple[int, int]]]] = {}
+        self._next_closure: int = 0
+
+    def __repr__(self) -> str:
+        return f'Building: {len(self.floors)} floors, {len(self.connectors)} connectors, overlay {self.overlay}'
+
+    @staticmethod
+    def _door_cell(level: int, door: Point) -> tuple[int, int, int]:
+        """
+        Returns the grid cell of a door. Doors within `door_tolerance` are in the same or in neighbouring cells.
+        """
+        return level, math.floor(door.x / door_tolerance), math.floor(door.y / door_tolerance)
+
+    def _find_overlay_node(self, level: int, door: Point) -> Optional[int]:
+        """
+        Returns the overlay node of the closest door within `door_tolerance` of a door on a floor, or None if there is
+        none.
+        """
+        _, a, b = self._door_cell(level, door)
+        best_node, best_distance = None, door_tolerance
+        for i in (a - 1, a, a + 1):
+            for j in (b - 1, b, b + 1):
+                for node in self._door_cells.get((level, i, j), ()):
+                    p = self.overlay.points[node]
+                    distance = math.hypot(p.x - door.x, p.y - door.y)
+                    if distance <= best_distance:
+                        best_node, best_distance = node, distance
+        return best_node
+
+    def _overlay_node(self, level: int, door: Point) -> int:
+        """
+        Returns the overlay node of a door.
+
+        Raises a KeyError if the door is no door of a room on the floor.
+        """
+        node = self._find_overlay_node(level, door)
+        if node is None:
+            raise KeyError(f'{door} is no door on level {level}')
+        return node
+
+    def _add_overlay_node(self, level: int, door: Point) -> int:
+        """
+        Returns the overlay node of a door, and creates it if there is none yet.
+        """
+        node = self._find_overlay_node(level, door)
+        if node is None:
+            node = self.overlay.add_point(door)
+            self.overlay_levels.append(level)
+            self._door_cells.setdefault(self._door_cell(level, door), []).append(node)
+        return node
+
+    def _add_overlay_edge(self, u: int, v: int, length: float, origin: tuple):
+        """
+        Connects two overlay nodes and remembers where the connection comes from.
+        """
+        edge = self.overlay.add_edge(u, v, length)
+        self._overlay_origins.append(origin)
+        if origin[0] == 'room':
+            self._room_overlay_edges.setdefault(origin[1:3], []).append(edge)
+
+    def room_graph(self, level: int, room_index: int) -> NavGraph:
+        """
+        Returns the navigation graph of a room.
+        """
+        if (level, room_index) not in self._room_graphs:
+            self._room_graphs[(level, room_index)] = NavGraph.from_room(self.floors[level].rooms[room_index])
+        return self._room_graphs[(level, room_index)]
+
+    def _door_nodes(self, level: int, room_index: int) -> list[int]:
+        """
+        Returns the room graph nodes of the doors of a room.
+        """
+        room = self.floors[level].rooms[room_index]
+        return [len(room.nav_points) + i for i in range(len(room.doors))]
+
+    def _door_distance(self, level: int, room_index: int, door1: int, door2: int) -> float:
+        """
+        Returns the shortest distance between two doors of a room, and calculates the distances if necessary.
+        """
+        room = self.floors[level].rooms[room_index]
+        if room.door_distances is None:
+            room.door_distance_matrix()
+        return room.door_distance(door1, door2)
+
+    def _build_overlay(self):
+        """
+        Connects the doors of every room by their shortest distances, and the doors of different floors by connectors.
+        """
+        for level, floor in self.floors.items():
+            for room_index, room in enumerate(floor.rooms):
+                nodes = [self._add_overlay_node(level, door) for door in room.doors]
+                for i in range(len(nodes) - 1):
+                    for j in range(i + 1, len(nodes)):
+                        distance = self._door_distance(level, room_index, i, j)
+                        if not math.isinf(distance):
+                            self._add_overlay_edge(nodes[i], nodes[j], distance, ('room', level, room_index, i, j))
+        # connectors must end at doors of rooms
+        for connector in self.connectors:
+            self._add_overlay_edge(self._overlay_node(connector.level1, connector.door1),
+                                   self._overlay_node(connector.level2, connector.door2),
+                                   connector.cost, ('connector', connector))
+
+    def _expand_room_leg(self, level: int, room_index: int, door1: int, door2: int) -> list[Point]:
+        """
+        Returns the points of the shortest path between two doors (given by their index) through a room.
+        """
+        room = self.floors[level].rooms[room_index]
+        if (level, room_index) in self._room_closures and self._room_closures[(level, room_index)].closures:
+            # the precomputed paths may be closed
+            graph = self.room_graph(level, room_index)
+            door_nodes = self._door_nodes(level, room_index)
+            _, path = graph.shortest_path(door_nodes[door1], door_nodes[door2])
+            return [graph.points[i] for i in path]
+        if room.door_predecessors is None:
+            room.door_distance_matrix(with_paths=True)
+        return room.door_path(door1, door2)
+
+    def room_closures(self, level: int, room_index: int) -> ClosureLayer:
+        """
+        Returns the temporary closures of the navigation graph of a room.
+        """
+        if (level, room_index) not in self._room_closures:
+            self._room_closures[(level, room_index)] = ClosureLayer(self.room_graph(level, room_index))
+        return self._room_closures[(level, room_index)]
+
+    def _add_closure(self, parts: list[tuple[ClosureLayer, int]], rooms: list[tuple[int, int]]) -> int:
+        """
+        Registers the closures of several graphs as one closure of the building and returns its id.
+        """
+        closure = self._next_closure
+        self._next_closure += 1
+        self._closures[closure] = (parts, rooms)
+        for level, room_index in rooms:
+            self._update_room_distances(level, room_index)
+        return closure
+
+    def _update_room_distances(self, level: int, room_index: int):
+        """
+        Updates the overlay edges of a room to the shortest distances between its doors under the current closures.
+        """
+        graph = self.room_graph(level, room_index)
+        door_nodes = self._door_nodes(level, room_index)
+        distances = {}
+        for edge in self._room_overlay_edges.get((level, room_index), []):
+            u, v, _ = self.overlay.edges[edge]
+            _, _, _, i, j = self._overlay_origins[edge]
+            if i not in distances:
+                distances[i], _ = graph.dijkstra({door_nodes[i]: 0.}, set(door_nodes))
+            self.overlay.edges[edge] = (u, v, distances[i][door_nodes[j]])
+
+    def close_door(self, level: int, door: Point) -> int:
+        """
+        Closes a door (e.g. a fire door) in all rooms sharing it and returns the id of the closure.
+
+        Raises a KeyError if the door is no door on the floor.
+        """
+        node = self._overlay_node(level, door)
+        parts = [(self.closures, self.closures.close(nodes=[node]))]
+        for room_index, room in enumerate(self.floors[level].rooms):
+            doors = [d for d in room.doors if self._find_overlay_node(level, d) == node]
+            if doors:
+                layer = self.room_closures(level, room_index)
+                parts.append((layer, layer.close_points(doors)))
+        return self._add_closure(parts, [])
+
+    def close_connector(self, connector: Connector) -> int:
+        """
+        Closes a connector (e.g. an elevator out of service) and returns the id of the closure.
+        """
+        edges = [e for e, origin in enumerate(self._overlay_origins)
+                 if origin[0] == 'connector' and origin[1] is connector]
+        return self._add_closure([(self.closures, self.closures.close(edges=edges))], [])
+
+    def close_zone(self, level: int, zone: Polygon) -> int:
+        """
+        Closes a polygonal zone on a floor with all nodes and edges of its rooms inside, and returns the id of the
+        closure. The overlay distances of the affected rooms are updated.
+        """
+        parts, rooms, overlay_nodes = [], [], []
+        for room_index, room in enumerate(self.floors[level].rooms):
+            layer = self.room_closures(level, room_index)
+            closure = layer.close_zone(zone)
+            nodes, edges = layer.closures[closure]
+            if not nodes and not edges:
+                layer.lift(closure)
+                continue
+            parts.append((layer, closure))
+            rooms.append((level, room_index))
+            overlay_nodes += [self._overlay_node(level, room.doors[node - len(room.nav_points)])
+                              for node in nodes if node >= len(room.nav_points)]
+        parts.append((self.closures, self.closures.close(nodes=overlay_nodes)))
+        return self._add_closure(parts, rooms)
+
+    def lift(self, closure: int):
+        """
+        Lifts a closure of the building.
+        """
+        parts, rooms = self._closures.pop(closure)
+        for layer, layer_closure in parts:
+            layer.lift(layer_closure)
+        for level, room_index in rooms:
+            self._update_room_distances(level, room_index)
+
+    def route(self, start_level: int, start_room: int, start: Point, end_level: int, end_room: int, end: Point,
+              expand: bool = False) -> tuple[float, list[tuple[int, Point]]]:
+        """
+        Calculates the shortest route between two nodes (nav_points or doors) of rooms in the building.
+
+        Returns the length and the points with their levels. Only the first and the last room are searched in detail,
+        the rooms in between are only passed by their doors unless they are expanded.
+        Returns an infinite length and an empty path if there is no route.
+        """
+        start_graph = self.room_graph(start_level, start_room)
+        end_graph = self.room_graph(end_level, end_room)
+        start_node = start_graph.index_of(start)
+        end_node = end_graph.index_of(end)
+
+        # search the first and the last room
+        start_dist, start_prev = start_graph.dijkstra({start_node: 0.})
+        end_dist, end_prev = end_graph.dijkstra({end_node: 0.})
+        start_doors = self._door_nodes(start_level, start_room)
+        end_doors = self._door_nodes(end_level, end_room)
+        start_room_obj = self.floors[start_level].rooms[start_room]
+        end_room_obj = self.floors[end_level].rooms[end_room]
+
+        # search the overlay graph from the doors of the first room
+        sources: dict[int, float] = {}
+        for i, door_node in enumerate(start_doors):
+            if not math.isinf(start_dist[door_node]):
+                node = self._overlay_node(start_level, start_room_obj.doors[i])
+                sources[node] = min(sources.get(node, math.inf), start_dist[door_node])
+        targets = {self._overlay_node(end_level, door): i for i, door in enumerate(end_room_obj.doors)}
+        overlay_dist, overlay_prev = self.overlay.dijkstra(sources, set(targets))
+
+        # find the best door to enter the last room
+        best_length, best_target = math.inf, None
+        for node, i in targets.items():
+            length = overlay_dist[node] + end_dist[end_doors[i]]
+            if length < best_length:
+                best_length, best_target = length, node
+        # a route inside one room may not need any door
+        if (start_level, start_room) == (end_level, end_room) and start_dist[end_node] <= best_length:
+            _, path = start_graph.shortest_path(start_node, end_node)
+            return start_dist[end_node], [(start_level, start_graph.points[i]) for i in path]
+        if best_target is None:
+            return math.inf, []
+
+        # put the route together
+        overlay_path = self.overlay.path_to(overlay_prev, best_target)
+        first_door = start_doors[next(i for i, door in enumerate(start_room_obj.doors)
+                                      if self._overlay_node(start_level, door) == overlay_path[0])]
+        last_door = end_doors[targets[best_target]]
+        route = [(start_level, start_graph.points[i]) for i in start_graph.path_to(start_prev, first_door)]
+        for k in range(1, len(overlay_path)):
+            leg = self._overlay_leg(overlay_path[k - 1], overlay_path[k], overlay_prev[overlay_path[k]], expand)
+            route += leg[1:]
+        route += [(end_level, end_graph.points[i]) for i in reversed(end_graph.path_to(end_prev, last_door)[:-1])]
+        return best_length, route
+
+    def _overlay_leg(self, u: int, v: int, edge: int, expand: bool) -> list[tuple[int, Point]]:
+        """
+        Returns the points of an overlay edge from u to v, expanded through its room if requested.
+        """
+        origin = self._overlay_origins[edge]
+        if expand and origin[0] == 'room':
+            _, level, room_index, i, j = origin
+            room = self.floors[level].rooms[room_index]
+            if self._overlay_node(level, room.doors[i]) != u:
+                i, j = j, i
+            return [(level, p) for p in self._expand_room_leg(level, room_index, i, j)]
+        return [(self.overlay_levels[u], self.overlay.points[u]), (self.overlay_levels[v], self.overlay.points[v])]
+
+    def egress_fields(self, exits: list[tuple[int, Point]]) -> dict[tuple[int, int], tuple[list[float], list[int]]]:
+        """
+        Calculates for the nodes of all rooms the distance to the nearest exit and which exit that is (-1 if none can
+        be reached). The exits are doors given with their levels.
+
+        The overlay graph is searched once from all exits. Every room is then searched once from all its doors, each
+        starting with its distance to the nearest exit. Active closures are honored.
+        Returns the distances and nearest exits of the room graph nodes by (level, room index).
+        Raises a KeyError if an exit is no door on its floor.
+        """
+        exit_nodes = {self._overlay_node(level, door): k for k, (level, door) in enumerate(exits)}
+        overlay_dist, overlay_nearest = self.overlay.nearest_sources({node: 0. for node in exit_nodes})
+        fields = {}
+        for level, floor in self.floors.items():
+            for room_index, room in enumerate(floor.rooms):
+                graph = self.room_graph(level, room_index)
+                door_nodes = self._door_nodes(level, room_index)
+                overlay_nodes = [self._overlay_node(level, door) for door in room.doors]
+                sources = {}
+                for door_node, overlay_node in zip(door_nodes, overlay_nodes):
+                    if not math.isinf(overlay_dist[overlay_node]):
+                        sources[door_node] = overlay_dist[overlay_node]
+                dist, nearest = graph.nearest_sources(sources)
+                door_exits = {door_node: exit_nodes[overlay_nearest[overlay_node]]
+                              for door_node, overlay_node in zip(door_nodes, overlay_nodes)
+                              if overlay_nearest[overlay_node] != -1}
+                fields[(level, room_index)] = (dist, [door_exits.get(node, -1) for node in nearest])
+        return fields
+
+    def flat_graph(self) -> tuple[NavGraph, list[int]]:
+        """
+        Merges the graphs of all rooms into one graph, connected at shared doors and by the connectors.
+
+        Returns the graph and the level of every node.
+        """
+        points: list[Point] = []
+        levels: list[int] = []
+        edges: list[tuple[int, int, float]] = []
+        # the merged node of every overlay node
+        door_nodes: dict[int, int] = {}
+        for level, floor in self.floors.items():
+            for room_index, room in enumerate(floor.rooms):
+                graph = self.room_graph(level, room_index)
+                mapping = []
+                for i, p in enumerate(graph.points):
+                    if i >= len(room.nav_points):
+                        key = self._overlay_node(level, p)
+                        if key in door_nodes:
+                            mapping.append(door_nodes[key])
+                            continue
+                        door_nodes[key] = len(points)
+                    mapping.append(len(points))
+                    points.append(p)
+                    levels.append(level)
+                edges += [(mapping[u], mapping[v], length) for u, v, length in graph.edges]
+        for connector in self.connectors:
+            edges.append((door_nodes[self._overlay_node(connector.level1, connector.door1)],
+                          door_nodes[self._overlay_node(connector.level2, connector.door2)], connector.cost))
+        return NavGraph(points, edges), levels
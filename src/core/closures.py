@@ -0,0 +1,131 @@
+from typing import Iterable, Optional, Union
+
+from core.edge import Edge
+from core.geometry_backend import GeometryBackend, get_backend
+from core.nav_graph import NavGraph
+from core.point import Point
+from core.polygon import Polygon
+from core.segment_grid import SegmentGrid
+
+
+class ClosureLayer:
+    """
+    A class to represent temporary closures (e.g. closed fire doors or cordoned off areas) of a navigation graph.
+
+    A closure marks nodes and edges of the graph as unavailable in its masks (see `NavGraph.node_closures` and
+    `NavGraph.edge_closures`), which `NavGraph.dijkstra` honors immediately. The graph itself is never rebuilt, so
+    applying or lifting a closure only touches the affected nodes and edges. Closures may overlap; a node or edge is
+    available again as soon as all closures covering it are lifted.
+
+    A zone closes the nodes inside it (whether they have edges or not) and all edges of these nodes. The remaining
+    edges are indexed by a uniform grid on the first closure zone, so that only the edges near a zone are checked for
+    running through it, with one batch check of the geometry backend per zone. Edges between equal points (e.g.
+    elevators) are not indexed, they are closed with their nodes.
+
+    Args
+    ----
+    graph : NavGraph
+        The graph to close nodes and edges of.
+    backend : str or GeometryBackend, optional
+        The implementation of the zone checks, the global default one if not given (see `core.geometry_backend`).
+
+    Attributes
+    ----------
+    graph : NavGraph
+        The graph to close nodes and edges of.
+    backend : GeometryBackend
+        The implementation of the zone checks.
+    closures : dict[int, tuple[list[int], list[int]]]
+        The closed nodes and edges of every active closure by its id.
+    zones : dict[int, Polygon]
+        The polygon of every active closure zone by its closure id.
+    """
+
+    def __init__(self, graph: NavGraph, backend: Optional[Union[str, GeometryBackend]] = None):
+        self.graph: NavGraph = graph
+        self.backend: GeometryBackend = get_backend(backend)
+        self.closures: dict[int, tuple[list[int], list[int]]] = {}
+        self.zones: dict[int, Polygon] = {}
+        self._next_id: int = 0
+        self._grid: Optional[SegmentGrid] = None
+        self._grid_edges: list[int] = []
+
+    def __repr__(self) -> str:
+        return f'ClosureLayer: {len(self.closures)} closures, {len(self.zones)} zones'
+
+    def close(self, nodes: Iterable[int] = (), edges: Iterable[int] = ()) -> int:
+        """
+        Closes the given nodes and edges (given by their indices) and returns the id of the closure.
+        """
+        closure = self._next_id
+        self._next_id += 1
+        self.closures[closure] = (sorted(set(nodes)), sorted(set(edges)))
+        for node in self.closures[closure][0]:
+            self.graph.node_closures[node] += 1
+        for edge in self.closures[closure][1]:
+            self.graph.edge_closures[edge] += 1
+        return closure
+
+    def close_points(self, points: list[Point]) -> int:
+        """
+        Closes the nodes at the given points (e.g. doors or nav_points) and returns the id of the closure.
+        """
+        return self.close(nodes=[self.graph.index_of(point) for point in points])
+
+    def close_zone(self, zone: Polygon) -> int:
+        """
+        Closes all nodes inside a polygonal zone and all edges running through it, and returns the id of the closure.
+
+        Edges only touching the outline of the zone stay open.
+        """
+        graph = self.graph
+        points = graph.points
+        if self._grid is None:
+            self._grid_edges = [e for e, (u, v, _) in enumerate(graph.edges) if points[u] != points[v]]
+            self._grid = SegmentGrid([Edge(points[graph.edges[e][0]], points[graph.edges[e][1]])
+                                      for e in self._grid_edges])
+        min_x, min_y = min(p.x for p in zone.points), min(p.y for p in zone.points)
+        max_x, max_y = max(p.x for p in zone.points), max(p.y for p in zone.points)
+        # the nodes inside the zone, and all of their edges
+        candidates = [node for node, p in enumerate(points) if min_x < p.x < max_x and min_y < p.y < max_y]
+        nodes = [node for node, inside in zip(candidates, self.backend.surrounds_points(
+            zone, [points[node] for node in candidates])) if inside]
+        edges = {e for node in nodes for e in graph.adjacency[node][1::2]}
+        # the edges with both ends outside that run through the zone
+        crossing = [self._grid_edges[i] for i in self._grid.query_box(min_x, min_y, max_x, max_y)
+                    if self._grid_edges[i] not in edges]
+        crossing_edges = [Edge(points[graph.edges[e][0]], points[graph.edges[e][1]]) for e in crossing]
+        cut = self.backend.cuts_edges(zone, crossing_edges)
+        middle_inside = self.backend.surrounds_points(zone, [edge.middle_point for edge in crossing_edges])
+        edges.update(e for e, is_cut, inside in zip(crossing, cut, middle_inside) if is_cut or inside)
+        closure = self.close(nodes, edges)
+        self.zones[closure] = zone
+        return closure
+
+    def lift(self, closure: int):
+        """
+        Lifts a closure, so that its nodes and edges are available again unless another closure covers them.
+        """
+        nodes, edges = self.closures.pop(closure)
+        for node in nodes:
+            self.graph.node_closures[node] -= 1
+        for edge in edges:
+            self.graph.edge_closures[edge] -= 1
+        self.zones.pop(closure, None)
+
+    def clear(self):
+        """
+        Lifts all closures.
+        """
+        for closure in list(self.closures):
+            self.lift(closure)
+
+    def blocks(self, point1: Point, point2: Point) -> bool:
+        """
+        Checks if the connection between two points (that is no edge of the graph) runs through an active zone.
+        """
+        if point1 == point2:
+            return any(zone.surrounds_point(point1) for zone in self.zones.values())
+        edge = Edge(point1, point2)
+        return any(zone.surrounds_point(point1) or zone.surrounds_point(point2) or zone.cuts_edge(edge)
+                   or zone.surrounds_point(edge.middle_point) for zone in self.zones.values())
@@ -56,7 +56,8 @@ class Direction:
         Calculates the mathematical angle of the direction vector (x y).
         """
         d = self.normalized()
-        return math.copysign(math.acos(d.x) * 180 / math.pi, d.y) % 360
+        # rounding can push the normalized x slightly beyond 1
+        return math.copysign(math.acos(min(max(d.x, -1.), 1.)) * 180 / math.pi, d.y) % 360
 
     def _inv_len(self) -> float:
         """
@@ -65,37 +66,19 @@ class Direction:
         vec_len_sqr = self.x ** 2 + self.y ** 2
         return vec_len_sqr ** -0.5
 
-    def _normalize(self):
-        """
-        Adjusts the length of the x and y values so that the length of the (x y) vector is 1.
-        """
-        inv_len = self._inv_len()
-        self.x *= inv_len
-        self.y *= inv_len
-
     def normalized(self) -> 'Direction':
         """
         Returns a new instance of the direction with a length of 1.
         """
-        new_dir = Direction(self.x, self.y)
-        new_dir._normalize()
-        return new_dir
-
-    def _naturalize(self, nat_dist: float):
-        """
-        Adjusts the length of the x and y values so that the length of the (x y) vector is the given nat_dist.
-        """
-        self._normalize()
-        self.x *= nat_dist
-        self.y *= nat_dist
+        inv_len = self._inv_len()
+        return Direction(self.x * inv_len, self.y * inv_len)
 
     def naturalized(self, nat_dist: float) -> 'Direction':
         """
         Returns a new instance of the direction with a length of the given nat_dist.
         """
-        new_dir = self.normalized()
-        new_dir._naturalize(nat_dist)
-        return new_dir
+        factor = self._inv_len() * nat_dist
+        return Direction(self.x * factor, self.y * factor)
 
     def perpendicular(self) -> 'Direction':
         """
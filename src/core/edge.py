@@ -1,3 +1,4 @@
+import math
 from typing import Optional
 
 from core.beam import Beam
@@ -54,6 +55,13 @@ class Edge:
         """
         return Direction.from_points(self.p1, self.p2)
 
+    @property
+    def length(self) -> float:
+        """
+        Returns the euclidean length of the edge.
+        """
+        return math.hypot(self.p2.x - self.p1.x, self.p2.y - self.p1.y)
+
     @property
     def middle_point(self) -> Point:
         """
@@ -87,9 +95,10 @@ class Edge:
         """
         Checks whether a (door) point is on or very near the edge.
         """
-        # check whether point is in possible edge's x and y boundary
-        if not (min(self.p1.x, self.p2.x) <= pt.x <= max(self.p1.x, self.p2.x)) \
-                or not (min(self.p1.y, self.p2.y) <= pt.y <= max(self.p1.y, self.p2.y)):
+        # check whether point is in possible edge's x and y boundary (widened by the tolerance for points that are
+        # slightly off axis-parallel edges, e.g. after a projection)
+        if not (min(self.p1.x, self.p2.x) - tolerance <= pt.x <= max(self.p1.x, self.p2.x) + tolerance) \
+                or not (min(self.p1.y, self.p2.y) - tolerance <= pt.y <= max(self.p1.y, self.p2.y) + tolerance):
             return False
 
         # find the closest point from the given point to the edges beam
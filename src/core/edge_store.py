@@ -0,0 +1,142 @@
+import math
+import tempfile
+import threading
+from array import array
+from typing import Iterator
+
+from core.edge import Edge
+from core.point import Point
+
+
+class EdgeStore:
+    """
+    A class to represent the nav_edges of a room as compact index pairs with a bounded memory footprint.
+
+    Every edge is stored as two 32 bit indices into the nodes (the nav_points followed by the doors). The pairs are
+    buffered in memory up to the memory budget and then appended to an anonymous temporary file, so that the memory
+    stays flat no matter how many edges are added. Reading always streams the pairs in chunks of the budget size.
+    Every reader keeps its own position in the file, so that the pairs can be read by nested loops or several threads
+    at once.
+
+    The store can be used like the list of edges it replaces: iterating it yields `Edge` objects that are created on
+    the fly.
+
+    Args
+    ----
+    nodes : list[Point]
+        The points the indices refer to.
+    memory_budget : int
+        The maximum size of the in-memory buffer in bytes.
+
+    Attributes
+    ----------
+    nodes : list[Point]
+        The points the indices refer to.
+    memory_budget : int
+        The maximum size of the in-memory buffer in bytes.
+    """
+
+    def __init__(self, nodes: list[Point], memory_budget: int):
+        self.nodes: list[Point] = nodes
+        self.memory_budget: int = memory_budget
+        self._buffer: array = array('i')
+        self._chunk_length: int = max(memory_budget // self._buffer.itemsize, 2) // 2 * 2
+        self._file = None
+        self._spilled: int = 0
+        # guards the position of the temporary file, which all readers share
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return (self._spilled + len(self._buffer)) // 2
+
+    def __repr__(self) -> str:
+        return f'EdgeStore: {len(self)} edges, {self._spilled // 2} on disk'
+
+    def __iter__(self) -> Iterator[Edge]:
+        for i, j in self.pairs():
+            yield Edge(self.nodes[i], self.nodes[j])
+
+    def __getstate__(self) -> dict:
+        # the temporary file cannot be pickled, the pairs are sent along chunk by chunk instead
+        return {'nodes': self.nodes, 'memory_budget': self.memory_budget, 'chunks': list(self.chunks())}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['nodes'], state['memory_budget'])
+        for chunk in state['chunks']:
+            self.extend(chunk)
+
+    def append(self, i: int, j: int):
+        """
+        Adds the edge between two nodes (given by their indices).
+        """
+        self._buffer.append(i)
+        self._buffer.append(j)
+        if len(self._buffer) >= self._chunk_length:
+            self._spill()
+
+    def extend(self, pairs: array):
+        """
+        Adds the edges of a flat array of index pairs (i1 j1 i2 j2 ...).
+        """
+        start = 0
+        while start < len(pairs):
+            end = start + self._chunk_length - len(self._buffer)
+            self._buffer.extend(pairs[start:end])
+            start = end
+            if len(self._buffer) >= self._chunk_length:
+                self._spill()
+
+    def _spill(self):
+        """
+        Appends the buffered pairs to the temporary file and empties the buffer.
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile()
+            self._file.seek(0, 2)
+            self._buffer.tofile(self._file)
+        self._spilled += len(self._buffer)
+        self._buffer = array('i')
+
+    def chunks(self) -> Iterator[array]:
+        """
+        Yields the stored edges in order as flat arrays of index pairs (i1 j1 i2 j2 ...), each at most the memory
+        budget in size.
+        """
+        position, remaining = 0, self._spilled
+        while remaining > 0:
+            chunk = array('i')
+            with self._lock:
+                self._file.seek(position)
+                chunk.fromfile(self._file, min(self._chunk_length, remaining))
+            position += len(chunk) * chunk.itemsize
+            remaining -= len(chunk)
+            yield chunk
+        if self._buffer:
+            yield self._buffer
+
+    def pairs(self) -> Iterator[tuple[int, int]]:
+        """
+        Yields the index pairs of the stored edges in order.
+        """
+        for chunk in self.chunks():
+            for k in range(0, len(chunk), 2):
+                yield chunk[k], chunk[k + 1]
+
+    def weighted_pairs(self) -> Iterator[tuple[int, int, float]]:
+        """
+        Yields the index pairs of the stored edges in order, together with their lengths.
+        """
+        nodes = self.nodes
+        for i, j in self.pairs():
+            yield i, j, math.hypot(nodes[j].x - nodes[i].x, nodes[j].y - nodes[i].y)
+
+    def close(self):
+        """
+        Deletes the temporary file. The store is empty afterwards.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._spilled = 0
+        self._buffer = array('i')
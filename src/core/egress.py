@@ -0,0 +1,69 @@
+"""
+Evacuation and isochrone analyses on top of one multi-source search per room (see `NavGraph.nearest_sources`).
+
+A single search from all exit doors gives the distance of every node to its nearest exit, instead of one search per
+door. For buildings, see `Building.egress_fields`.
+"""
+import math
+from typing import Optional
+
+from core.nav_graph import NavGraph
+from core.room import Room
+
+
+def exit_field(room: Room, exits: Optional[list[int]] = None) -> tuple[list[float], list[int]]:
+    """
+    Calculates for all nodes of a room after `find_paths` (the nav_points followed by the doors) the distance to the
+    nearest exit door and the index of that door (-1 if no exit can be reached).
+
+    The exits are given as door indices, all doors are exits if none are given.
+    """
+    graph = NavGraph.from_room(room)
+    exits = list(range(len(room.doors))) if exits is None else exits
+    dist, nearest = graph.nearest_sources({len(room.nav_points) + door: 0. for door in exits})
+    return dist, [node - len(room.nav_points) if node != -1 else -1 for node in nearest]
+
+
+def isochrone(dist: list[float], distance: float) -> list[int]:
+    """
+    Returns the indices of all nodes within the given distance of the sources of a distance field.
+    """
+    return [node for node, d in enumerate(dist) if d <= distance]
+
+
+def worst_egress(dist: list[float], nodes: list[int]) -> tuple[float, int]:
+    """
+    Returns the largest distance of the given nodes to their nearest exit and the node it belongs to.
+
+    The distance is infinite if a node cannot reach any exit, and -1 is returned as node if no nodes are given.
+    """
+    worst, worst_node = -math.inf, -1
+    for node in nodes:
+        if dist[node] > worst:
+            worst, worst_node = dist[node], node
+    return worst, worst_node
+
+
+def room_egress(room: Room, exits: Optional[list[int]] = None, isochrone_distances: tuple = ()) -> dict:
+    """
+    Summarizes the egress of a room after `find_paths` as a dictionary (e.g. for JSON): the worst-case distance of a
+    nav_point to its nearest exit with the point and the exit, the number of nav_points that cannot reach any exit,
+    and the number of nav_points within each of the isochrone distances.
+    """
+    dist, nearest = exit_field(room, exits)
+    nav_nodes = list(range(len(room.nav_points)))
+    worst, worst_node = worst_egress(dist, [node for node in nav_nodes if not math.isinf(dist[node])])
+    return {
+        'worst_distance': worst if worst_node != -1 else None,
+        'worst_point': (room.nav_points[worst_node].x, room.nav_points[worst_node].y) if worst_node != -1 else None,
+        'worst_exit': nearest[worst_node] if worst_node != -1 else None,
+        'unreachable': sum(1 for node in nav_nodes if math.isinf(dist[node])),
+        'isochrones': {d: sum(1 for node in nav_nodes if dist[node] <= d) for d in isochrone_distances},
+    }
+
+
+def portfolio_egress(rooms: list[Room], isochrone_distances: tuple = ()) -> list[dict]:
+    """
+    Summarizes the egress of many rooms after `find_paths`, with all doors as exits (see `room_egress`).
+    """
+    return [room_egress(room, isochrone_distances=isochrone_distances) for room in rooms]
@@ -0,0 +1,198 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Optional, TextIO, Union
+from xml.sax.saxutils import quoteattr
+
+from core.edge_store import EdgeStore
+from core.point import Point
+from core.polygon import Polygon
+from core.projection import LocalProjection
+from core.room import Room
+
+
+class RoomWriter(ABC):
+    """
+    A class to represent a streaming writer for rooms and their navigation graphs.
+
+    Every room is written as soon as it is given, so that the full document is never held in memory.
+    The writer can be used as a context manager.
+
+    Args
+    ----
+    target : str or TextIO
+        The path of the file to write or an open text file.
+    buffer_size : int
+        The size of the write buffer in bytes if a path is given.
+
+    Attributes
+    ----------
+    file : TextIO
+        The file that is written.
+    rooms : int
+        The number of rooms written so far.
+    """
+
+    def __init__(self, target: Union[str, TextIO], buffer_size: int = 1 << 20):
+        self._owns_file: bool = isinstance(target, str)
+        self.file: TextIO = open(target, 'w', buffering=buffer_size) if self._owns_file else target
+        self.rooms: int = 0
+        self._write_header()
+
+    def __enter__(self) -> 'RoomWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_header(self):
+        """
+        Writes everything that precedes the first room.
+        """
+
+    def _write_footer(self):
+        """
+        Writes everything that follows the last room.
+        """
+
+    @abstractmethod
+    def write_room(self, room: Room, room_id: Optional[str] = None):
+        """
+        Writes a room after `find_paths`.
+        """
+
+    def close(self):
+        """
+        Finishes the document and closes the file if it was opened by the writer.
+        """
+        self._write_footer()
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class GeoJsonWriter(RoomWriter):
+    """
+    A class to represent a writer for newline-delimited GeoJSON, with one feature per line.
+
+    Every feature has the room id and its kind (boundary, barrier, virtual_boundary, virtual_barrier, door,
+    virtual_door, nav_point, nav_edge) as properties.
+
+    GeoJSON (RFC 7946) requires WGS84 longitudes and latitudes. If the rooms are in a local metric frame, the projection
+    of that frame must be given, so that all coordinates are converted back (see `core.projection`); the lengths of the
+    nav_edges stay in [meter]. Without a projection, the coordinates are written unchanged, which is only standard
+    GeoJSON for rooms given in WGS84; rooms in a local frame then give a non-standard document that most GIS tools
+    misplace.
+
+    Args
+    ----
+    target : str or TextIO
+        The path of the file to write or an open text file.
+    buffer_size : int
+        The size of the write buffer in bytes if a path is given.
+    projection : LocalProjection, optional
+        The projection of the local frame of the rooms.
+
+    Attributes
+    ----------
+    file : TextIO
+        The file that is written.
+    rooms : int
+        The number of rooms written so far.
+    projection : LocalProjection, optional
+        The projection of the local frame of the rooms.
+    """
+
+    def __init__(self, target: Union[str, TextIO], buffer_size: int = 1 << 20,
+                 projection: Optional[LocalProjection] = None):
+        self.projection: Optional[LocalProjection] = projection
+        super().__init__(target, buffer_size)
+
+    def _coordinates(self, points: list[Point]) -> list[list[float]]:
+        """
+        Returns the GeoJSON coordinates of points, converted back to WGS84 if the writer has a projection.
+        """
+        if self.projection is None:
+            return [[p.x, p.y] for p in points]
+        lons, lats = self.projection.inverse([p.x for p in points], [p.y for p in points])
+        return [list(coordinates) for coordinates in zip(lons.tolist(), lats.tolist())]
+
+    def _write_feature(self, geometry: dict, properties: dict):
+        """
+        Writes a single feature line.
+        """
+        self.file.write(json.dumps({'type': 'Feature', 'geometry': geometry, 'properties': properties}) + '\n')
+
+    def _polygon(self, polygon: Polygon) -> dict:
+        """
+        Returns the GeoJSON geometry of a polygon.
+        """
+        ring = self._coordinates(polygon.points)
+        return {'type': 'Polygon', 'coordinates': [ring + ring[:1]]}
+
+    def write_room(self, room: Room, room_id: Optional[str] = None):
+        room_id = room_id if room_id is not None else str(self.rooms)
+        self._write_feature(self._polygon(room.boundary), {'room': room_id, 'kind': 'boundary'})
+        for barrier in room.barriers:
+            self._write_feature(self._polygon(barrier), {'room': room_id, 'kind': 'barrier'})
+        if room.virtual_boundary is not None:
+            self._write_feature(self._polygon(room.virtual_boundary), {'room': room_id, 'kind': 'virtual_boundary'})
+        for barrier in room.virtual_barriers:
+            self._write_feature(self._polygon(barrier), {'room': room_id, 'kind': 'virtual_barrier'})
+        for kind, points in [('door', room.doors), ('virtual_door', room.virtual_doors),
+                             ('nav_point', room.nav_points)]:
+            for i, coordinates in enumerate(self._coordinates(points)):
+                self._write_feature({'type': 'Point', 'coordinates': coordinates},
+                                    {'room': room_id, 'kind': kind, 'index': i})
+        # the nav_edges run between the nav_points and the doors
+        nodes = room.nav_points + room.doors
+        node_coordinates = self._coordinates(nodes)
+        if isinstance(room.nav_edges, EdgeStore):
+            edges = room.nav_edges.weighted_pairs()
+        else:
+            node_index = {id(p): i for i, p in enumerate(nodes)}
+            edges = ((node_index[id(edge.p1)], node_index[id(edge.p2)], edge.length) for edge in room.nav_edges)
+        for i, j, length in edges:
+            self._write_feature({'type': 'LineString', 'coordinates': [node_coordinates[i], node_coordinates[j]]},
+                                {'room': room_id, 'kind': 'nav_edge', 'length': length})
+        self.rooms += 1
+
+
+class GraphMLWriter(RoomWriter):
+    """
+    A class to represent a GraphML writer with one graph per room.
+
+    The nodes are the nav_points followed by the doors, with their coordinates and kind. The edges are the nav_edges
+    with their lengths.
+    """
+
+    def _write_header(self):
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                        '<key id="x" for="node" attr.name="x" attr.type="double"/>\n'
+                        '<key id="y" for="node" attr.name="y" attr.type="double"/>\n'
+                        '<key id="kind" for="node" attr.name="kind" attr.type="string"/>\n'
+                        '<key id="length" for="edge" attr.name="length" attr.type="double"/>\n')
+
+    def _write_footer(self):
+        self.file.write('</graphml>\n')
+
+    def write_room(self, room: Room, room_id: Optional[str] = None):
+        room_id = room_id if room_id is not None else str(self.rooms)
+        write = self.file.write
+        write(f'<graph id={quoteattr(room_id)} edgedefault="undirected">\n')
+        nodes = room.nav_points + room.doors
+        node_index = {id(p): i for i, p in enumerate(nodes)}
+        for i, p in enumerate(nodes):
+            kind = 'nav_point' if i < len(room.nav_points) else 'door'
+            write(f'<node id={quoteattr(f"{room_id}:{i}")}><data key="x">{p.x!r}</data><data key="y">{p.y!r}</data>'
+                  f'<data key="kind">{kind}</data></node>\n')
+        if isinstance(room.nav_edges, EdgeStore):
+            edges = room.nav_edges.weighted_pairs()
+        else:
+            edges = ((node_index[id(edge.p1)], node_index[id(edge.p2)], edge.length) for edge in room.nav_edges)
+        for i, j, length in edges:
+            source, target = quoteattr(f'{room_id}:{i}'), quoteattr(f'{room_id}:{j}')
+            write(f'<edge source={source} target={target}><data key="length">{length!r}</data></edge>\n')
+        write('</graph>\n')
+        self.rooms += 1
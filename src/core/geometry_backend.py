@@ -0,0 +1,481 @@
+import threading
+import weakref
+from typing import Optional, Union
+
+from core.edge import Edge
+from core.point import Point
+from core.polygon import Polygon
+from core.std_vals import *
+
+
+class GeometryBackend:
+    """
+    A class to represent the implementation of the geometric checks a room uses to find its paths.
+
+    All checks work on batches, so that implementations can evaluate them as array operations.
+    This default implementation loops over the pure Python predicates of `Polygon` and `Edge`.
+    """
+
+    name = 'python'
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.name})'
+
+    def point_set(self, points: list[Point]):
+        """
+        Prepares a set of points for `edges_hit_points`.
+        """
+        return points
+
+    def hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        """
+        Checks for every point if it lies on the polygon.
+        """
+        return [polygon.hits_point(point) for point in points]
+
+    def surrounds_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        """
+        Checks for every point if it is inside of the polygon (and not on it).
+        """
+        return [polygon.surrounds_point(point) for point in points]
+
+    def surrounds_or_hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        """
+        Checks for every point if it lies on or is inside of the polygon.
+        """
+        return [polygon.surrounds_or_hits_point(point) for point in points]
+
+    def cuts_edges(self, polygon: Polygon, edges: list[Edge]) -> list[bool]:
+        """
+        Checks for every edge if it cuts the polygon.
+
+        The end points of an edge may touch the polygon, this is not considered `cutting`.
+        However, corners of the polygon may not touch the edge line.
+        """
+        return [polygon.cuts_edge(edge) for edge in edges]
+
+    @staticmethod
+    def _cuts_polygon_edge(polygon_edge: Edge, edge: Edge) -> bool:
+        """
+        Checks if an edge cuts a single polygon edge or one of its corners, like `Polygon.cuts_edge` for all edges.
+
+        Both can only happen if the bounding boxes of the edges overlap.
+        """
+        if Edge.intersection(polygon_edge, edge):
+            return True
+        return any(corner not in edge.points and edge.contains_point(corner) for corner in polygon_edge.points)
+
+    def edges_hit_points(self, edges: list[Edge], point_set) -> list[bool]:
+        """
+        Checks for every edge if any point of the set (except for its own end points) lies on the edge.
+        """
+        return [any(point not in edge.points and edge.contains_point(point) for point in point_set) for edge in edges]
+
+
+class ShapelyBackend(GeometryBackend):
+    """
+    A class to represent geometric checks evaluated as vectorized shapely 2 predicates on prepared geometries.
+
+    The pure Python predicates accept points on an edge line within an angular tolerance, i.e. within a distance that
+    grows with the edge length. All cases that are that close to a polygon or point are delegated to the pure Python
+    predicates, so that both backends agree; shapely only decides the clear cases. For edges near a polygon, only the
+    polygon edges whose bounding boxes overlap are checked in Python, found by one bulk query of an STRtree.
+
+    Edges ending at corners of the checked polygon are always delegated, so for rooms made of few large polygons
+    `cuts_edges` is hardly faster (or even slower) than the pure Python check. The `numpy` backend decides those
+    cases per polygon edge in arrays and is the faster choice for large jobs.
+    """
+
+    name = 'shapely'
+
+    def __init__(self):
+        import numpy
+        import shapely
+        self._np = numpy
+        self._shapely = shapely
+        self._geometries = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # the modules and the prepared geometries cannot be pickled, they are recreated instead
+        return {}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+
+    @staticmethod
+    def _band(length):
+        """
+        Returns the distance to an edge of the given length (at least 1) within which the pure Python predicates must
+        decide.
+        """
+        return 2 * std_tolerance * length + std_tolerance
+
+    def _prepared(self, polygon: Polygon) -> dict:
+        """
+        Returns the prepared area, outline, buffered outline, and corners of a polygon, the tree of its edges, its
+        corner coordinates, normalized edge directions, and band distance.
+        """
+        with self._lock:
+            prepared = self._geometries.get(polygon)
+            if prepared is None:
+                coords = self._np.array([(p.x, p.y) for p in polygon.points], dtype=float)
+                area = self._shapely.Polygon(coords)
+                prepared = {
+                    'area': area,
+                    'outline': area.exterior,
+                    'outline_buffer': area.exterior.buffer(std_tolerance),
+                    'corners': self._shapely.MultiPoint(coords),
+                    'tree': self._shapely.STRtree(self._shapely.linestrings(
+                        self._np.stack([coords, self._np.roll(coords, -1, axis=0)], axis=1))),
+                    'coords': coords,
+                    'directions': self._normalized(self._np.roll(coords, -1, axis=0) - coords),
+                    'band': self._band(max([edge.length for edge in polygon.edges] + [1.])),
+                }
+                self._shapely.prepare([prepared['area'], prepared['outline'], prepared['outline_buffer'],
+                                       prepared['corners']])
+                self._geometries[polygon] = prepared
+            return prepared
+
+    def _normalized(self, vectors):
+        """
+        Returns the given vectors scaled to a length of 1.
+        """
+        return vectors / self._np.hypot(vectors[:, 0], vectors[:, 1])[:, None]
+
+    def _points(self, points: list[Point]):
+        """
+        Converts points to an array of shapely points.
+        """
+        return self._shapely.points(self._np.array([(p.x, p.y) for p in points], dtype=float).reshape(-1, 2))
+
+    def _lines(self, edges: list[Edge]) -> tuple:
+        """
+        Converts edges to two arrays of shapely lines that are shortened at both ends, and returns the band distances.
+
+        The first lines are shortened by twice the tolerance, so that touching end points are never `cutting`.
+        The second lines are shortened by the band distance, so that no point on the end points is near them.
+        Edges too short for this get no second line (None) and are always delegated.
+        """
+        np = self._np
+        coords = np.array([(e.p1.x, e.p1.y, e.p2.x, e.p2.y) for e in edges], dtype=float).reshape(-1, 4)
+        starts, ends = coords[:, :2], coords[:, 2:]
+        vectors = ends - starts
+        lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+        bands = self._band(np.maximum(lengths, 1.))
+        touch_shift = np.minimum(2 * std_tolerance / lengths, 0.5)[:, None] * vectors
+        touch_lines = self._shapely.linestrings(np.stack([starts + touch_shift, ends - touch_shift], axis=1))
+        band_shift = np.minimum(bands / lengths, 0.5)[:, None] * vectors
+        band_lines = self._shapely.linestrings(np.stack([starts + band_shift, ends - band_shift], axis=1))
+        band_lines[2 * bands >= lengths] = None
+        return touch_lines, band_lines, bands
+
+    def point_set(self, points: list[Point]):
+        if not points:
+            return None
+        point_set = self._shapely.MultiPoint([(p.x, p.y) for p in points])
+        self._shapely.prepare(point_set)
+        return point_set, points
+
+    def _near_outline(self, polygon: Polygon, points: list[Point], inside_check: bool) -> tuple:
+        """
+        Returns the points as shapely points, and which of them are so near the outline that Python must decide.
+
+        For inside checks, this also includes points whose control beam of `Polygon.surrounds_point` (to the right)
+        runs within the angular tolerance of a corner.
+        """
+        np = self._np
+        prepared = self._prepared(polygon)
+        geometries = self._points(points)
+        near = self._shapely.dwithin(prepared['outline'], geometries, prepared['band'])
+        if inside_check:
+            coords = np.array([(p.x, p.y) for p in points], dtype=float)
+            dx = prepared['coords'][None, :, 0] - coords[:, None, 0]
+            dy = prepared['coords'][None, :, 1] - coords[:, None, 1]
+            near |= ((dx > 0) & (np.abs(dy) <= self._band(np.maximum(dx, 1.)))).any(axis=1)
+        return geometries, near
+
+    def hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        _, near = self._near_outline(polygon, points, False)
+        return [bool(n) and polygon.hits_point(p) for p, n in zip(points, near)]
+
+    def surrounds_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        geometries, near = self._near_outline(polygon, points, True)
+        inside = self._shapely.contains(self._prepared(polygon)['area'], geometries)
+        return [polygon.surrounds_point(p) if n else bool(i) for p, n, i in zip(points, near, inside)]
+
+    def surrounds_or_hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        geometries, near = self._near_outline(polygon, points, True)
+        inside = self._shapely.contains(self._prepared(polygon)['area'], geometries)
+        return [polygon.surrounds_or_hits_point(p) if n else bool(i) for p, n, i in zip(points, near, inside)]
+
+    def cuts_edges(self, polygon: Polygon, edges: list[Edge]) -> list[bool]:
+        if not edges:
+            return []
+        np = self._np
+        prepared = self._prepared(polygon)
+        touch_lines, band_lines, bands = self._lines(edges)
+        # corners near the edge line (or short edges) are decided by Python
+        near = self._shapely.is_missing(band_lines) | self._shapely.dwithin(band_lines, prepared['corners'], bands)
+        # end points near the outline are decided by Python, unless they are corners
+        for end in [self._points([e.p1 for e in edges]), self._points([e.p2 for e in edges])]:
+            near |= self._shapely.dwithin(prepared['outline'], end, bands) & \
+                ~self._shapely.dwithin(prepared['corners'], end, std_tolerance)
+        # the edge meets the outline, but does not only run along one of its edges
+        crossing = self._shapely.intersects(touch_lines, prepared['outline']) & \
+            ~self._shapely.covered_by(touch_lines, prepared['outline_buffer'])
+        # crossings with polygon edges that are parallel within the tolerance are decided by Python
+        directions = self._normalized(np.array([(e.p2.x - e.p1.x, e.p2.y - e.p1.y) for e in edges], dtype=float))
+        difference = np.abs(directions[:, None, :] - prepared['directions'][None, :, :]).max(axis=2)
+        opposite = np.abs(directions[:, None, :] + prepared['directions'][None, :, :]).max(axis=2)
+        near |= crossing & ((difference <= std_tolerance) | (opposite <= std_tolerance)).any(axis=1)
+        result = [bool(c) and not n for n, c in zip(near, crossing)]
+        # the near edges are only checked against the polygon edges with overlapping bounding boxes
+        delegated = np.flatnonzero(near)
+        if len(delegated):
+            coords = np.array([(min(edges[k].p1.x, edges[k].p2.x), min(edges[k].p1.y, edges[k].p2.y),
+                                max(edges[k].p1.x, edges[k].p2.x), max(edges[k].p1.y, edges[k].p2.y))
+                               for k in delegated.tolist()], dtype=float)
+            boxes = self._shapely.box(coords[:, 0] - std_tolerance, coords[:, 1] - std_tolerance,
+                                      coords[:, 2] + std_tolerance, coords[:, 3] + std_tolerance)
+            pairs = prepared['tree'].query(boxes)
+            for k, i in zip(delegated[pairs[0]].tolist(), pairs[1].tolist()):
+                if not result[k]:
+                    result[k] = self._cuts_polygon_edge(polygon.edges[i], edges[k])
+        return result
+
+    def edges_hit_points(self, edges: list[Edge], point_set) -> list[bool]:
+        if not edges or point_set is None:
+            return [False] * len(edges)
+        prepared_points, points = point_set
+        _, band_lines, bands = self._lines(edges)
+        # only points near the edge line (or short edges) need to be checked by Python
+        near = self._shapely.is_missing(band_lines) | self._shapely.dwithin(band_lines, prepared_points, bands)
+        return [bool(n) and super(ShapelyBackend, self).edges_hit_points([e], points)[0] for e, n in zip(edges, near)]
+
+
+class NumpyBackend(GeometryBackend):
+    """
+    A class to represent geometric checks evaluated as NumPy array operations over all pairs of queries and polygon
+    edges.
+
+    The pairs are evaluated in chunks of at most `max_elements` pairs, so that the memory stays bounded for large
+    batches. Like the shapely backend, only the clear cases are decided by float arithmetic: every pair in which a
+    point comes within the angular tolerance of an edge line is delegated to the pure Python predicates of `Edge`,
+    so that both backends agree exactly.
+
+    Args
+    ----
+    max_elements : int
+        The maximum number of query-edge pairs evaluated at once.
+    """
+
+    name = 'numpy'
+
+    def __init__(self, max_elements: int = 1 << 18):
+        import numpy
+        self._np = numpy
+        self.max_elements: int = max_elements
+        self._geometries = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # the module and the prepared polygons cannot be pickled, they are recreated instead
+        return {'max_elements': self.max_elements}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    _band = staticmethod(ShapelyBackend._band)
+
+    def _segments(self, coords) -> dict:
+        """
+        Returns the end coordinates, unit normals (to the left), line offsets, and band distances of segments given
+        as an array of rows (x1 y1 x2 y2).
+        """
+        np = self._np
+        x1, y1, x2, y2 = coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3]
+        lengths = np.hypot(x2 - x1, y2 - y1)
+        nx, ny = (y1 - y2) / lengths, (x2 - x1) / lengths
+        return {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'nx': nx, 'ny': ny, 'offset': nx * x1 + ny * y1,
+                'band': self._band(np.maximum(lengths, 1.))}
+
+    def _prepared(self, polygon: Polygon) -> dict:
+        """
+        Returns the segments of the polygon edges and the largest band distance of the polygon.
+        """
+        with self._lock:
+            prepared = self._geometries.get(polygon)
+            if prepared is None:
+                coords = self._np.array([(p.x, p.y) for p in polygon.points], dtype=float)
+                prepared = self._segments(self._np.hstack([coords, self._np.roll(coords, -1, axis=0)]))
+                prepared['max_band'] = prepared['band'].max()
+                self._geometries[polygon] = prepared
+            return prepared
+
+    def _edge_segments(self, edges: list[Edge]) -> dict:
+        """
+        Returns the segments of the given edges.
+        """
+        return self._segments(self._np.array([(e.p1.x, e.p1.y, e.p2.x, e.p2.y) for e in edges],
+                                             dtype=float).reshape(-1, 4))
+
+    def _chunks(self, rows: int, columns: int):
+        """
+        Yields the slices of rows that are evaluated at once against all columns.
+        """
+        step = max(self.max_elements // max(columns, 1), 1)
+        for start in range(0, rows, step):
+            yield slice(start, min(start + step, rows))
+
+    def _near_outline(self, polygon: Polygon, points: list[Point], inside_check: bool) -> tuple:
+        """
+        Returns which points are so near the outline that Python must decide, and if the others are inside.
+
+        For inside checks, this also includes points whose control beam of `Polygon.surrounds_point` (to the right)
+        runs within the angular tolerance of a corner.
+        """
+        np = self._np
+        walls = self._prepared(polygon)
+        coords = np.array([(p.x, p.y) for p in points], dtype=float).reshape(-1, 2)
+        near = np.zeros(len(points), dtype=bool)
+        inside = np.zeros(len(points), dtype=bool)
+        x1, y1, x2, y2 = walls['x1'][None, :], walls['y1'][None, :], walls['x2'][None, :], walls['y2'][None, :]
+        for rows in self._chunks(len(points), len(walls['x1'])):
+            px, py = coords[rows, 0, None], coords[rows, 1, None]
+            # the distance to every wall
+            dx, dy = x2 - x1, y2 - y1
+            t = np.clip(((px - x1) * dx + (py - y1) * dy) / (dx * dx + dy * dy), 0., 1.)
+            distance = np.hypot(x1 + t * dx - px, y1 + t * dy - py)
+            near[rows] = (distance <= walls['band'][None, :]).any(axis=1)
+            if inside_check:
+                # the control beam passes near a corner
+                ahead = x1 - px
+                near[rows] |= ((ahead > -walls['max_band']) &
+                               (np.abs(y1 - py) <= self._band(np.maximum(ahead, 1.)) + walls['max_band'])).any(axis=1)
+                # the control beam crosses a wall
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    crossing_x = x1 + (py - y1) * dx / dy
+                crossing = ((y1 > py) != (y2 > py)) & (crossing_x > px)
+                inside[rows] = crossing.sum(axis=1) % 2 == 1
+        return near, inside
+
+    def hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        near, _ = self._near_outline(polygon, points, False)
+        return [bool(n) and polygon.hits_point(p) for p, n in zip(points, near)]
+
+    def surrounds_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        near, inside = self._near_outline(polygon, points, True)
+        return [polygon.surrounds_point(p) if n else bool(i) for p, n, i in zip(points, near, inside)]
+
+    def surrounds_or_hits_points(self, polygon: Polygon, points: list[Point]) -> list[bool]:
+        if not points:
+            return []
+        near, inside = self._near_outline(polygon, points, True)
+        return [polygon.surrounds_or_hits_point(p) if n else bool(i) for p, n, i in zip(points, near, inside)]
+
+    def cuts_edges(self, polygon: Polygon, edges: list[Edge]) -> list[bool]:
+        if not edges:
+            return []
+        np = self._np
+        walls = self._prepared(polygon)
+        lines = self._edge_segments(edges)
+        result = [False] * len(edges)
+        for rows in self._chunks(len(edges), len(walls['x1'])):
+            e = {key: value[rows, None] for key, value in lines.items()}
+            w = {key: value[None, :] for key, value in walls.items() if key != 'max_band'}
+            band = np.maximum(e['band'], w['band'])
+            # the bounding boxes are clearly apart
+            apart = (np.minimum(e['x1'], e['x2']) > np.maximum(w['x1'], w['x2']) + band) | \
+                    (np.maximum(e['x1'], e['x2']) < np.minimum(w['x1'], w['x2']) - band) | \
+                    (np.minimum(e['y1'], e['y2']) > np.maximum(w['y1'], w['y2']) + band) | \
+                    (np.maximum(e['y1'], e['y2']) < np.minimum(w['y1'], w['y2']) - band)
+            # both wall ends clearly on the same side of the edge line, or the other way round
+            side1 = e['nx'] * w['x1'] + e['ny'] * w['y1'] - e['offset']
+            side2 = e['nx'] * w['x2'] + e['ny'] * w['y2'] - e['offset']
+            side3 = w['nx'] * e['x1'] + w['ny'] * e['y1'] - w['offset']
+            side4 = w['nx'] * e['x2'] + w['ny'] * e['y2'] - w['offset']
+            apart |= ((side1 > band) & (side2 > band)) | ((side1 < -band) & (side2 < -band)) | \
+                ((side3 > band) & (side4 > band)) | ((side3 < -band) & (side4 < -band))
+            # clear crossings
+            margin = np.minimum(np.minimum(np.abs(side1), np.abs(side2)), np.minimum(np.abs(side3), np.abs(side4)))
+            crossing = ~apart & (margin > band)
+            # walls sharing an end point with the edge only touch it if their other end is clearly off the edge line
+            shared1 = (w['x1'] == e['x1']) & (w['y1'] == e['y1']) | (w['x1'] == e['x2']) & (w['y1'] == e['y2'])
+            shared2 = (w['x2'] == e['x1']) & (w['y2'] == e['y1']) | (w['x2'] == e['x2']) & (w['y2'] == e['y2'])
+            apart |= shared1 & ~shared2 & (np.abs(side2) > band) | shared2 & ~shared1 & (np.abs(side1) > band)
+            cut = crossing.any(axis=1)
+            result[rows] = cut.tolist()
+            # the remaining pairs are decided by Python
+            for k, i in zip(*(indices.tolist() for indices in np.nonzero(~apart & ~crossing & ~cut[:, None]))):
+                edge_index = rows.start + k
+                if not result[edge_index]:
+                    result[edge_index] = self._cuts_polygon_edge(polygon.edges[i], edges[edge_index])
+        return result
+
+    def point_set(self, points: list[Point]):
+        return self._np.array([(p.x, p.y) for p in points], dtype=float).reshape(-1, 2), points
+
+    def edges_hit_points(self, edges: list[Edge], point_set) -> list[bool]:
+        coords, points = point_set
+        if not edges or not points:
+            return [False] * len(edges)
+        np = self._np
+        lines = self._edge_segments(edges)
+        px, py = coords[None, :, 0], coords[None, :, 1]
+        result = [False] * len(edges)
+        for rows in self._chunks(len(edges), len(points)):
+            e = {key: value[rows, None] for key, value in lines.items()}
+            # only points near the edge line and within its band around the end points need to be checked by Python
+            near = (np.abs(e['nx'] * px + e['ny'] * py - e['offset']) <= e['band']) & \
+                (px >= np.minimum(e['x1'], e['x2']) - e['band']) & (px <= np.maximum(e['x1'], e['x2']) + e['band']) & \
+                (py >= np.minimum(e['y1'], e['y2']) - e['band']) & (py <= np.maximum(e['y1'], e['y2']) + e['band'])
+            # the end points of the edges themselves never count
+            near &= ~((px == e['x1']) & (py == e['y1']) | (px == e['x2']) & (py == e['y2']))
+            for k, i in zip(*(indices.tolist() for indices in np.nonzero(near))):
+                edge = edges[rows.start + k]
+                if not result[rows.start + k]:
+                    result[rows.start + k] = points[i] not in edge.points and edge.contains_point(points[i])
+        return result
+
+
+_backends: dict[str, type] = {
+    GeometryBackend.name: GeometryBackend,
+    ShapelyBackend.name: ShapelyBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+"""The available geometry backends by name."""
+
+_default_backend: GeometryBackend = GeometryBackend()
+"""The geometry backend used if none is given explicitly."""
+
+
+def get_backend(backend: Optional[Union[str, GeometryBackend]] = None) -> GeometryBackend:
+    """
+    Returns the given backend (an instance or its name), or the global default backend if none is given.
+    """
+    if backend is None:
+        return _default_backend
+    if isinstance(backend, GeometryBackend):
+        return backend
+    if backend not in _backends:
+        raise RuntimeError(f'Unknown geometry backend {backend}, choose one of {list(_backends)}')
+    return _backends[backend]()
+
+
+def set_backend(backend: Union[str, GeometryBackend]):
+    """
+    Sets the global default backend (an instance or its name).
+    """
+    global _default_backend
+    _default_backend = get_backend(backend)
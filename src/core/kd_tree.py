@@ -0,0 +1,128 @@
+import heapq
+import math
+
+from core.point import Point
+
+
+def angular_sector(dx: float, dy: float, sectors: int) -> int:
+    """
+    Returns the index of the equal angular sector the given direction lies in, counterclockwise from the x axis on.
+    """
+    return math.floor((math.atan2(dy, dx) % (2 * math.pi)) / (2 * math.pi / sectors)) % sectors
+
+
+class KDTree:
+    """
+    A class to represent a 2-d tree over points for nearest neighbour lookups in angular sectors.
+
+    The points are split at the median of the longer side of their bounding box until at most `leaf_size` points
+    remain. A lookup visits the nodes from the closest bounding box on and skips every box that cannot improve any
+    sector it overlaps, so that it only touches the neighbourhood of the query point.
+
+    Args
+    ----
+    points : list[Point]
+        The points to index.
+    leaf_size : int
+        The maximum number of points in a leaf.
+
+    Attributes
+    ----------
+    points : list[Point]
+        The indexed points.
+    leaf_size : int
+        The maximum number of points in a leaf.
+    """
+
+    def __init__(self, points: list[Point], leaf_size: int = 8):
+        self.points: list[Point] = points
+        self.leaf_size: int = leaf_size
+        self._order: list[int] = list(range(len(points)))
+        # every node has a range of the order, a bounding box, and two children (-1 for leaves)
+        self._ranges: list[tuple[int, int]] = []
+        self._boxes: list[tuple[float, float, float, float]] = []
+        self._children: list[tuple[int, int]] = []
+        if points:
+            self._build(0, len(points))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, lo: int, hi: int) -> int:
+        """
+        Creates the node of the given range of the order and its children, and returns its index.
+        """
+        indices = self._order[lo:hi]
+        xs, ys = [self.points[i].x for i in indices], [self.points[i].y for i in indices]
+        node = len(self._ranges)
+        self._ranges.append((lo, hi))
+        self._boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        self._children.append((-1, -1))
+        if hi - lo > self.leaf_size:
+            x_min, y_min, x_max, y_max = self._boxes[node]
+            if x_max - x_min >= y_max - y_min:
+                indices.sort(key=lambda i: self.points[i].x)
+            else:
+                indices.sort(key=lambda i: self.points[i].y)
+            self._order[lo:hi] = indices
+            middle = (lo + hi) // 2
+            self._children[node] = self._build(lo, middle), self._build(middle, hi)
+        return node
+
+    def _box_distance(self, node: int, point: Point) -> float:
+        """
+        Returns the squared distance of a point to the bounding box of a node.
+        """
+        x_min, y_min, x_max, y_max = self._boxes[node]
+        dx = max(x_min - point.x, 0., point.x - x_max)
+        dy = max(y_min - point.y, 0., point.y - y_max)
+        return dx * dx + dy * dy
+
+    def _box_sectors(self, node: int, point: Point, sectors: int) -> range:
+        """
+        Returns the (unwrapped) sectors around a point outside the bounding box of a node that the box overlaps.
+        """
+        x_min, y_min, x_max, y_max = self._boxes[node]
+        center = math.atan2((y_min + y_max) / 2 - point.y, (x_min + x_max) / 2 - point.x)
+        deltas = [(math.atan2(y - point.y, x - point.x) - center + math.pi) % (2 * math.pi) - math.pi
+                  for x in (x_min, x_max) for y in (y_min, y_max)]
+        width = 2 * math.pi / sectors
+        return range(math.floor((center + min(deltas)) / width), math.floor((center + max(deltas)) / width) + 1)
+
+    def nearest_in_sectors(self, point: Point, k: int, sectors: int) -> list[int]:
+        """
+        Returns the indices of the k nearest points in each of the given number of equal angular sectors around a
+        point. Points equal to the given one are skipped.
+        """
+        if not self.points:
+            return []
+        # the found points of every sector, as max-heap of their negative squared distances
+        found: list[list[tuple[float, int]]] = [[] for _ in range(sectors)]
+        worst = [math.inf] * sectors
+        queue = [(self._box_distance(0, point), 0)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance >= max(worst):
+                break
+            if distance > 0 and all(distance >= worst[s % sectors]
+                                    for s in self._box_sectors(node, point, sectors)):
+                continue
+            left, right = self._children[node]
+            if left != -1:
+                heapq.heappush(queue, (self._box_distance(left, point), left))
+                heapq.heappush(queue, (self._box_distance(right, point), right))
+                continue
+            lo, hi = self._ranges[node]
+            for i in self._order[lo:hi]:
+                dx, dy = self.points[i].x - point.x, self.points[i].y - point.y
+                d = dx * dx + dy * dy
+                if d == 0:
+                    continue
+                s = angular_sector(dx, dy, sectors)
+                if d < worst[s]:
+                    heapq.heappush(found[s], (-d, i))
+                    if len(found[s]) > k:
+                        heapq.heappop(found[s])
+                    if len(found[s]) == k:
+                        worst[s] = -found[s][0][0]
+        return sorted(i for heap in found for _, i in heap)
@@ -0,0 +1,220 @@
+import heapq
+import math
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from core.edge_store import EdgeStore
+from core.point import Point
+
+
+class EdgeArrays:
+    """
+    A class to represent the edges of a `NavGraph` compactly as arrays of their two node indices and their lengths.
+
+    It can be used like the list of (u, v, length) tuples it replaces, but takes 16 bytes per edge.
+
+    Attributes
+    ----------
+    us : array
+        The first node of every edge.
+    vs : array
+        The second node of every edge.
+    lengths : array
+        The length of every edge.
+    """
+
+    def __init__(self):
+        self.us: array = array('i')
+        self.vs: array = array('i')
+        self.lengths: array = array('d')
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __getitem__(self, e: int) -> tuple[int, int, float]:
+        return self.us[e], self.vs[e], self.lengths[e]
+
+    def __setitem__(self, e: int, edge: tuple[int, int, float]):
+        self.us[e], self.vs[e], self.lengths[e] = edge
+
+    def __iter__(self) -> Iterator[tuple[int, int, float]]:
+        return zip(self.us, self.vs, self.lengths)
+
+    def append(self, edge: tuple[int, int, float]):
+        """
+        Adds an edge given by its two nodes and its length.
+        """
+        self.us.append(edge[0])
+        self.vs.append(edge[1])
+        self.lengths.append(edge[2])
+
+
+class NavGraph:
+    """
+    A class to represent a weighted, undirected navigation graph for routing.
+
+    Args
+    ----
+    points : list[Point]
+        The nodes of the graph.
+    edges : Iterable[tuple[int, int, float]]
+        The connections between two nodes (given by their indices) with their lengths.
+
+    Attributes
+    ----------
+    points : list[Point]
+        The nodes of the graph.
+    edges : EdgeArrays
+        The connections between two nodes (given by their indices) with their lengths.
+    adjacency : list[array]
+        The neighbouring nodes and the connecting edge indices of every node, alternating (v1 e1 v2 e2 ...).
+    node_closures : array
+        The number of active closures of every node, see `core.closures`. Closed nodes are never visited.
+    edge_closures : array
+        The number of active closures of every edge, see `core.closures`. Closed edges are never used.
+    """
+
+    def __init__(self, points: list[Point], edges: Iterable[tuple[int, int, float]]):
+        self.points: list[Point] = points
+        self.edges: EdgeArrays = EdgeArrays()
+        self.adjacency: list[array] = [array('i') for _ in points]
+        self.node_closures: array = array('i', [0] * len(points))
+        self.edge_closures: array = array('i')
+        self._index: dict[int, int] = {id(p): i for i, p in enumerate(points)}
+        for u, v, length in edges:
+            self.add_edge(u, v, length)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __repr__(self) -> str:
+        return f'NavGraph: {len(self.points)} nodes, {len(self.edges)} edges'
+
+    def add_point(self, point: Point) -> int:
+        """
+        Adds a node and returns its index.
+        """
+        self._index[id(point)] = len(self.points)
+        self.points.append(point)
+        self.adjacency.append(array('i'))
+        self.node_closures.append(0)
+        return len(self.points) - 1
+
+    def add_edge(self, u: int, v: int, length: float) -> int:
+        """
+        Connects two nodes and returns the index of the new edge.
+        """
+        self.edges.append((u, v, length))
+        self.edge_closures.append(0)
+        e = len(self.edges) - 1
+        self.adjacency[u].extend((v, e))
+        self.adjacency[v].extend((u, e))
+        return e
+
+    def index_of(self, point: Point) -> int:
+        """
+        Returns the index of the node at the given point.
+        """
+        # nodes are usually the same objects as the edge ends
+        if id(point) in self._index:
+            return self._index[id(point)]
+        for i, p in enumerate(self.points):
+            if p == point:
+                return i
+        raise RuntimeError(f'Point {point} is no node of the graph')
+
+    def dijkstra(self, sources: dict[int, float],
+                 targets: Optional[set[int]] = None) -> tuple[list[float], list[Optional[int]]]:
+        """
+        Calculates the shortest distances from the given source nodes (with their start distances) to all nodes.
+
+        Returns the distances and the index of the last edge on the shortest path for every node.
+        If targets are given, the search stops as soon as all of them are reached.
+        Closed nodes and edges are skipped, closed sources are never reached.
+        """
+        dist = [math.inf] * len(self.points)
+        prev_edge: list[Optional[int]] = [None] * len(self.points)
+        queue = []
+        node_closures, edge_closures, lengths = self.node_closures, self.edge_closures, self.edges.lengths
+        for source, start in sources.items():
+            if start < dist[source] and not node_closures[source]:
+                dist[source] = start
+                queue.append((start, source))
+        heapq.heapify(queue)
+        remaining = set(targets) if targets is not None else None
+        while queue:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            # the neighbours and edges alternate
+            neighbours = iter(self.adjacency[u])
+            for v, e in zip(neighbours, neighbours):
+                if edge_closures[e] or node_closures[v]:
+                    continue
+                new_dist = d + lengths[e]
+                if new_dist < dist[v]:
+                    dist[v] = new_dist
+                    prev_edge[v] = e
+                    heapq.heappush(queue, (new_dist, v))
+        return dist, prev_edge
+
+    def nearest_sources(self, sources: dict[int, float]) -> tuple[list[float], list[int]]:
+        """
+        Calculates for all nodes the distance to the nearest source node (with its start distance) in one search.
+
+        Returns the distances and the nearest source of every node (-1 if no source can be reached).
+        """
+        dist, prev_edge = self.dijkstra(sources)
+        nearest = [-1] * len(self.points)
+        for node in range(len(self.points)):
+            # walk back to the first node whose source is known, then label the walked path
+            path = []
+            while nearest[node] == -1 and not math.isinf(dist[node]):
+                path.append(node)
+                if prev_edge[node] is None:
+                    nearest[node] = node
+                    break
+                u, v, _ = self.edges[prev_edge[node]]
+                node = u if v == node else v
+            for walked in path:
+                nearest[walked] = nearest[node]
+        return dist, nearest
+
+    def path_to(self, prev_edge: list[Optional[int]], target: int) -> list[int]:
+        """
+        Reconstructs the node indices of the path to a target from the edges returned by `dijkstra`.
+        """
+        path = [target]
+        while prev_edge[path[-1]] is not None:
+            u, v, _ = self.edges[prev_edge[path[-1]]]
+            path.append(u if v == path[-1] else v)
+        path.reverse()
+        return path
+
+    def shortest_path(self, source: int, target: int) -> tuple[float, list[int]]:
+        """
+        Calculates the length and the node indices of the shortest path between two nodes.
+        """
+        dist, prev_edge = self.dijkstra({source: 0.}, {target})
+        if math.isinf(dist[target]):
+            return math.inf, []
+        return dist[target], self.path_to(prev_edge, target)
+
+    @staticmethod
+    def from_room(room) -> 'NavGraph':
+        """
+        Creates the graph of a room after `find_paths`, with the nav_points followed by the doors as nodes.
+
+        The edges of an `EdgeStore` are read chunk by chunk, so that only the compact graph is held in memory.
+        """
+        if isinstance(room.nav_edges, EdgeStore):
+            # the stored index pairs already refer to the nodes, without creating edge objects
+            return NavGraph(room.nav_points + room.doors, room.nav_edges.weighted_pairs())
+        graph = NavGraph(room.nav_points + room.doors, [])
+        for edge in room.nav_edges:
+            graph.add_edge(graph.index_of(edge.p1), graph.index_of(edge.p2), edge.length)
+        return graph
@@ -0,0 +1,898 @@
+"""
+Navigation over a constrained Delaunay triangulation of the free space of a room.
+
+The visibility graph of `Room.find_paths` connects every pair of mutually visible nav_points, so it has O(n²) edges.
+A navigation mesh instead triangulates the free space between the virtual boundary and the virtual barriers. The
+corners of all virtual polygons are inserted one by one into a Delaunay triangulation, in a spatially sorted order
+so that the walk locating each corner stays short (O(n log n) expected). The walls are then forced into it as
+constrained edges by flipping the edges they cross. The triangles and their adjacency need O(n) memory.
+
+A route runs through a channel of adjacent free triangles, and the funnel algorithm pulls the shortest path through
+a channel taut around its corners. The channels are searched best first by a lower bound of their length (the exact
+distance to the apex of the funnel plus the straight distance via the last portal to the target). The search only
+stops when no open channel can be shorter than the best route found, so the routes are the exact shortest paths.
+
+The orientation and in-circle tests are evaluated in floating point and repeated with exact fractions if the result
+is within the rounding error, so that collinear and cocircular corners never break the triangulation.
+"""
+import heapq
+import math
+import random
+from fractions import Fraction
+from typing import Optional
+
+from core.edge import Edge
+from core.point import Point
+from core.segment_grid import SegmentGrid
+from core.std_vals import *
+from core.sweep_line import signed_area
+
+# the relative error bounds of the floating point orientation and in-circle determinants
+_orientation_error = 3.3306690738754716e-16
+_in_circle_error = 1.1102230246251577e-15
+
+
+def _orientation(a: tuple[float, float], b: tuple[float, float], c: tuple[float, float]) -> int:
+    """
+    Returns 1 if c lies left of the line from a to b, -1 if it lies right of it, and 0 if it lies on it.
+    """
+    left = (b[0] - a[0]) * (c[1] - a[1])
+    right = (b[1] - a[1]) * (c[0] - a[0])
+    det = left - right
+    bound = _orientation_error * (abs(left) + abs(right))
+    if det > bound:
+        return 1
+    if det < -bound:
+        return -1
+    ax, ay = Fraction(a[0]), Fraction(a[1])
+    exact = (Fraction(b[0]) - ax) * (Fraction(c[1]) - ay) - (Fraction(b[1]) - ay) * (Fraction(c[0]) - ax)
+    return (exact > 0) - (exact < 0)
+
+
+def _in_circle(a: tuple[float, float], b: tuple[float, float], c: tuple[float, float],
+               d: tuple[float, float]) -> int:
+    """
+    Returns 1 if d lies inside the circle through the counterclockwise points a b c, -1 if it lies outside, and 0 if
+    it lies on it.
+    """
+    adx, ady, bdx, bdy, cdx, cdy = a[0] - d[0], a[1] - d[1], b[0] - d[0], b[1] - d[1], c[0] - d[0], c[1] - d[1]
+    a_lift, b_lift, c_lift = adx * adx + ady * ady, bdx * bdx + bdy * bdy, cdx * cdx + cdy * cdy
+    det = a_lift * (bdx * cdy - cdx * bdy) + b_lift * (cdx * ady - adx * cdy) + c_lift * (adx * bdy - bdx * ady)
+    bound = _in_circle_error * (a_lift * (abs(bdx * cdy) + abs(cdx * bdy)) + b_lift * (abs(cdx * ady) + abs(adx * cdy))
+                                + c_lift * (abs(adx * bdy) + abs(bdx * ady)))
+    if det > bound:
+        return 1
+    if det < -bound:
+        return -1
+    dx, dy = Fraction(d[0]), Fraction(d[1])
+    adx, ady, bdx, bdy = Fraction(a[0]) - dx, Fraction(a[1]) - dy, Fraction(b[0]) - dx, Fraction(b[1]) - dy
+    cdx, cdy = Fraction(c[0]) - dx, Fraction(c[1]) - dy
+    exact = (adx * adx + ady * ady) * (bdx * cdy - cdx * bdy) + (bdx * bdx + bdy * bdy) * (cdx * ady - adx * cdy) \
+        + (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady)
+    return (exact > 0) - (exact < 0)
+
+
+# the directions in which the corners of the enclosing triangle lie, counterclockwise
+_outer_directions = ((-2, -1), (2, -1), (0, 2))
+
+
+# the relative error bound of the floating point polynomials of the tests with the enclosing corners
+_outer_error = 1e-12
+
+
+def _polynomial_product(p: list, q: list) -> list:
+    """
+    Multiplies two polynomials given by their coefficients from the lowest degree on.
+    """
+    product = [0] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        for j, b in enumerate(q):
+            product[i + j] += a * b
+    return product
+
+
+def _polynomial_sum(p: list, q: list, factor: int = 1) -> list:
+    """
+    Returns the polynomial p + factor * q, both given by their coefficients from the lowest degree on.
+    """
+    return [(p[k] if k < len(p) else 0) + factor * (q[k] if k < len(q) else 0) for k in range(max(len(p), len(q)))]
+
+
+def _magnitude_sum(p: list, q: list, factor: int = 1) -> list:
+    """
+    Returns the bound of the magnitude of p + factor * q for polynomials of magnitudes.
+    """
+    return _polynomial_sum(p, q)
+
+
+def _orientation_test(a: tuple, b: tuple, c: tuple, add) -> list:
+    """
+    Returns the orientation determinant of three points given by polynomial coordinates (see `_orientation`).
+    """
+    bax, bay, cax, cay = add(b[0], a[0], -1), add(b[1], a[1], -1), add(c[0], a[0], -1), add(c[1], a[1], -1)
+    return add(_polynomial_product(bax, cay), _polynomial_product(bay, cax), -1)
+
+
+def _in_circle_test(a: tuple, b: tuple, c: tuple, d: tuple, add) -> list:
+    """
+    Returns the in-circle determinant of four points given by polynomial coordinates (see `_in_circle`).
+    """
+    rows = []
+    for p in (a, b, c):
+        px, py = add(p[0], d[0], -1), add(p[1], d[1], -1)
+        rows.append((px, py, add(_polynomial_product(px, px), _polynomial_product(py, py))))
+    (adx, ady, a_lift), (bdx, bdy, b_lift), (cdx, cdy, c_lift) = rows
+    det = _polynomial_product(a_lift, add(_polynomial_product(bdx, cdy), _polynomial_product(cdx, bdy), -1))
+    det = add(det, _polynomial_product(b_lift, add(_polynomial_product(cdx, ady), _polynomial_product(adx, cdy), -1)))
+    return add(det, _polynomial_product(c_lift, add(_polynomial_product(adx, bdy), _polynomial_product(bdx, ady), -1)))
+
+
+def _crossing_point(a: tuple[float, float], b: tuple[float, float], c: tuple[float, float],
+                    d: tuple[float, float]) -> tuple[float, float]:
+    """
+    Returns the point where the segment from a to b crosses the segment from c to d, rounded from the exact one.
+    """
+    (x1, y1), (x2, y2) = (Fraction(a[0]), Fraction(a[1])), (Fraction(b[0]), Fraction(b[1]))
+    (x3, y3), (x4, y4) = (Fraction(c[0]), Fraction(c[1])), (Fraction(d[0]), Fraction(d[1]))
+    t = ((x3 - x1) * (y4 - y3) - (y3 - y1) * (x4 - x3)) / ((x2 - x1) * (y4 - y3) - (y2 - y1) * (x4 - x3))
+    return float(x1 + t * (x2 - x1)), float(y1 + t * (y2 - y1))
+
+
+def _distance_to_segment(p: tuple[float, float], a: tuple[float, float], b: tuple[float, float]) -> float:
+    """
+    Calculates the euclidean distance of a point to the segment from a to b.
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    t = min(max(((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy), 0.), 1.)
+    return math.hypot(a[0] + t * dx - p[0], a[1] + t * dy - p[1])
+
+
+def _cross(o: tuple, a: tuple, b: tuple) -> float:
+    """
+    Returns the cross product of the vectors from o to a and from o to b (positive if b lies left of o to a).
+    """
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _funnel_entry(point: tuple[float, float], vertex: int, parent: tuple) -> tuple:
+    """
+    Returns the funnel entry of a point reached via a parent entry: its coordinates, its path length, the parent, and
+    the index of the point in the triangulation (-1 for the start and the target).
+    """
+    return point[0], point[1], parent[2] + math.hypot(point[0] - parent[0], point[1] - parent[1]), parent, vertex
+
+
+def _funnel_add_left(funnel: list, apex: int, point: tuple[float, float], vertex: int) -> tuple[list, int]:
+    """
+    Adds a new left end to a funnel and returns the new funnel and the index of its apex.
+
+    A funnel is the list of its entries from the left end over the apex to the right end. Left entries that the point
+    sees past are dropped; if it sees past the apex, the apex moves along the right chain.
+    """
+    i = 0
+    while i < apex and _cross(funnel[i + 1], funnel[i], point) <= 0:
+        i += 1
+    if i < apex:
+        return [_funnel_entry(point, vertex, funnel[i])] + funnel[i:], apex - i + 1
+    while i < len(funnel) - 1 and _cross(funnel[i], funnel[i + 1], point) <= 0:
+        i += 1
+    return [_funnel_entry(point, vertex, funnel[i])] + funnel[i:], 1
+
+
+def _funnel_add_right(funnel: list, apex: int, point: tuple[float, float], vertex: int) -> tuple[list, int]:
+    """
+    Adds a new right end to a funnel and returns the new funnel and the index of its apex (see `_funnel_add_left`).
+    """
+    i = len(funnel) - 1
+    while i > apex and _cross(funnel[i - 1], funnel[i], point) >= 0:
+        i -= 1
+    if i > apex:
+        return funnel[:i + 1] + [_funnel_entry(point, vertex, funnel[i])], apex
+    while i > 0 and _cross(funnel[i], funnel[i - 1], point) >= 0:
+        i -= 1
+    return funnel[:i + 1] + [_funnel_entry(point, vertex, funnel[i])], i
+
+
+def _lower_bound(funnel: list, apex: int, target: tuple[float, float]) -> float:
+    """
+    Returns a lower bound of the length of every path to the target that continues a funnel through its last portal.
+    """
+    a, left, right = funnel[apex], funnel[0], funnel[-1]
+    # the straight line from the apex to the target passes the portal
+    if _cross(a, target, left) * _cross(a, target, right) <= 0 and \
+            _cross(left, right, a) * _cross(left, right, target) <= 0:
+        return a[2] + math.hypot(target[0] - a[0], target[1] - a[1])
+    return a[2] + min(math.hypot(p[0] - a[0], p[1] - a[1]) + math.hypot(target[0] - p[0], target[1] - p[1])
+                      for p in (left, right))
+
+
+class _Triangulation:
+    """
+    A class to represent a constrained Delaunay triangulation of a set of points.
+
+    All points are inserted into a large enclosing triangle, whose three corners are appended to the points. Every
+    triangle lists its corners counterclockwise and its neighbours, the i-th neighbour sharing the edge from the i-th
+    to the next corner (-1 at the enclosing triangle).
+
+    The tests involving the enclosing corners treat them as infinitely far away in their directions: their
+    coordinates are polynomials in their distance M, and the tests take the sign for an infinitely large M. Their
+    circles then never reach the enclosing corners, so the edges of the convex hull are kept for points on a thin
+    strip or far off the origin too. The appended coordinates (at M = 10 times the extent) are only for display.
+
+    Args
+    ----
+    coords : list[tuple[float, float]]
+        The distinct points to triangulate.
+
+    Attributes
+    ----------
+    coords : list[tuple[float, float]]
+        The triangulated points followed by the corners of the enclosing triangle.
+    corners : list[list[int]]
+        The indices of the corners of every triangle.
+    neighbours : list[list[int]]
+        The indices of the neighbours of every triangle.
+    constrained : set[tuple[int, int]]
+        The constrained edges as ordered index pairs; they are never flipped.
+    """
+
+    def __init__(self, coords: list[tuple[float, float]]):
+        self.coords: list[tuple[float, float]] = list(coords)
+        n = len(coords)
+        xs, ys = [c[0] for c in coords] or [0.], [c[1] for c in coords] or [0.]
+        size = max(max(xs) - min(xs), max(ys) - min(ys), 1.)
+        cx, cy = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+        self.coords += [(cx + 10 * size * dx, cy + 10 * size * dy) for dx, dy in _outer_directions]
+        self._n: int = n
+        self._center: tuple[float, float] = (cx, cy)
+        self.corners: list[list[int]] = [[n, n + 1, n + 2]]
+        self.neighbours: list[list[int]] = [[-1, -1, -1]]
+        self.constrained: set[tuple[int, int]] = set()
+        self._vertex_triangle: list[int] = [0] * (n + 3)
+        self._last: int = 0
+        self._random = random.Random(0)
+        # insert the points row by row in a snake order, so that every walk starts next to the point
+        cell = size / max(math.sqrt(n), 1.)
+        rows = [math.floor((c[1] - cy) / cell) for c in coords]
+        for v in sorted(range(n), key=lambda v: (rows[v], coords[v][0] if rows[v] % 2 == 0 else -coords[v][0])):
+            self._insert(v)
+
+    def _symbolic(self, point, convert) -> tuple[list, list]:
+        """
+        Returns the coordinates of a point (given by its index or its coordinates) as polynomials in the distance of
+        the enclosing corners, with the coefficients converted by the given function.
+        """
+        if isinstance(point, int):
+            if point >= self._n:
+                dx, dy = _outer_directions[point - self._n]
+                return [convert(self._center[0]), convert(dx)], [convert(self._center[1]), convert(dy)]
+            point = self.coords[point]
+        return [convert(point[0])], [convert(point[1])]
+
+    def _sign(self, test, points: tuple) -> int:
+        """
+        Returns the sign of a test polynomial of points with an enclosing corner for an infinitely large distance of
+        the enclosing corners, i.e. the sign of its highest nonzero coefficient.
+
+        The test is evaluated in floating point together with a bound of its rounding errors first, and only repeated
+        with exact fractions if the sign is within that bound.
+        """
+        values = test(*[self._symbolic(p, float) for p in points], _polynomial_sum)
+        magnitudes = test(*[self._symbolic(p, abs) for p in points], _magnitude_sum)
+        for value, magnitude in zip(reversed(values), reversed(magnitudes)):
+            if abs(value) > _outer_error * magnitude:
+                return 1 if value > 0 else -1
+            if magnitude > 0:
+                break
+        else:
+            return 0
+        for coefficient in reversed(test(*[self._symbolic(p, Fraction) for p in points], _polynomial_sum)):
+            if coefficient:
+                return 1 if coefficient > 0 else -1
+        return 0
+
+    def _coords(self, point) -> tuple[float, float]:
+        """
+        Returns the coordinates of a point given by its index or its coordinates.
+        """
+        return self.coords[point] if isinstance(point, int) else point
+
+    def orientation(self, a, b, c) -> int:
+        """
+        Returns 1 if c lies left of the line from a to b, -1 if it lies right of it, and 0 if it lies on it, for
+        points given by their indices or their coordinates.
+        """
+        outer = [isinstance(p, int) and p >= self._n for p in (a, b, c)]
+        if not any(outer):
+            return _orientation(self._coords(a), self._coords(b), self._coords(c))
+        if sum(outer) == 1:
+            # the line from p to q, seen from infinitely far in the direction of the enclosing corner
+            p, q, outer_corner = (a, b, c) if outer[2] else (b, c, a) if outer[0] else (c, a, b)
+            p, q = self._coords(p), self._coords(q)
+            dx, dy = _outer_directions[outer_corner - self._n]
+            side = dy * (q[0] - p[0]) - dx * (q[1] - p[1])
+            if abs(side) > _outer_error * (abs(p[0]) + abs(q[0]) + abs(p[1]) + abs(q[1])):
+                return 1 if side > 0 else -1
+        else:
+            # only the directions of the enclosing corners count, the other points are at the origin
+            (ax, ay), (bx, by), (cx, cy) = [_outer_directions[p - self._n] if is_outer else (0, 0)
+                                            for p, is_outer in zip((a, b, c), outer)]
+            side = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+            if side != 0:
+                return 1 if side > 0 else -1
+        return self._sign(_orientation_test, (a, b, c))
+
+    def in_circle(self, a, b, c, d) -> int:
+        """
+        Returns 1 if d lies inside the circle through the counterclockwise points a b c, -1 if it lies outside, and 0
+        if it lies on it, for points given by their indices or their coordinates.
+        """
+        outer = [isinstance(p, int) and p >= self._n for p in (a, b, c)]
+        d_outer = isinstance(d, int) and d >= self._n
+        if not any(outer):
+            if not d_outer:
+                return _in_circle(self._coords(a), self._coords(b), self._coords(c), self._coords(d))
+            # an infinitely far point is never inside the circle of a triangle
+            return -_orientation(self._coords(a), self._coords(b), self._coords(c)) or \
+                self._sign(_in_circle_test, (a, b, c, d))
+        if sum(outer) == 1 and not d_outer:
+            # the circle through two points and an infinitely far one is the half plane beyond their line
+            x, y, corner = (b, c, a) if outer[0] else (c, a, b) if outer[1] else (a, b, c)
+            px, py, pd = self._coords(x), self._coords(y), self._coords(d)
+            side = _orientation(px, py, pd)
+            if side != 0:
+                return side
+            # points on the line are inside between the two points (the sign turns for clockwise triangles)
+            if pd == px or pd == py:
+                return 0
+            k = 0 if abs(px[0] - py[0]) >= abs(px[1] - py[1]) else 1
+            inside = 1 if min(px[k], py[k]) < pd[k] < max(px[k], py[k]) else -1
+            return inside * self.orientation(x, y, corner)
+        if sum(outer) == 1 and d != a and d != b and d != c:
+            # seen from infinitely far, the circle touches the line of the two points (with the normal n towards the
+            # enclosing corner of the triangle at direction e) and passes through e, so it contains the direction f
+            # of the other enclosing corner if |f|² n·e < |e|² n·f
+            x, y, corner = (b, c, a) if outer[0] else (c, a, b) if outer[1] else (a, b, c)
+            px, py = self._coords(x), self._coords(y)
+            nx, ny = px[1] - py[1], py[0] - px[0]
+            (ex, ey), (fx, fy) = _outer_directions[corner - self._n], _outer_directions[d - self._n]
+            e_lift, f_lift = ex * ex + ey * ey, fx * fx + fy * fy
+            n_e, n_f = nx * ex + ny * ey, nx * fx + ny * fy
+            det = e_lift * n_f - f_lift * n_e
+            if abs(det) > _outer_error * (e_lift + f_lift) * (abs(nx) + abs(ny)) * 2:
+                return 1 if det > 0 else -1
+        return self._sign(_in_circle_test, (a, b, c, d))
+
+    def locate(self, point: tuple[float, float]) -> int:
+        """
+        Returns the index of a triangle containing the point (on its boundary or inside).
+        """
+        triangle, previous = self._last, -1
+        while True:
+            corners, neighbours = self.corners[triangle], self.neighbours[triangle]
+            first = self._random.randrange(3)
+            for k in range(3):
+                i = (first + k) % 3
+                if neighbours[i] != previous and neighbours[i] != -1 and \
+                        self.orientation(corners[i], corners[(i + 1) % 3], point) < 0:
+                    triangle, previous = neighbours[i], triangle
+                    break
+            else:
+                self._last = triangle
+                return triangle
+
+    def fan(self, vertex: int) -> list[int]:
+        """
+        Returns the indices of all triangles around a point.
+        """
+        first = triangle = self._vertex_triangle[vertex]
+        fan = []
+        while True:
+            fan.append(triangle)
+            triangle = self.neighbours[triangle][(self.corners[triangle].index(vertex) + 2) % 3]
+            if triangle == first:
+                return fan
+            if triangle == -1:
+                break
+        # the corners of the enclosing triangle are not surrounded, the rest of their fan lies the other way round
+        triangle = self.neighbours[first][self.corners[first].index(vertex)]
+        while triangle != -1:
+            fan.append(triangle)
+            triangle = self.neighbours[triangle][self.corners[triangle].index(vertex)]
+        return fan
+
+    def find_edge(self, a: int, b: int) -> Optional[tuple[int, int]]:
+        """
+        Returns a triangle with the edge between two points and the index of that edge in it, or None if the
+        triangulation has no such edge.
+        """
+        for triangle in self.fan(a):
+            corners = self.corners[triangle]
+            i = corners.index(a)
+            if corners[(i + 1) % 3] == b:
+                return triangle, i
+            if corners[(i + 2) % 3] == b:
+                return triangle, (i + 2) % 3
+        return None
+
+    def _relink(self, triangle: int, old: int, new: int):
+        """
+        Replaces the neighbour old of a triangle by new.
+        """
+        if triangle != -1:
+            neighbours = self.neighbours[triangle]
+            neighbours[neighbours.index(old)] = new
+
+    def _insert(self, v: int):
+        """
+        Inserts the point with the given index and restores the Delaunay property around it.
+        """
+        p = self.coords[v]
+        triangle = self.locate(p)
+        corners = self.corners[triangle]
+        on_edges = [i for i in range(3)
+                    if self.orientation(corners[i], corners[(i + 1) % 3], p) == 0]
+        if len(on_edges) > 1:
+            raise RuntimeError(f'Point {p} is inserted twice into the triangulation')
+        if on_edges:
+            self._legalize(self._split_edge(triangle, on_edges[0], v))
+        else:
+            self._legalize(self._split_triangle(triangle, v))
+
+    def _split_triangle(self, t: int, v: int) -> list[tuple[int, int]]:
+        """
+        Splits a triangle into three at the point v inside it and returns the edges opposite to v.
+        """
+        a, b, c = self.corners[t]
+        n_ab, n_bc, n_ca = self.neighbours[t]
+        t1, t2 = len(self.corners), len(self.corners) + 1
+        self.corners[t], self.neighbours[t] = [a, b, v], [n_ab, t1, t2]
+        self.corners.append([b, c, v])
+        self.neighbours.append([n_bc, t2, t])
+        self.corners.append([c, a, v])
+        self.neighbours.append([n_ca, t, t1])
+        self._relink(n_bc, t, t1)
+        self._relink(n_ca, t, t2)
+        self._vertex_triangle[a] = self._vertex_triangle[b] = self._vertex_triangle[v] = t
+        self._vertex_triangle[c] = t1
+        return [(t, 0), (t1, 0), (t2, 0)]
+
+    def _split_edge(self, t: int, i: int, v: int) -> list[tuple[int, int]]:
+        """
+        Splits the i-th edge of a triangle and the triangle behind it at the point v on that edge, and returns the
+        edges opposite to v.
+        """
+        a, b, c = self.corners[t][i], self.corners[t][(i + 1) % 3], self.corners[t][(i + 2) % 3]
+        u, n_bc, n_ca = self.neighbours[t][i], self.neighbours[t][(i + 1) % 3], self.neighbours[t][(i + 2) % 3]
+        j = self.corners[u].index(b)
+        d = self.corners[u][(j + 2) % 3]
+        n_ad, n_db = self.neighbours[u][(j + 1) % 3], self.neighbours[u][(j + 2) % 3]
+        t1, u1 = len(self.corners), len(self.corners) + 1
+        self.corners[t], self.neighbours[t] = [a, v, c], [u1, t1, n_ca]
+        self.corners[u], self.neighbours[u] = [b, v, d], [t1, u1, n_db]
+        self.corners.append([v, b, c])
+        self.neighbours.append([u, n_bc, t])
+        self.corners.append([v, a, d])
+        self.neighbours.append([t, n_ad, u])
+        self._relink(n_bc, t, t1)
+        self._relink(n_ad, u, u1)
+        if (min(a, b), max(a, b)) in self.constrained:
+            self.constrained.remove((min(a, b), max(a, b)))
+            self.constrained.update({(min(a, v), max(a, v)), (min(b, v), max(b, v))})
+        self._vertex_triangle[a] = self._vertex_triangle[c] = self._vertex_triangle[v] = t
+        self._vertex_triangle[b] = t1
+        self._vertex_triangle[d] = u
+        return [(t, 2), (t1, 1), (u, 2), (u1, 1)]
+
+    def _flip(self, t: int, i: int) -> tuple[int, int]:
+        """
+        Replaces the i-th edge of a triangle by the other diagonal of the quadrilateral with the triangle behind it.
+
+        The triangle then runs from the corner opposite the edge, and the triangle behind it from the corner behind
+        the edge (both counterclockwise).
+        """
+        a, b, c = self.corners[t][i], self.corners[t][(i + 1) % 3], self.corners[t][(i + 2) % 3]
+        u, n_bc, n_ca = self.neighbours[t][i], self.neighbours[t][(i + 1) % 3], self.neighbours[t][(i + 2) % 3]
+        j = self.corners[u].index(b)
+        d = self.corners[u][(j + 2) % 3]
+        n_ad, n_db = self.neighbours[u][(j + 1) % 3], self.neighbours[u][(j + 2) % 3]
+        self.corners[t], self.neighbours[t] = [c, a, d], [n_ca, n_ad, u]
+        self.corners[u], self.neighbours[u] = [d, b, c], [n_db, n_bc, t]
+        self._relink(n_ad, u, t)
+        self._relink(n_bc, t, u)
+        self._vertex_triangle[a] = self._vertex_triangle[c] = self._vertex_triangle[d] = t
+        self._vertex_triangle[b] = u
+        return t, u
+
+    def _opposite(self, t: int, i: int) -> int:
+        """
+        Returns the corner of the triangle behind the i-th edge of a triangle that is not on that edge.
+        """
+        u = self.neighbours[t][i]
+        return self.corners[u][(self.corners[u].index(self.corners[t][i]) + 1) % 3]
+
+    def _is_delaunay(self, t: int, i: int) -> bool:
+        """
+        Checks if the i-th edge of a triangle is constrained or has no point of the triangle behind it inside the
+        circle through the triangle.
+        """
+        a, b = self.corners[t][i], self.corners[t][(i + 1) % 3]
+        if self.neighbours[t][i] == -1 or (min(a, b), max(a, b)) in self.constrained:
+            return True
+        return self.in_circle(*self.corners[t], self._opposite(t, i)) <= 0
+
+    def _legalize(self, edges: list[tuple[int, int]]):
+        """
+        Flips the given edges (opposite to a new point) and all edges behind them until they are Delaunay.
+        """
+        while edges:
+            t, i = edges.pop()
+            if not self._is_delaunay(t, i):
+                t, u = self._flip(t, i)
+                # the new point is now the first corner of t and the last corner of u
+                edges += [(t, 1), (u, 0)]
+
+    def insert_constraint(self, a: int, b: int) -> list[tuple[int, int]]:
+        """
+        Forces the segment between two points into the triangulation as constrained edges, and returns them in order
+        from a to b.
+
+        The segment is split at the points it passes through. It must not cross another constrained edge, it is bent
+        to the nearest point of such an edge otherwise.
+        """
+        pieces, segments = [], [(a, b)]
+        while segments:
+            a, b = segments.pop()
+            if self.find_edge(a, b) is None:
+                crossed, through = self._crossed_edges(a, b)
+                if through is not None:
+                    segments += [(through, b), (a, through)]
+                    continue
+                self._restore_delaunay(self._flip_out(a, b, crossed), a, b)
+            self.constrained.add((min(a, b), max(a, b)))
+            pieces.append((a, b))
+        return pieces
+
+    def _crossed_edges(self, a: int, b: int) -> tuple[list[tuple[int, int]], Optional[int]]:
+        """
+        Walks from a to b and returns the edges the segment crosses (with their right point first), or the first point
+        the segment passes through instead.
+        """
+        pa, pb = self.coords[a], self.coords[b]
+
+        def ahead(v: int) -> bool:
+            return (self.coords[v][0] - pa[0]) * (pb[0] - pa[0]) + (self.coords[v][1] - pa[1]) * (pb[1] - pa[1]) > 0
+
+        for triangle in self.fan(a):
+            corners = self.corners[triangle]
+            x, y = corners[(corners.index(a) + 1) % 3], corners[(corners.index(a) + 2) % 3]
+            side_x, side_y = self.orientation(a, b, x), self.orientation(a, b, y)
+            if side_x == 0 and ahead(x):
+                return [], x
+            if side_y == 0 and ahead(y):
+                return [], y
+            if side_x < 0 < side_y:
+                break
+        else:
+            raise RuntimeError(f'Segment from {pa} to {pb} leaves the triangulation')
+        crossed = []
+        while True:
+            if (min(x, y), max(x, y)) in self.constrained:
+                # only rounded crossings of walls are left here, they are passed through the nearer point
+                return [], min((x, y), key=lambda v: _distance_to_segment(self.coords[v], pa, pb))
+            crossed.append((x, y))
+            corners = self.corners[triangle]
+            triangle = self.neighbours[triangle][corners.index(x)]
+            z = self._opposite_of(triangle, x, y)
+            if z == b:
+                return crossed, None
+            side = self.orientation(a, b, z)
+            if side == 0:
+                return [], z
+            if side < 0:
+                x = z
+            else:
+                y = z
+
+    def _opposite_of(self, triangle: int, x: int, y: int) -> int:
+        """
+        Returns the corner of a triangle that is neither x nor y.
+        """
+        return next(c for c in self.corners[triangle] if c != x and c != y)
+
+    def _flip_out(self, a: int, b: int, crossed: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Flips the edges crossed by the segment from a to b until none is left, and returns the new edges.
+        """
+        new_edges = []
+        while crossed:
+            u, w = crossed.pop(0)
+            t, i = self.find_edge(u, w)
+            c, d = self.corners[t][(i + 2) % 3], self._opposite(t, i)
+            # only convex quadrilaterals can be flipped, the others are tried again later
+            if self.orientation(c, d, u) * self.orientation(c, d, w) >= 0:
+                crossed.append((u, w))
+                continue
+            self._flip(t, i)
+            if c not in (a, b) and d not in (a, b) and self.orientation(a, b, c) * self.orientation(a, b, d) < 0:
+                crossed.append((c, d))
+            else:
+                new_edges.append((c, d))
+        return new_edges
+
+    def _restore_delaunay(self, new_edges: list[tuple[int, int]], a: int, b: int):
+        """
+        Flips the new edges around the constrained edge from a to b until they are Delaunay.
+        """
+        flipped = True
+        while flipped:
+            flipped = False
+            for k, (u, w) in enumerate(new_edges):
+                if {u, w} == {a, b}:
+                    continue
+                t, i = self.find_edge(u, w)
+                if not self._is_delaunay(t, i):
+                    c, d = self.corners[t][(i + 2) % 3], self._opposite(t, i)
+                    self._flip(t, i)
+                    new_edges[k] = (c, d)
+                    flipped = True
+
+
+class NavMesh:
+    """
+    A class to represent the navigation mesh of a room: a constrained Delaunay triangulation of its free space.
+
+    The corners and walls of the virtual polygons are triangulated, walls crossing each other (e.g. of overlapping
+    barriers) are split at their crossings first. A triangle is free if it lies inside the virtual boundary and inside
+    no barrier. Routes between arbitrary free points are searched through the channels of adjacent free triangles and
+    pulled taut by the funnel algorithm (see `core.navmesh`).
+
+    Args
+    ----
+    room : Room
+        The room after `find_paths` or `find_mesh`.
+
+    Attributes
+    ----------
+    room : Room
+        The triangulated room.
+    points : list[tuple[float, float]]
+        The corners of the triangles, followed by the corners of the enclosing triangle.
+    triangles : list[list[int]]
+        The indices of the corners of every triangle, counterclockwise.
+    neighbours : list[list[int]]
+        The indices of the neighbours of every triangle, the i-th behind the edge from the i-th to the next corner.
+    free : list[bool]
+        Whether each triangle belongs to the free space.
+    """
+
+    def __init__(self, room):
+        if room.virtual_boundary is None:
+            raise RuntimeError(f'Room {room} must be virtualized before it can be triangulated')
+        self.room = room
+        coords, walls = self._walls()
+        self._mesh: _Triangulation = _Triangulation(coords)
+        # the polygons every constrained edge belongs to, with +1 if the polygon lies left of it and -1 otherwise
+        owners: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for polygon, side, a, b in walls:
+            for u, w in self._mesh.insert_constraint(a, b):
+                owners.setdefault((u, w), []).append((polygon, side))
+        self.points: list[tuple[float, float]] = self._mesh.coords
+        self.triangles: list[list[int]] = self._mesh.corners
+        self.neighbours: list[list[int]] = self._mesh.neighbours
+        self.free: list[bool] = self._free_triangles(owners)
+
+    def __repr__(self) -> str:
+        return f'NavMesh: {sum(self.free)} free triangles of {len(self.triangles)}, {len(self.points) - 3} points'
+
+    def _walls(self) -> tuple[list[tuple[float, float]], list[tuple[int, int, int, int]]]:
+        """
+        Collects the distinct corners of the virtual polygons and their walls, split at the points where walls cross
+        each other.
+
+        Every wall is given by the index of its polygon (0 for the boundary), the side the polygon lies on (+1 left,
+        -1 right), and the indices of its ends.
+        """
+        coords, index = [], {}
+
+        def vertex(point: tuple[float, float]) -> int:
+            if point not in index:
+                index[point] = len(coords)
+                coords.append(point)
+            return index[point]
+
+        walls = []
+        for k, polygon in enumerate([self.room.virtual_boundary] + self.room.virtual_barriers):
+            side = 1 if signed_area(polygon.points) > 0 else -1
+            corners = [vertex((p.x, p.y)) for p in polygon.points]
+            walls += [(k, side, a, b) for a, b in zip(corners, corners[1:] + corners[:1]) if a != b]
+        grid = SegmentGrid([Edge(Point(*coords[a]), Point(*coords[b])) for _, _, a, b in walls])
+        splits: list[list[int]] = [[] for _ in walls]
+        for k, (_, _, a, b) in enumerate(walls):
+            pa, pb = coords[a], coords[b]
+            for m in grid.query_segment(grid.edges[k]):
+                c, d = walls[m][2:]
+                if m <= k or len({a, b, c, d}) < 4:
+                    continue
+                pc, pd = coords[c], coords[d]
+                if _orientation(pa, pb, pc) * _orientation(pa, pb, pd) < 0 and \
+                        _orientation(pc, pd, pa) * _orientation(pc, pd, pb) < 0:
+                    crossing = vertex(_crossing_point(pa, pb, pc, pd))
+                    splits[k].append(crossing)
+                    splits[m].append(crossing)
+        split_walls = []
+        for (polygon, side, a, b), points in zip(walls, splits):
+            pa, pb = coords[a], coords[b]
+            points.sort(key=lambda v: (coords[v][0] - pa[0]) * (pb[0] - pa[0]) +
+                        (coords[v][1] - pa[1]) * (pb[1] - pa[1]))
+            chain = [a] + points + [b]
+            split_walls += [(polygon, side, u, w) for u, w in zip(chain, chain[1:]) if u != w]
+        return coords, split_walls
+
+    def _free_triangles(self, owners: dict[tuple[int, int], list[tuple[int, int]]]) -> list[bool]:
+        """
+        Decides for every triangle if it belongs to the free space, i.e. lies inside the virtual boundary and inside
+        no barrier.
+
+        The triangles are visited from the outside (where no polygon covers them) over their neighbours. Crossing a
+        constrained edge enters or leaves the polygons it belongs to, so that every triangle knows how many times the
+        boundary and the barriers cover it, without any point-in-polygon test.
+        """
+        n = len(self.points) - 3
+        first = self._mesh.fan(n)[0]
+        cover = [None] * len(self.triangles)
+        cover[first] = (0, 0)
+        stack = [first]
+        while stack:
+            t = stack.pop()
+            corners = self.triangles[t]
+            for i, u in enumerate(self.neighbours[t]):
+                if u == -1 or cover[u] is not None:
+                    continue
+                boundary, barriers = cover[t]
+                # the neighbour lies right of the edge from the i-th to the next corner of t
+                a, b = corners[i], corners[(i + 1) % 3]
+                for polygon, side in owners.get((a, b), []):
+                    boundary, barriers = (boundary - side, barriers) if polygon == 0 else (boundary, barriers - side)
+                for polygon, side in owners.get((b, a), []):
+                    boundary, barriers = (boundary + side, barriers) if polygon == 0 else (boundary, barriers + side)
+                cover[u] = (boundary, barriers)
+                stack.append(u)
+        return [c is not None and c[0] > 0 and c[1] == 0 and max(corners) < n
+                for c, corners in zip(cover, self.triangles)]
+
+    def _distance_to_triangle(self, point: tuple[float, float], triangle: int) -> float:
+        """
+        Calculates the euclidean distance of a point to a triangle (zero inside).
+        """
+        corners = [self.points[c] for c in self.triangles[triangle]]
+        if all(_orientation(corners[i], corners[(i + 1) % 3], point) >= 0 for i in range(3)):
+            return 0.
+        return min(_distance_to_segment(point, corners[i], corners[(i + 1) % 3]) for i in range(3))
+
+    def locate(self, point: Point) -> set[int]:
+        """
+        Returns the indices of all free triangles a point is in or on (within the tolerance).
+        """
+        p = (point.x, point.y)
+        triangle = self._mesh.locate(p)
+        candidates = {triangle} | set(self.neighbours[triangle])
+        for corner in self.triangles[triangle]:
+            if corner < len(self.points) - 3 and \
+                    math.hypot(self.points[corner][0] - p[0], self.points[corner][1] - p[1]) <= std_tolerance:
+                candidates.update(self._mesh.fan(corner))
+        return {t for t in candidates if t != -1 and self.free[t] and self._distance_to_triangle(p, t) <= std_tolerance}
+
+    def route(self, start: Point, end: Point) -> tuple[float, list[Point]]:
+        """
+        Calculates the length and the points of the shortest path between two arbitrary points of the room.
+
+        Returns infinity and no points if there is no path.
+        """
+        starts, ends = self.locate(start), self.locate(end)
+        for point, triangles in ((start, starts), (end, ends)):
+            if not triangles:
+                raise RuntimeError(f'Point {point} is not inside the navigable area of room {self.room}')
+        return self._route(start, end, starts, ends)
+
+    def _route(self, start: Point, end: Point, starts: set[int], ends: set[int]) -> tuple[float, list[Point]]:
+        """
+        Searches the shortest path between two points in the given free triangles.
+        """
+        if starts & ends:
+            return math.hypot(end.x - start.x, end.y - start.y), [start, end]
+        target = (end.x, end.y)
+        root = (start.x, start.y, 0., None, -1)
+        best, best_entry = math.inf, None
+        # the shortest path length found so far to every corner: all paths beyond the last portal of a channel pass
+        # the apex of its funnel, so channels reaching their apex on a longer path can never lead to a shorter route
+        reached: dict[int, float] = {}
+
+        def detour(funnel: list, apex: int) -> bool:
+            a = funnel[apex]
+            return a[4] != -1 and a[2] > reached[a[4]] * (1 + 1e-12)
+
+        # a channel is a linked list of its triangles, an open channel is stored with its lower bound, its last
+        # triangle, the index of the edge it entered that triangle through (-1 at the start), and its funnel
+        queue, count = [], 0
+        for triangle in starts:
+            queue.append((0., count, triangle, -1, [root], 0, (triangle, None)))
+            count += 1
+        heapq.heapify(queue)
+        while queue and queue[0][0] < best:
+            _, _, triangle, entry, funnel, apex, channel = heapq.heappop(queue)
+            if detour(funnel, apex):
+                continue
+            corners, neighbours = self.triangles[triangle], self.neighbours[triangle]
+            for i in range(3):
+                following = neighbours[i]
+                if i == entry or following == -1 or not self.free[following] or following in starts \
+                        or self._in_channel(following, channel):
+                    continue
+                right, left = corners[i], corners[(i + 1) % 3]
+                if entry == -1:
+                    new_funnel, new_apex = _funnel_add_left(funnel, apex, self.points[left], left)
+                    new_funnel, new_apex = _funnel_add_right(new_funnel, new_apex, self.points[right], right)
+                    new_entries = (new_funnel[0], new_funnel[-1])
+                elif left == corners[(entry + 2) % 3]:
+                    new_funnel, new_apex = _funnel_add_left(funnel, apex, self.points[left], left)
+                    new_entries = (new_funnel[0],)
+                else:
+                    new_funnel, new_apex = _funnel_add_right(funnel, apex, self.points[right], right)
+                    new_entries = (new_funnel[-1],)
+                for new_entry in new_entries:
+                    if new_entry[2] < reached.get(new_entry[4], math.inf):
+                        reached[new_entry[4]] = new_entry[2]
+                if detour(new_funnel, new_apex):
+                    continue
+                if following in ends:
+                    end_funnel, _ = _funnel_add_left(new_funnel, new_apex, target, -1)
+                    if end_funnel[0][2] < best:
+                        best, best_entry = end_funnel[0][2], end_funnel[0]
+                    continue
+                bound = _lower_bound(new_funnel, new_apex, target)
+                if bound < best:
+                    heapq.heappush(queue, (bound, count, following, self.triangles[following].index(left), new_funnel,
+                                           new_apex, (following, channel)))
+                    count += 1
+        if best_entry is None:
+            return math.inf, []
+        path = []
+        while best_entry is not None:
+            path.append(Point(best_entry[0], best_entry[1]))
+            best_entry = best_entry[3]
+        path.reverse()
+        path[0], path[-1] = start, end
+        return best, path
+
+    @staticmethod
+    def _in_channel(triangle: int, channel: tuple) -> bool:
+        """
+        Checks if a triangle is part of a channel (given as linked list).
+        """
+        while channel is not None:
+            if channel[0] == triangle:
+                return True
+            channel = channel[1]
+        return False
+
+    def door_route(self, door1: int, door2: int) -> tuple[float, list[Point]]:
+        """
+        Calculates the length and the points of the shortest path between two doors of the room (given by their
+        indices), via their virtual doors.
+
+        Returns infinity and no points if there is no path.
+        """
+        doors, virtual_doors = self.room.doors, self.room.virtual_doors
+        if door1 == door2:
+            return 0., [doors[door1]]
+        starts, ends = self.locate(virtual_doors[door1]), self.locate(virtual_doors[door2])
+        # like in the visibility graph, virtual doors outside the navigable area cannot be reached
+        if not starts or not ends:
+            return math.inf, []
+        length, path = self._route(virtual_doors[door1], virtual_doors[door2], starts, ends)
+        if not path:
+            return length, path
+        stubs = math.hypot(doors[door1].x - virtual_doors[door1].x, doors[door1].y - virtual_doors[door1].y) + \
+            math.hypot(doors[door2].x - virtual_doors[door2].x, doors[door2].y - virtual_doors[door2].y)
+        return length + stubs, [doors[door1]] + path + [doors[door2]]
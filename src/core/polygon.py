@@ -1,3 +1,6 @@
+import copy
+
+from core import sweep_line
 from core.beam import Beam
 from core.corner import Corner
 from core.direction import Direction
@@ -103,13 +106,32 @@ class Polygon:
         self.edges = self._get_edges()
         self.corners = self._get_corners()
 
-    def virtual_polygon(self, nat_dist: float, sharp_angle: float) -> 'Polygon':
+    def _reversed(self) -> 'Polygon':
         """
-        Calculates a new polygon inside the original if its counterclockwise (and outside otherwise),
-        with the given natural distance to the original.
+        Returns a copy of the polygon with the reversed sequence of points, leaving the polygon itself untouched.
+        """
+        polygon = copy.copy(self)
+        polygon.points = self.points[::-1]
+        polygon.edges = polygon._get_edges()
+        polygon.corners = polygon._get_corners()
+        return polygon
 
-        The created polygon edges are parallel to the original ones with the given distance.
-        The corner points may have a greater distance to its original corners respectively.
+    @property
+    def area(self) -> float:
+        """
+        Returns the area enclosed by the polygon.
+        """
+        return abs(sweep_line.signed_area(self.points))
+
+    def self_intersections(self) -> list[tuple[int, int]]:
+        """
+        Finds all pairs of polygon edges (given by their indices) that intersect, see `core.sweep_line`.
+        """
+        return sweep_line.self_intersections(self.points)
+
+    def _virtual_points(self, nat_dist: float, sharp_angle: float) -> list[Point]:
+        """
+        Calculates the corner points of the virtual polygon with the given natural distance to the original.
         """
         # initialize points for new polygon
         new_points = []
@@ -135,17 +157,45 @@ class Polygon:
                 new_points.append(Beam.intersection(nat_dist_beam_1, perpendicular_nat_dist_bisector))
                 new_points.append(Beam.intersection(nat_dist_beam_2, perpendicular_nat_dist_bisector))
 
+        return new_points
+
+    def virtual_polygon(self, nat_dist: float, sharp_angle: float) -> 'Polygon':
+        """
+        Calculates a new polygon inside the original if its counterclockwise (and outside otherwise),
+        with the given natural distance to the original.
+
+        The created polygon edges are parallel to the original ones with the given distance.
+        The corner points may have a greater distance to its original corners respectively.
+        """
         # return list of found points as polygon
-        return Polygon(new_points, is_room=self._is_counterclockwise)
+        return Polygon(self._virtual_points(nat_dist, sharp_angle), is_room=self._is_counterclockwise)
+
+    def virtual_polygons(self, nat_dist: float, sharp_angle: float) -> list['Polygon']:
+        """
+        Calculates the virtual polygon like `virtual_polygon`, split into valid pieces where it intersects itself.
+
+        For a large natural distance or narrow parts of the original, the virtual polygon folds over itself. The
+        folded (inverted) parts are dropped, the remaining pieces are returned (see `core.sweep_line`).
+        """
+        points = self._virtual_points(nat_dist, sharp_angle)
+        # remove repetitions before the intersection check
+        points = [p for i, p in enumerate(points) if p != points[i - 1]] if len(points) > 1 else points
+        pieces = []
+        for piece in sweep_line.split_polygon(points, self._is_counterclockwise):
+            try:
+                pieces.append(Polygon(piece, is_room=self._is_counterclockwise))
+            except RuntimeError:
+                # degenerated pieces
+                continue
+        return pieces
 
     def other_virtual_polygon(self, nat_dist: float, sharp_angle: float) -> 'Polygon':
         """
         Calculates a new polygon on the other side then `get_virtual_polygon`.
+
+        The polygon is not modified, so that it can be shared between threads.
         """
-        self._reverse()
-        new_polygon = self.virtual_polygon(nat_dist, sharp_angle)
-        self._reverse()
-        return new_polygon
+        return self._reversed().virtual_polygon(nat_dist, sharp_angle)
 
     def cuts_edge(self, other_edge: Edge) -> bool:
         """
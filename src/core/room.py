@@ -1,9 +1,22 @@
-from typing import Optional
+import json
+import math
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, TextIO, Union
 
+from core import tiling
 from core.beam import Beam
 from core.edge import Edge
+from core.edge_store import EdgeStore
+from core.geometry_backend import GeometryBackend, get_backend
+from core.kd_tree import KDTree, angular_sector
+from core.nav_graph import NavGraph
+from core.navmesh import NavMesh
 from core.point import Point
 from core.polygon import Polygon
+from core.room_paths import RoomPaths
+from core.segment_grid import SegmentGrid
 from core.std_vals import *
 
 
@@ -36,8 +49,16 @@ class Room:
         The virtual doors on the virtual polygons.
     nav_points : list[Point]
         The points used for calculating the navigation paths.
-    nav_edges : list[Edge]
-        The edges defining routes for navigation.
+    nav_edges : list[Edge] or EdgeStore
+        The edges defining routes for navigation, kept in an `EdgeStore` if `find_paths` got a memory budget.
+    nav_mesh : NavMesh, optional
+        The triangulated free space of the room (see `find_mesh`).
+    door_distances : array, optional
+        The shortest distances between all pairs of doors, row by row (see `door_distance_matrix`).
+    door_predecessors : array, optional
+        The predecessor of every node on the shortest paths from each door, row by row (see `door_distance_matrix`).
+    backend : GeometryBackend
+        The implementation of the geometric checks used for finding the paths.
     """
 
     def __init__(self, boundary: Polygon, barriers: list[Polygon], doors: list[Point]):
@@ -49,58 +70,107 @@ class Room:
         self.virtual_barriers: list[Polygon] = []
         self.virtual_doors: list[Point] = []
         self.nav_points: list[Point] = []
-        self.nav_edges: list[Edge] = []
+        self.nav_edges: Union[list[Edge], EdgeStore] = []
+        self.nav_mesh: Optional[NavMesh] = None
+        self.door_distances: Optional[array] = None
+        self.door_predecessors: Optional[array] = None
+        self.backend: GeometryBackend = get_backend()
 
     def __repr__(self) -> str:
         return f"Room:\nboundary: {repr(self.boundary)}\nbarriers: {repr(self.barriers)}\ndoors: {repr(self.doors)}"
 
-    def _set_virtual_boundary(self, nat_dist: float, sharp_angle: float):
+    def _set_virtual_boundary(self, nat_dist: float, sharp_angle: float, split: bool = False):
         """
         Calculates the rooms virtual inner boundary polygon according to the given values.
+
+        If requested, the virtual boundary is split where it intersects itself, and the piece containing the virtual
+        doors is kept. Doors that end up in another piece (or in a dropped, folded part) are reported together, as
+        they could not be reached.
         """
-        self.virtual_boundary = self.boundary.virtual_polygon(nat_dist, sharp_angle)
+        if not split:
+            self.virtual_boundary = self.boundary.virtual_polygon(nat_dist, sharp_angle)
+            return
+        pieces = self.boundary.virtual_polygons(nat_dist, sharp_angle)
+        if not pieces:
+            raise RuntimeError(f'Room {self} has no area with the natural distance {nat_dist} to its walls')
+        # parts that are only connected by corridors narrower than twice the natural distance cannot be reached
+        inside = [self.backend.surrounds_or_hits_points(piece, self.virtual_doors) for piece in pieces]
+        kept = max(range(len(pieces)), key=lambda k: (sum(inside[k]), pieces[k].area))
+        lost = [door for door, hit in zip(self.doors, inside[kept]) if not hit]
+        if lost:
+            raise RuntimeError(f'Doors {lost} are cut off from the other doors of room {self} '
+                               f'with the natural distance {nat_dist} to its walls')
+        self.virtual_boundary = pieces[kept]
 
-    def _set_virtual_barriers(self, nat_dist: float, sharp_angle: float):
+    def _set_virtual_barriers(self, nat_dist: float, sharp_angle: float, split: bool = False):
         """
         Calculates the rooms virtual outer barrier polygons according to the given values.
+
+        If requested, barriers folding over themselves are split into their valid pieces.
         """
-        self.virtual_barriers = [barrier.virtual_polygon(nat_dist, sharp_angle) for barrier in self.barriers]
+        if not split:
+            self.virtual_barriers = [barrier.virtual_polygon(nat_dist, sharp_angle) for barrier in self.barriers]
+            return
+        self.virtual_barriers = []
+        for barrier in self.barriers:
+            self.virtual_barriers += barrier.virtual_polygons(nat_dist, sharp_angle)
 
     def _set_virtual_doors(self, nat_dist: float):
         """
         Calculates the rooms virtual doors on the virtual polygons.
         """
-        for door in self.doors:
-            # find the edge the door is positioned at
-            door_edge = self._corresponding_edge(door)
+        # find the edges the doors are positioned at
+        door_edges = self._corresponding_edges(self.doors)
+        self.virtual_doors = []
+        for door, door_edge in zip(self.doors, door_edges):
+            # doors within door_tolerance of their edge are moved onto it first, so that doors outside the wall do not
+            # get their virtual door outside the virtual polygons
+            foot = door_edge.intersection_with_beam(Beam(door, door_edge.dir.perpendicular())) or door
             # take the edge's beam starting from the door - the virtual door is the start point of the nat-dist-beam
-            virtual_door = Beam(door, door_edge.dir).nat_dist_beam(nat_dist).pt
+            virtual_door = Beam(foot, door_edge.dir).nat_dist_beam(nat_dist).pt
             # add to list
             self.virtual_doors.append(virtual_door)
 
-    def _virtualize(self, nat_dist: float, sharp_angle: float):
+    def _virtualize(self, nat_dist: float, sharp_angle: float, split: bool = False):
         """
         Calculates the rooms virtual polygons for the outer walls and inner barriers according to the given values.
         """
-        self._set_virtual_boundary(nat_dist, sharp_angle)
-        self._set_virtual_barriers(nat_dist, sharp_angle)
+        # the virtual doors decide which piece of a split boundary is kept
         self._set_virtual_doors(nat_dist)
+        self._set_virtual_boundary(nat_dist, sharp_angle, split)
+        self._set_virtual_barriers(nat_dist, sharp_angle, split)
 
-    def _corresponding_edge(self, pt: Point) -> Edge:
+    def _wall_index(self) -> SegmentGrid:
         """
-        Finds the edge that corresponds to a door.
+        Builds a spatial index over the edges of the outer room and all barriers (in this order).
         """
-        # check outer room
-        for edge in self.boundary.edges:
-            if edge.contains_point_with_tolerance(pt, tolerance=door_tolerance):
-                return edge
-        # check barriers (that can also be little rooms inside a big one)
-        for barrier in self.barriers:
-            for edge in barrier.edges:
-                if edge.contains_point_with_tolerance(pt, tolerance=door_tolerance):
-                    return edge
-        # point belongs to no edge of the room
-        raise RuntimeError(f'Point {pt} does not belong to room {self}')
+        return SegmentGrid(self.boundary.edges + [edge for barrier in self.barriers for edge in barrier.edges])
+
+    @staticmethod
+    def _corresponding_edge(pt: Point, wall_index: SegmentGrid) -> Optional[Edge]:
+        """
+        Finds the edge that corresponds to a door, or None if the door belongs to no edge.
+
+        Edges of the outer room are preferred over edges of barriers (that can also be little rooms inside a big one).
+        """
+        for i in wall_index.query_point(pt, door_tolerance):
+            if wall_index.edges[i].contains_point_with_tolerance(pt, tolerance=door_tolerance):
+                return wall_index.edges[i]
+        return None
+
+    def _corresponding_edges(self, points: list[Point]) -> list[Edge]:
+        """
+        Finds the edges that correspond to the doors.
+
+        All doors that belong to no edge of the room are reported together.
+        """
+        wall_index = self._wall_index()
+        edges = [self._corresponding_edge(pt, wall_index) for pt in points]
+        # points belong to no edge of the room
+        unmatched = [pt for pt, edge in zip(points, edges) if edge is None]
+        if unmatched:
+            raise RuntimeError(f'Points {unmatched} do not belong to room {self}')
+        return edges
 
     def _valid_nav_point(self, point_to_validate: Point) -> bool:
         """
@@ -110,16 +180,16 @@ class Room:
         if point_to_validate in self.nav_points:
             return False
         # point must be on or inside boundary
-        if not self.virtual_boundary.surrounds_or_hits_point(point_to_validate):
+        if not self.backend.surrounds_or_hits_points(self.virtual_boundary, [point_to_validate])[0]:
             return False
         # point must not be inside barriers
         for virtual_barrier in self.virtual_barriers:
-            if virtual_barrier.surrounds_point(point_to_validate):
+            if self.backend.surrounds_points(virtual_barrier, [point_to_validate])[0]:
                 return False
         # all clear
         return True
 
-    def _collect_nav_points(self):
+    def _collect_nav_points(self, tile_size: Optional[float] = None):
         """
         Collects all possible points for the navigation through the room.
         """
@@ -135,58 +205,509 @@ class Room:
             for corner in barrier.corners:
                 if corner.angle > 180 and self._valid_nav_point(corner.pt):
                     self.nav_points.append(corner.pt)
+        # add portals on the tile borders to stitch the tiles
+        if tile_size is not None:
+            for portal in tiling.portal_points(self._tile_grid(tile_size), tile_size, portal_spacing):
+                if self._valid_nav_point(portal):
+                    self.nav_points.append(portal)
 
     def _valid_nav_edge(self, edge_to_validate: Edge) -> bool:
         """
         Checks if a edge is suitable for navigation.
         """
+        return self._valid_nav_edges([edge_to_validate])[0]
+
+    def _valid_nav_edges(self, edges_to_validate: list[Edge], near: Optional[list[int]] = None) -> list[bool]:
+        """
+        Checks for a batch of edges if they are suitable for navigation.
+
+        Every check is only done for the edges that passed all checks before. If the indices of the nav_points near
+        the edges are given, only those are checked for lying on the edges.
+        """
+        candidates = list(range(len(edges_to_validate)))
+
+        def remaining(failed: list[bool]) -> list[int]:
+            return [k for k, fail in zip(candidates, failed) if not fail]
+
         # check that edge does not cut any other nav_point
-        for nav_point in self.nav_points:
-            if nav_point not in edge_to_validate.points and edge_to_validate.contains_point(nav_point):
-                return False
+        nav_point_set = self.backend.point_set(self.nav_points if near is None else [self.nav_points[i] for i in near])
+        candidates = remaining(self.backend.edges_hit_points(edges_to_validate, nav_point_set))
         # check that edge does not cut any polygon point or edge
-        if self.virtual_boundary.cuts_edge(edge_to_validate):
-            return False
-        for virtual_barrier in self.virtual_barriers:
-            if virtual_barrier.cuts_edge(edge_to_validate):
-                return False
+        for polygon in [self.virtual_boundary] + self.virtual_barriers:
+            candidates = remaining(self.backend.cuts_edges(polygon, [edges_to_validate[k] for k in candidates]))
         # check that edge is inside the room and not inside a barrier
-        if not self.virtual_boundary.surrounds_or_hits_point(edge_to_validate.middle_point):
-            return False
+        middle_points = [edges_to_validate[k].middle_point for k in candidates]
+        inside = self.backend.surrounds_or_hits_points(self.virtual_boundary, middle_points)
+        candidates = remaining([not flag for flag in inside])
         for virtual_barrier in self.virtual_barriers:
-            if virtual_barrier.surrounds_point(edge_to_validate.middle_point):
-                return False
+            middle_points = [edges_to_validate[k].middle_point for k in candidates]
+            candidates = remaining(self.backend.surrounds_points(virtual_barrier, middle_points))
         # all clear
-        return True
+        valid = [False] * len(edges_to_validate)
+        for k in candidates:
+            valid[k] = True
+        return valid
+
+    def valid_nav_pairs(self, pairs: list[tuple[int, int]], near: Optional[list[int]] = None) -> list[tuple[int, int]]:
+        """
+        Returns the index pairs of nav_points whose connections are valid nav edges.
+
+        If the indices of the nav_points near the pairs are given, only those are checked for lying on the edges.
+        """
+        edges = [Edge(self.nav_points[i], self.nav_points[j]) for i, j in pairs]
+        return [pair for pair, valid in zip(pairs, self._valid_nav_edges(edges, near)) if valid]
 
-    def _collect_nav_edges(self):
+    def _node(self, index: int) -> Point:
+        """
+        Returns the node with the given index into the nav_points followed by the doors.
+        """
+        return self.nav_points[index] if index < len(self.nav_points) else self.doors[index - len(self.nav_points)]
+
+    def _add_nav_edge(self, i: int, j: int, edge: Optional[Edge] = None):
+        """
+        Adds the nav_edge between two nodes given by their indices into the nav_points followed by the doors.
+        """
+        if isinstance(self.nav_edges, EdgeStore):
+            self.nav_edges.append(i, j)
+        else:
+            self.nav_edges.append(edge if edge is not None else Edge(self._node(i), self._node(j)))
+
+    def _collect_nav_edges(self, tile_size: Optional[float] = None, workers: int = 1,
+                           memory_budget: Optional[int] = None, nearest: Optional[int] = None):
         """
         Connects all pairwise combinations of the nav_points if the connection is valid.
         A valid connection lies completely in the virtual room and does not cut any edge.
+
+        If a tile size is given, only nav_points sharing a tile are connected (see `core.tiling`).
+        If a number of nearest nav_points is given, only those are connected (see `_collect_nearest_nav_edges`).
+        If a memory budget is given, the nav_edges are spilled to disk beyond it (see `core.edge_store`).
         """
-        # find all inner nav points
-        for i in range(len(self.nav_points) - 1):
-            for j in range(i + 1, len(self.nav_points)):
-                possible_nav_edge = Edge(self.nav_points[i], self.nav_points[j])
-                if self._valid_nav_edge(possible_nav_edge):
-                    self.nav_edges.append(possible_nav_edge)
-        # connect virtual doors with real doors
+        if memory_budget is not None:
+            self.nav_edges = EdgeStore(self.nav_points + self.doors, memory_budget)
+        if nearest is not None:
+            self._collect_nearest_nav_edges(nearest)
+        elif tile_size is None:
+            # find all inner nav points (one batch per nav point)
+            for i in range(len(self.nav_points) - 1):
+                possible_nav_edges = [Edge(self.nav_points[i], self.nav_points[j])
+                                      for j in range(i + 1, len(self.nav_points))]
+                for j, (possible_nav_edge, valid) in enumerate(zip(possible_nav_edges,
+                                                                   self._valid_nav_edges(possible_nav_edges)), i + 1):
+                    if valid:
+                        self._add_nav_edge(i, j, possible_nav_edge)
+        else:
+            self._collect_tiled_nav_edges(tile_size, workers)
+        # connect virtual doors with real doors (the virtual doors are the first nav_points)
         for i in range(len(self.doors)):
-            self.nav_edges.append(Edge(self.doors[i], self.virtual_doors[i]))
+            self._add_nav_edge(len(self.nav_points) + i, i)
+
+    def _tile_grid(self, tile_size: float) -> tuple[float, float, int, int]:
+        """
+        Returns the tile grid covering the virtual boundary, which the portal points and the tiles share.
+        """
+        return tiling.tile_grid(self.virtual_boundary.points, tile_size)
+
+    def _collect_tiled_nav_edges(self, tile_size: float, workers: int):
+        """
+        Connects the pairwise combinations of the nav_points that share a spatial tile if the connection is valid.
+        The tiles are validated in parallel worker processes if more than one worker is requested.
+
+        The pairs are created tile by tile and only checked against the nav_points of their tile. At most two tiles
+        per worker are pending at once, so that the pairs of all tiles are never held in memory.
+        The valid pairs are sorted, unless they are spilled to disk; they are then added tile by tile instead.
+        """
+        tiles = tiling.tile_pairs(self.nav_points, self._tile_grid(tile_size), tile_size, tile_size * tile_overlap)
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer=tiling.init_worker, initargs=(self,)) as executor:
+                self._add_valid_pairs(self._bounded_map(executor, tiles, 2 * workers))
+        else:
+            self._add_valid_pairs(self.valid_nav_pairs(pairs, near) for pairs, near in tiles)
+
+    @staticmethod
+    def _bounded_map(executor, tiles, window: int):
+        """
+        Yields the valid pairs of the tiles validated by the workers in order, with at most window tiles pending.
+        """
+        pending = deque()
+        for pairs, near in tiles:
+            pending.append(executor.submit(tiling.valid_pairs, pairs, near))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _collect_nearest_nav_edges(self, nearest: int):
+        """
+        Connects every nav_point to its given number of nearest nav_points in each of `nearest_sectors` angular
+        sectors around it if the connection is valid.
+
+        The nearest nav_points are found with a `KDTree`, so that the number of checked connections is linear in the
+        number of nav_points. Every connection is still checked against all nav_points and polygon edges like in the
+        full visibility graph, so the total cost is O(n·k·(n + e)) for n nav_points, k nearest nav_points per sector,
+        and e polygon edges, instead of O(n²·(n + e)). The connections are validated batch by batch and never all
+        created at once.
+
+        Paths may get longer than in the full visibility graph (see `core.stretch`), but no route is lost. If a part
+        of the nav_points is connected to the others in the full visibility graph, its shortest such connection leads
+        from one of its nav_points to the nearest visible nav_point in one of the sectors around it (for sectors of
+        less than 60°). So while the nav_points are left in separate parts, the sectors of the nav_points outside the
+        largest part without a visible one among their nearest nav_points are searched further, with twice as many
+        nav_points each round, until a visible one is found or all nav_points of the sector are checked. The search
+        stops as soon as all parts are joined, or when the remaining parts are known to be apart in the room, and
+        only the nav_points hidden behind walls in these sectors add to the cost, instead of all pairs of nav_points
+        in different parts. Sectors inside the walls at a nav_point are never searched.
+        """
+        tree = KDTree(self.nav_points)
+        blocked = self._blocked_sectors()
+        # the squared distance up to which every sector around every nav_point is searched (infinite once all its
+        # nav_points are found), and whether a visible nav_point is found within it
+        reach = array('d', [math.inf]) * (len(self.nav_points) * nearest_sectors)
+        visible = bytearray(len(self.nav_points) * nearest_sectors)
+        # the found nav_points of every nav_point in both directions, as compact arrays
+        neighbours = [array('i') for _ in self.nav_points]
+        for i in range(len(self.nav_points)):
+            for j in self._search_sectors(tree, i, nearest, reach, blocked):
+                neighbours[i].append(j)
+                neighbours[j].append(i)
+        # the representative of the connected part of every nav_point
+        parts = list(range(len(self.nav_points)))
 
-    def find_paths(self, nat_dist: float, sharp_angle: float) -> tuple[list[Point], list[Edge]]:
+        def part(i: int) -> int:
+            while parts[i] != i:
+                parts[i] = parts[parts[i]]
+                i = parts[i]
+            return i
+
+        def join(valid_pairs):
+            for pairs in valid_pairs:
+                for i, j in pairs:
+                    parts[part(i)] = part(j)
+                    for a, b in ((i, j), (j, i)):
+                        cell = self._sector_cell(a, b)
+                        if self._squared_distance(a, b) <= reach[cell]:
+                            visible[cell] = True
+                yield pairs
+
+        self._add_valid_pairs(join(self.valid_nav_pairs(pairs) for pairs in self._nearest_batches(neighbours)))
+        k = nearest
+        while True:
+            sizes = Counter(part(i) for i in range(len(self.nav_points)))
+            if len(sizes) <= 1:
+                break
+            largest = sizes.most_common(1)[0][0]
+            hidden = [i for i in range(len(self.nav_points))
+                      if part(i) != largest and any(not visible[c] and not blocked[c] and reach[c] < math.inf
+                                                    for c in range(i * nearest_sectors, (i + 1) * nearest_sectors))]
+            if not hidden:
+                # the nearest visible nav_points of all smaller parts are found, the parts are apart in the room
+                break
+            k *= 2
+            pairs = set()
+            for i in hidden:
+                searched = reach[i * nearest_sectors:(i + 1) * nearest_sectors]
+                for j in self._search_sectors(tree, i, k, reach, blocked):
+                    cell = self._sector_cell(i, j)
+                    if not visible[cell] and self._squared_distance(i, j) > searched[cell % nearest_sectors]:
+                        pairs.add((min(i, j), max(i, j)))
+            # every new pair is checked, but known ones are not added again
+            pairs = sorted(pairs)
+            known = {(i, j) for i, j in pairs if j in neighbours[i]}
+            for i, j in pairs:
+                neighbours[i].append(j)
+                neighbours[j].append(i)
+            batches = (self.valid_nav_pairs(pairs[start:start + len(self.nav_points)])
+                       for start in range(0, len(pairs), len(self.nav_points)))
+            self._add_valid_pairs([pair for pair in valid if pair not in known] for valid in join(batches))
+
+    def _squared_distance(self, i: int, j: int) -> float:
+        """
+        Returns the squared distance between two nav_points given by their indices.
+        """
+        dx, dy = self.nav_points[j].x - self.nav_points[i].x, self.nav_points[j].y - self.nav_points[i].y
+        return dx * dx + dy * dy
+
+    def _sector_cell(self, i: int, j: int) -> int:
+        """
+        Returns the index of the sector of a nav_point j around a nav_point i among the `nearest_sectors` sectors of
+        all nav_points.
+        """
+        dx, dy = self.nav_points[j].x - self.nav_points[i].x, self.nav_points[j].y - self.nav_points[i].y
+        return i * nearest_sectors + angular_sector(dx, dy, nearest_sectors)
+
+    def _search_sectors(self, tree: KDTree, i: int, k: int, reach: array, blocked: bytearray) -> list[int]:
+        """
+        Returns the k nearest nav_points in each sector around a nav_point that is not blocked, and sets how far each
+        of its sectors is searched: up to the k-th nearest nav_point, or everything if the sector has fewer nav_points.
+        """
+        found = tree.nearest_in_sectors(self.nav_points[i], k, nearest_sectors)
+        cells: dict[int, list[float]] = {}
+        for j in found:
+            cells.setdefault(self._sector_cell(i, j), []).append(self._squared_distance(i, j))
+        for cell in range(i * nearest_sectors, (i + 1) * nearest_sectors):
+            distances = cells.get(cell, [])
+            reach[cell] = max(distances) if len(distances) == k else math.inf
+        return [j for j in found if not blocked[self._sector_cell(i, j)]]
+
+    def _blocked_sectors(self) -> bytearray:
+        """
+        Returns for every sector around every nav_point whether it lies inside the corner of the walls at the
+        nav_point, so that no other nav_point in it is visible.
+        """
+        corners = {}
+        for polygon in [self.virtual_boundary] + self.virtual_barriers:
+            for corner in polygon.corners:
+                if corner.angle > 180:
+                    corners[(corner.pt.x, corner.pt.y)] = corner
+        blocked = bytearray(len(self.nav_points) * nearest_sectors)
+        for i, nav_point in enumerate(self.nav_points):
+            corner = corners.get((nav_point.x, nav_point.y))
+            if corner is None:
+                continue
+            # the walls fill the angle of less than 180° from one neighbouring corner counterclockwise to the other
+            ax, ay = corner.e1.p1.x - nav_point.x, corner.e1.p1.y - nav_point.y
+            bx, by = corner.e2.p2.x - nav_point.x, corner.e2.p2.y - nav_point.y
+            if ax * by - ay * bx < 0:
+                ax, ay, bx, by = bx, by, ax, ay
+            first, last = angular_sector(ax, ay, nearest_sectors), angular_sector(bx, by, nearest_sectors)
+            # only the sectors strictly between the ones of both walls lie completely inside
+            if (last - first) % nearest_sectors <= nearest_sectors // 2:
+                for step in range(1, (last - first) % nearest_sectors):
+                    blocked[i * nearest_sectors + (first + step) % nearest_sectors] = True
+        return blocked
+
+    def _nearest_batches(self, neighbours: list[array]):
+        """
+        Yields the distinct pairs of neighbouring nav_points in order, in batches of about one pair per nav_point.
+        """
+        batch = []
+        for i, found in enumerate(neighbours):
+            batch += [(i, j) for j in sorted(set(found)) if j > i]
+            if len(batch) >= len(self.nav_points):
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _add_valid_pairs(self, valid_pairs):
+        """
+        Adds the nav_edges of the valid pairs of nav_points of every tile.
+        """
+        if not isinstance(self.nav_edges, EdgeStore):
+            valid_pairs = [sorted(pair for pairs in valid_pairs for pair in pairs)]
+        for pairs in valid_pairs:
+            for i, j in pairs:
+                self._add_nav_edge(i, j)
+
+    def find_paths(self, nat_dist: float, sharp_angle: float, tile_size: Optional[float] = None, workers: int = 1,
+                   backend: Optional[Union[str, GeometryBackend]] = None,
+                   memory_budget: Optional[int] = None, nearest: Optional[int] = None,
+                   split_virtual: bool = False) -> tuple[list[Point], Union[list[Edge], EdgeStore]]:
         """
         Calculates the navigation mesh (path graph) for the room according to the given values.
+
+        The geometric checks are done by the given backend or the global default one (see `core.geometry_backend`).
+
+        For very large open rooms a tile size can be given. The room is then split into overlapping tiles that are
+        stitched by portal points, which keeps the visibility step tractable. Paths may get longer by at most
+        `portal_spacing` per crossed tile border (see `core.tiling`).
+
+        For the largest rooms a memory budget in bytes can be given. The nav_edges are then kept as an `EdgeStore`
+        of compact index pairs that spills them to a temporary file beyond the budget (see `core.edge_store`).
+
+        For quick previews a number of nearest nav_points can be given instead of a tile size. Every nav_point is then
+        only connected to that many nearest nav_points per angular sector, so that the number of checked connections
+        grows linearly instead of quadratically (each of them is still checked against all walls). Parts of the
+        room left apart by these connections are joined by searching further where walls hide the nearest nav_points
+        (see `_collect_nearest_nav_edges`). The stretch of the paths can be measured with `core.stretch`.
+
+        For a large natural distance or narrow corridors the virtual polygons can fold over themselves. With
+        `split_virtual` they are split into valid pieces (see `core.sweep_line`), and an error is raised if the doors
+        are not all in the same piece of the virtual boundary.
         """
+        if tile_size is not None and nearest is not None:
+            raise RuntimeError('Paths can either be found in tiles or between nearest nav_points, not both')
+        self.backend = get_backend(backend)
+        # the door distances of former results are outdated
+        self.door_distances = None
+        self.door_predecessors = None
         # calculate virtual polygons
-        self._virtualize(nat_dist, sharp_angle)
+        self._virtualize(nat_dist, sharp_angle, split_virtual)
         # collect navigation points
-        self._collect_nav_points()
+        self._collect_nav_points(tile_size)
         # connect all points if valid
-        self._collect_nav_edges()
+        self._collect_nav_edges(tile_size, workers, memory_budget, nearest)
         # return points and paths
         return self.nav_points, self.nav_edges
 
+    def compute_paths(self, nat_dist: float, sharp_angle: float, tile_size: Optional[float] = None,
+                      backend: Optional[Union[str, GeometryBackend]] = None,
+                      memory_budget: Optional[int] = None, nearest: Optional[int] = None,
+                      split_virtual: bool = False) -> RoomPaths:
+        """
+        Calculates the same results as `find_paths`, but returns them as a new object instead of setting them.
+
+        Neither the room nor its polygons and doors are modified, so that rooms (even rooms sharing polygons) can be
+        calculated on several threads at once (see `core.batch_runner.compute_paths_threaded`). The tiles are always
+        validated in the calling thread.
+        """
+        scratch = Room(self.boundary, self.barriers, self.doors)
+        scratch.find_paths(nat_dist, sharp_angle, tile_size, backend=backend, memory_budget=memory_budget,
+                           nearest=nearest, split_virtual=split_virtual)
+        return RoomPaths(scratch.virtual_boundary, scratch.virtual_barriers, scratch.virtual_doors,
+                         scratch.nav_points, scratch.nav_edges, self.doors)
+
+    def find_mesh(self, nat_dist: float, sharp_angle: float,
+                  backend: Optional[Union[str, GeometryBackend]] = None, split_virtual: bool = False) -> NavMesh:
+        """
+        Calculates the navigation mesh for the room according to the given values, as an alternative to the
+        visibility graph of `find_paths`.
+
+        The free space is triangulated instead of connecting all pairs of nav_points, so that memory and build time
+        grow near-linearly with the number of walls. Routes are searched with `NavMesh.route` (see `core.navmesh`).
+        The virtual polygons are split like in `find_paths`.
+        """
+        self.backend = get_backend(backend)
+        self._virtualize(nat_dist, sharp_angle, split_virtual)
+        self.nav_mesh = NavMesh(self)
+        return self.nav_mesh
+
+    def door_distance_matrix(self, with_paths: bool = False) -> array:
+        """
+        Calculates the shortest distances between all pairs of doors after `find_paths`, as a flat array with one
+        row per door (see `door_distance`).
+
+        Routing through the room then only needs a lookup. With paths, the predecessors of the shortest paths
+        from every door are kept as well, so that `door_path` can reconstruct them.
+        """
+        graph = NavGraph.from_room(self)
+        door_nodes = [len(self.nav_points) + i for i in range(len(self.doors))]
+        self.door_distances = array('d')
+        self.door_predecessors = array('i') if with_paths else None
+        for door_node in door_nodes:
+            dist, prev_edge = graph.dijkstra({door_node: 0.}, None if with_paths else set(door_nodes))
+            self.door_distances.extend(dist[node] for node in door_nodes)
+            if with_paths:
+                predecessors = array('i', [-1] * len(graph))
+                for node, edge in enumerate(prev_edge):
+                    if edge is not None:
+                        u, v, _ = graph.edges[edge]
+                        predecessors[node] = u if v == node else v
+                self.door_predecessors.extend(predecessors)
+        return self.door_distances
+
+    def door_distance(self, door1: int, door2: int) -> float:
+        """
+        Returns the shortest distance between two doors (given by their index).
+
+        Requires `door_distance_matrix` to be calculated.
+        """
+        if self.door_distances is None:
+            raise ValueError('The door distances are not calculated, call door_distance_matrix first')
+        return self.door_distances[door1 * len(self.doors) + door2]
+
+    def door_path(self, door1: int, door2: int) -> list[Point]:
+        """
+        Returns the points of the shortest path between two doors (given by their index).
+
+        Requires `door_distance_matrix` to be calculated with paths.
+        """
+        if self.door_predecessors is None:
+            raise ValueError('The door paths are not calculated, call door_distance_matrix with paths first')
+        if math.isinf(self.door_distance(door1, door2)):
+            return []
+        nodes = self.nav_points + self.doors
+        offset = door1 * len(nodes)
+        path = [len(self.nav_points) + door2]
+        while self.door_predecessors[offset + path[-1]] != -1:
+            path.append(self.door_predecessors[offset + path[-1]])
+        return [nodes[i] for i in reversed(path)]
+
+    def to_dict(self) -> dict:
+        """
+        Returns the input geometry of the room as a dictionary of plain coordinate lists (e.g. for JSON).
+        """
+        return {
+            'boundary': [[p.x, p.y] for p in self.boundary.points],
+            'barriers': [[[p.x, p.y] for p in barrier.points] for barrier in self.barriers],
+            'doors': [[p.x, p.y] for p in self.doors],
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'Room':
+        """
+        Creates a room from a dictionary as returned by `to_dict`.
+        """
+        boundary = Polygon([Point(x, y) for x, y in data['boundary']])
+        barriers = [Polygon([Point(x, y) for x, y in barrier], False) for barrier in data['barriers']]
+        doors = [Point(x, y) for x, y in data['doors']]
+        return Room(boundary, barriers, doors)
+
+    def paths_to_dict(self, with_nav_edges: bool = True) -> dict:
+        """
+        Returns the results of `find_paths` (and `door_distance_matrix`) as a dictionary of coordinates and indices.
+
+        The nav_edges are stored as index pairs into the nav_points followed by the doors. Unreachable doors have no
+        distance (None), since JSON has no infinity. The nav_edges of an `EdgeStore` are all read into the dictionary,
+        use `write_paths` to write them chunk by chunk instead.
+        """
+        data = {
+            'virtual_boundary': [(p.x, p.y) for p in self.virtual_boundary.points],
+            'virtual_barriers': [[(p.x, p.y) for p in barrier.points] for barrier in self.virtual_barriers],
+            'virtual_doors': [(p.x, p.y) for p in self.virtual_doors],
+            'nav_points': [(p.x, p.y) for p in self.nav_points],
+            'door_distances': [None if math.isinf(d) else d for d in self.door_distances]
+            if self.door_distances is not None else None,
+            'door_predecessors': self.door_predecessors.tolist() if self.door_predecessors is not None else None,
+        }
+        if with_nav_edges:
+            if isinstance(self.nav_edges, EdgeStore):
+                data['nav_edges'] = list(self.nav_edges.pairs())
+            else:
+                node_index = {id(p): i for i, p in enumerate(self.nav_points + self.doors)}
+                data['nav_edges'] = [(node_index[id(e.p1)], node_index[id(e.p2)]) for e in self.nav_edges]
+        return data
+
+    def write_paths(self, file: TextIO):
+        """
+        Writes the results of `find_paths` as JSON of `paths_to_dict` to a text file.
+
+        The nav_edges of an `EdgeStore` are written chunk by chunk, so that they are never all held in memory.
+        """
+        if not isinstance(self.nav_edges, EdgeStore):
+            json.dump(self.paths_to_dict(), file)
+            return
+        # the other results are written first, the closing brace is written after the nav_edges
+        file.write(json.dumps(self.paths_to_dict(with_nav_edges=False))[:-1] + ', "nav_edges": [')
+        separator = ''
+        for chunk in self.nav_edges.chunks():
+            if chunk:
+                file.write(separator + ', '.join(f'[{chunk[k]}, {chunk[k + 1]}]' for k in range(0, len(chunk), 2)))
+                separator = ', '
+        file.write(']}')
+
+    def restore_paths(self, data: dict, memory_budget: Optional[int] = None):
+        """
+        Restores the results of `find_paths` (and `door_distance_matrix`) from a dictionary of `paths_to_dict`.
+
+        If a memory budget is given, the nav_edges are restored into an `EdgeStore` like in `find_paths`.
+        """
+        self.virtual_boundary = Polygon([Point(x, y) for x, y in data['virtual_boundary']])
+        self.virtual_barriers = [Polygon([Point(x, y) for x, y in barrier], False)
+                                 for barrier in data['virtual_barriers']]
+        self.virtual_doors = [Point(x, y) for x, y in data['virtual_doors']]
+        self.nav_points = [Point(x, y) for x, y in data['nav_points']]
+        nodes = self.nav_points + self.doors
+        if memory_budget is not None:
+            self.nav_edges = EdgeStore(nodes, memory_budget)
+            for i, j in data['nav_edges']:
+                self.nav_edges.append(i, j)
+        else:
+            self.nav_edges = [Edge(nodes[i], nodes[j]) for i, j in data['nav_edges']]
+        self.door_distances = array('d', [math.inf if d is None else d for d in data['door_distances']]) \
+            if data.get('door_distances') is not None else None
+        self.door_predecessors = array('i', data['door_predecessors']) \
+            if data.get('door_predecessors') is not None else None
+
     @staticmethod
     def sample() -> 'Room':
         """
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from core.room import Room
+from core.std_vals import *
+
+
+class RoomCache:
+    """
+    A class to represent a persistent on-disk cache for the results of `Room.find_paths`.
+
+    Every result is stored as a JSON file named after a stable hash of the room geometry, the path finding
+    parameters, and the library version. JSON is used instead of pickle, so that a shared directory can never execute
+    code when a result is loaded. If the files exceed the size limit, the least recently used ones are deleted.
+
+    Several processes can share a directory: every result is written to its own temporary file and then moved into
+    place, so readers never see a partial result. The size and the usage order are tracked by an index of the
+    instance, built from the directory on creation and updated by its own reads and writes, so that an eviction does
+    not list the directory. The statistics (size, hits and misses) are per instance and do not include other
+    processes.
+
+    Args
+    ----
+    directory : str
+        The directory the cached results are stored in. It is created if it does not exist.
+    max_size : int
+        The maximum size of all cached results in bytes.
+
+    Attributes
+    ----------
+    directory : str
+        The directory the cached results are stored in.
+    max_size : int
+        The maximum size of all cached results in bytes.
+    size : int
+        The current size of all cached results in bytes, as known to this instance.
+    hits : int
+        The number of lookups of this instance that found a cached result.
+    misses : int
+        The number of lookups of this instance that found no cached result.
+    """
+
+    suffix = '.room'
+
+    def __init__(self, directory: str, max_size: int = 2 ** 30):
+        self.directory: str = directory
+        self.max_size: int = max_size
+        os.makedirs(self.directory, exist_ok=True)
+        # the sizes of the cached results, from the least recently used one on
+        self._index: OrderedDict[str, int] = OrderedDict(
+            (path, os.path.getsize(path)) for path in sorted(self._files(), key=os.path.getmtime))
+        self.size: int = sum(self._index.values())
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f'RoomCache({self.directory}): {len(self)} rooms, {self.size} bytes, hit rate {self.hit_rate:.1%}'
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Returns the share of lookups that found a cached result.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    @staticmethod
+    def key(room: Room, nat_dist: float, sharp_angle: float, **options) -> str:
+        """
+        Calculates a stable hash of everything the results of `find_paths` depend on.
+        """
+        content = {
+            'room': room.to_dict(),
+            'nat_dist': nat_dist,
+            'sharp_angle': sharp_angle,
+            'options': options,
+            'version': library_version,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """
+        Returns the file path of a cached result.
+        """
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _files(self) -> list[str]:
+        """
+        Returns the file paths of all cached results.
+        """
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(self.suffix)]
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the cached result for a key or None if there is none.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+            # mark as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        if path in self._index:
+            self._index.move_to_end(path)
+        else:
+            # written by another process
+            self._index[path] = os.path.getsize(path)
+            self.size += self._index[path]
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: dict):
+        """
+        Stores a result for a key and evicts the least recently used results if the cache gets too big.
+        """
+        self._put(key, lambda file: json.dump(data, file))
+
+    def _put(self, key: str, write):
+        """
+        Stores the result written to a text file by the given function for a key (see `put`).
+        """
+        path = self._path(key)
+        # write to a temporary file of its own first, so that readers never see a partial result
+        handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'w') as file:
+                write(file)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.size -= self._index.pop(path, 0)
+        self._index[path] = os.path.getsize(path)
+        self.size += self._index[path]
+        self._evict()
+
+    def _evict(self):
+        """
+        Deletes the least recently used results until the cache fits its size limit.
+        """
+        while self.size > self.max_size and self._index:
+            path, size = self._index.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already evicted by another process
+                pass
+
+    def clear(self):
+        """
+        Deletes all cached results and resets the statistics.
+        """
+        for path in self._files():
+            os.remove(path)
+        self._index.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def find_paths(self, room: Room, nat_dist: float, sharp_angle: float, **options):
+        """
+        Restores the results of `room.find_paths` from the cache, or calculates and caches them.
+
+        Further keyword options are passed to `find_paths` and are part of the key, except for the number of workers,
+        the geometry backend, and the memory budget that do not change the results.
+        """
+        key_options = {k: v for k, v in options.items() if k not in ('workers', 'backend', 'memory_budget')}
+        key = self.key(room, nat_dist, sharp_angle, **key_options)
+        data = self.get(key)
+        if data is not None:
+            room.restore_paths(data, options.get('memory_budget'))
+        else:
+            room.find_paths(nat_dist, sharp_angle, **options)
+            # the nav_edges of a memory budget are written chunk by chunk
+            self._put(key, room.write_paths)
+        return room.nav_points, room.nav_edges
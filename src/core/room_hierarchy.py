@@ -0,0 +1,126 @@
+import heapq
+import math
+from typing import Optional
+
+from core.nav_graph import NavGraph
+
+
+class RoomHierarchy:
+    """
+    A class to represent a two level hierarchy over the navigation graph of a large room for fast exact routing.
+
+    The nodes are grouped into square spatial clusters. The coarse level stores the shortest distance between every
+    pair of clusters (between their closest nodes), precomputed by one multi-source search per cluster. A query looks
+    up the coarse distances from every cluster to the cluster of its end node and uses them (together with the
+    straight-line distance) as lower bounds of an A* search on the full graph. Only nodes whose clusters lie on a
+    corridor that may still beat the best path are refined, the rest of the room is never touched.
+
+    The coarse distances never overestimate, so the paths are exact. Unlike an overlay of cluster portals (as
+    `Building` uses for doors), this does not degenerate on visibility graphs, where almost every node has an edge
+    leaving its cluster.
+
+    The coarse distances are taken from the open graph. Closures (see `core.closures`) of `graph` only make routes
+    longer, so the bounds stay valid and the search honors them like `NavGraph.dijkstra`.
+
+    Args
+    ----
+    room : Room
+        The room after `find_paths`.
+    cluster_size : float, optional
+        The side length of a cluster. It is derived so that there are about as many clusters as nodes per cluster if
+        not given.
+
+    Attributes
+    ----------
+    graph : NavGraph
+        The navigation graph of the room, with the nav_points followed by the doors as nodes.
+    cluster_size : float
+        The side length of a cluster.
+    clusters : list[list[int]]
+        The nodes of every cluster.
+    node_clusters : list[int]
+        The cluster of every node.
+    coarse : list[list[float]]
+        The shortest distance between every pair of clusters, infinite if they are not connected.
+    """
+
+    def __init__(self, room, cluster_size: Optional[float] = None):
+        if room.virtual_boundary is None:
+            raise RuntimeError(f'Paths of room {room} must be calculated before it can be clustered')
+        self.graph: NavGraph = NavGraph.from_room(room)
+        self.cluster_size: float = cluster_size if cluster_size is not None else self._default_cluster_size()
+        cells: dict[tuple[int, int], int] = {}
+        self.clusters: list[list[int]] = []
+        self.node_clusters: list[int] = []
+        for node, p in enumerate(self.graph.points):
+            cell = math.floor(p.x / self.cluster_size), math.floor(p.y / self.cluster_size)
+            if cell not in cells:
+                cells[cell] = len(self.clusters)
+                self.clusters.append([])
+            self.node_clusters.append(cells[cell])
+            self.clusters[cells[cell]].append(node)
+        self.coarse: list[list[float]] = [self._cluster_distances(nodes) for nodes in self.clusters]
+
+    def __repr__(self) -> str:
+        return f'RoomHierarchy: {len(self.clusters)} clusters of {self.graph}'
+
+    def _default_cluster_size(self) -> float:
+        """
+        Calculates a cluster size so that there are about as many clusters as nodes per cluster.
+        """
+        xs, ys = [p.x for p in self.graph.points], [p.y for p in self.graph.points]
+        extent = max(max(xs) - min(xs), max(ys) - min(ys), 1.)
+        return extent / max(len(self.graph.points) ** 0.25, 1.)
+
+    def _cluster_distances(self, nodes: list[int]) -> list[float]:
+        """
+        Calculates the shortest distance from the given nodes to the closest node of every cluster.
+        """
+        dist, _ = self.graph.dijkstra({node: 0. for node in nodes})
+        distances = [math.inf] * len(self.clusters)
+        for node, d in enumerate(dist):
+            cluster = self.node_clusters[node]
+            if d < distances[cluster]:
+                distances[cluster] = d
+        return distances
+
+    def lower_bound(self, node: int, target: int) -> float:
+        """
+        Returns a lower bound of the length of the shortest path between two nodes, infinite if there is none.
+        """
+        p, q = self.graph.points[node], self.graph.points[target]
+        return max(self.coarse[self.node_clusters[target]][self.node_clusters[node]], math.hypot(p.x - q.x, p.y - q.y))
+
+    def shortest_path(self, source: int, target: int) -> tuple[float, list[int]]:
+        """
+        Calculates the length and the node indices of the shortest path between two nodes of the room graph.
+
+        Returns an infinite length and no nodes if the target cannot be reached.
+        """
+        graph = self.graph
+        node_closures, edge_closures, lengths = graph.node_closures, graph.edge_closures, graph.edges.lengths
+        if node_closures[source] or node_closures[target]:
+            return math.inf, []
+        dist = [math.inf] * len(graph.points)
+        prev_edge: list[Optional[int]] = [None] * len(graph.points)
+        dist[source] = 0.
+        queue = [(self.lower_bound(source, target), 0., source)]
+        while queue:
+            _, d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if u == target:
+                return d, graph.path_to(prev_edge, target)
+            neighbours = iter(graph.adjacency[u])
+            for v, e in zip(neighbours, neighbours):
+                if edge_closures[e] or node_closures[v]:
+                    continue
+                new_dist = d + lengths[e]
+                if new_dist < dist[v]:
+                    bound = self.lower_bound(v, target)
+                    if math.isinf(bound):
+                        continue
+                    dist[v] = new_dist
+                    prev_edge[v] = e
+                    heapq.heappush(queue, (new_dist + bound, new_dist, v))
+        return math.inf, []
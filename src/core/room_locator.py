@@ -0,0 +1,375 @@
+import math
+from typing import Optional
+
+from core.closures import ClosureLayer
+from core.edge import Edge
+from core.nav_graph import NavGraph
+from core.point import Point
+from core.polygon import Polygon
+from core.segment_grid import SegmentGrid
+from core.std_vals import *
+
+
+def _band(length: float) -> float:
+    """
+    Returns the distance to an edge of the given length within which the exact predicates of `Edge` must decide.
+    """
+    # the predicates of `Edge` and `Beam` compare directions, so their tolerance grows with the edge length
+    return 2 * std_tolerance * max(length, 1.) + std_tolerance
+
+
+def _normal(edge: Edge) -> tuple[float, float, float]:
+    """
+    Returns the unit normal (to the left) and the offset of the line of an edge.
+
+    The signed distance of a point (x y) to the line is then nx * x + ny * y - offset.
+    """
+    dx, dy = edge.p2.x - edge.p1.x, edge.p2.y - edge.p1.y
+    length = math.hypot(dx, dy)
+    nx, ny = -dy / length, dx / length
+    return nx, ny, nx * edge.p1.x + ny * edge.p1.y
+
+
+def _distance_to_edge(point: Point, edge: Edge) -> float:
+    """
+    Calculates the euclidean distance of a point to an edge.
+    """
+    dx, dy = edge.p2.x - edge.p1.x, edge.p2.y - edge.p1.y
+    t = ((point.x - edge.p1.x) * dx + (point.y - edge.p1.y) * dy) / (dx * dx + dy * dy)
+    t = min(max(t, 0.), 1.)
+    return math.hypot(edge.p1.x + t * dx - point.x, edge.p1.y + t * dy - point.y)
+
+
+class _PreparedPolygon:
+    """
+    A class to represent a virtual polygon of a room with a spatial index for fast point checks.
+
+    Args
+    ----
+    polygon : Polygon
+        The polygon to prepare.
+
+    Attributes
+    ----------
+    polygon : Polygon
+        The prepared polygon.
+    grid : SegmentGrid
+        The spatial index over the polygon edges.
+    bands : list[float]
+        The distance to every edge within which the exact predicates of `Polygon` must decide.
+    x_min, y_min, x_max, y_max : float
+        The bounding box of the polygon.
+    """
+
+    def __init__(self, polygon: Polygon):
+        self.polygon: Polygon = polygon
+        self.grid: SegmentGrid = SegmentGrid(polygon.edges)
+        self.bands: list[float] = [_band(edge.length) for edge in polygon.edges]
+        self.x_min: float = min(p.x for p in polygon.points)
+        self.y_min: float = min(p.y for p in polygon.points)
+        self.x_max: float = max(p.x for p in polygon.points)
+        self.y_max: float = max(p.y for p in polygon.points)
+
+    def in_box(self, point: Point, margin: float) -> bool:
+        """
+        Checks if a point lies within the bounding box extended by a margin.
+        """
+        return self.x_min - margin <= point.x <= self.x_max + margin \
+            and self.y_min - margin <= point.y <= self.y_max + margin
+
+    def _locate(self, point: Point) -> Optional[bool]:
+        """
+        Checks if a point is inside the polygon by counting the edges crossed by a beam to the right.
+
+        Returns None if the point or the beam come so close to the outline that the exact predicates must decide.
+        """
+        band = max(self.bands)
+        crossings = 0
+        for i in self.grid.query_box(point.x - band, point.y - band, self.x_max + band, point.y + band):
+            edge = self.grid.edges[i]
+            p1, p2 = edge.p1, edge.p2
+            if max(p1.x, p2.x) < point.x - band or not min(p1.y, p2.y) - band <= point.y <= max(p1.y, p2.y) + band:
+                continue
+            # the beam passes near a corner
+            for p in edge.points:
+                if p.x > point.x - band and abs(p.y - point.y) <= 2 * std_tolerance * max(p.x - point.x, 1.) + band:
+                    return None
+            # the point is near the edge
+            if _distance_to_edge(point, edge) <= self.bands[i]:
+                return None
+            if (p1.y > point.y) != (p2.y > point.y):
+                if p1.x + (point.y - p1.y) * (p2.x - p1.x) / (p2.y - p1.y) > point.x:
+                    crossings += 1
+        return crossings % 2 == 1
+
+    def surrounds_point(self, point: Point) -> bool:
+        """
+        Checks if a point is inside of the polygon (and not on it), like `Polygon.surrounds_point`.
+        """
+        if not self.in_box(point, max(self.bands)):
+            return False
+        inside = self._locate(point)
+        return self.polygon.surrounds_point(point) if inside is None else inside
+
+    def surrounds_or_hits_point(self, point: Point) -> bool:
+        """
+        Checks if a point lies on or is inside of the polygon, like `Polygon.surrounds_or_hits_point`.
+        """
+        if not self.in_box(point, max(self.bands)):
+            return False
+        inside = self._locate(point)
+        return self.polygon.surrounds_or_hits_point(point) if inside is None else inside
+
+
+class RoomLocator:
+    """
+    A class to represent a prepared index of a room for routing from and to arbitrary points after `find_paths`.
+
+    An arbitrary point (e.g. a desk or a GPS fix) is connected to all visible nav_points by temporary edges, with the
+    same checks `find_paths` uses for the nav_edges. The room itself is never changed.
+    The walls of the virtual polygons and the nav_points are indexed by a uniform grid, so that each check only looks
+    at nearby walls and nav_points. Clear cases are decided by plain float arithmetic, only cases within the
+    tolerance are decided by the exact predicates of `Edge`.
+
+    Before the nav_points are checked one by one, the walls around a point are visited ring by ring of grid cells.
+    A wall that clearly spans a whole angular sector around the point hides every nav_point of the sector behind it,
+    since the connection would clearly cross the wall. Only the nav_points in front of the closest such wall of their
+    sector are checked, so that a query only touches the part of the room that is visible from the point.
+
+    Args
+    ----
+    room : Room
+        The room after `find_paths`.
+    sectors : int
+        The number of equal angular sectors around a point used to skip hidden nav_points.
+
+    Attributes
+    ----------
+    room : Room
+        The indexed room.
+    graph : NavGraph
+        The navigation graph of the room, with the nav_points followed by the doors as nodes.
+    closures : ClosureLayer
+        The temporary closures of the graph. Routes never use closed nodes or run through closure zones.
+    """
+
+    def __init__(self, room, sectors: int = 128):
+        if room.virtual_boundary is None:
+            raise RuntimeError(f'Paths of room {room} must be calculated before it can be located')
+        self.room = room
+        self.sectors: int = sectors
+        self.graph: NavGraph = NavGraph.from_room(room)
+        self.closures: ClosureLayer = ClosureLayer(self.graph)
+        self._boundary: _PreparedPolygon = _PreparedPolygon(room.virtual_boundary)
+        self._barriers: list[_PreparedPolygon] = [_PreparedPolygon(barrier) for barrier in room.virtual_barriers]
+        self._walls: SegmentGrid = SegmentGrid([edge for polygon in [room.virtual_boundary] + room.virtual_barriers
+                                                for edge in polygon.edges])
+        # the coordinates, unit normal, offset, and band of every wall for the clear cases
+        self._wall_lines: list[tuple] = [(edge.p1.x, edge.p1.y, edge.p2.x, edge.p2.y) + _normal(edge) +
+                                         (_band(edge.length),) for edge in self._walls.edges]
+        # the nav_points use the same grid cells as the walls
+        self._point_cells: dict[tuple[int, int], list[int]] = {}
+        for i, p in enumerate(room.nav_points):
+            self._point_cells.setdefault(self._walls.cell(p.x, p.y), []).append(i)
+        # the barriers in every grid cell their bounding box (with the band) overlaps
+        self._barrier_cells: dict[tuple[int, int], list[int]] = {}
+        for k, barrier in enumerate(self._barriers):
+            band = max(barrier.bands)
+            i_min, j_min = self._walls.cell(barrier.x_min - band, barrier.y_min - band)
+            i_max, j_max = self._walls.cell(barrier.x_max + band, barrier.y_max + band)
+            for i in range(i_min, i_max + 1):
+                for j in range(j_min, j_max + 1):
+                    self._barrier_cells.setdefault((i, j), []).append(k)
+        # the largest band of any connection inside the room, which is at most as long as the diagonal of its box
+        boundary = self._boundary
+        self._max_band: float = _band(math.hypot(boundary.x_max - boundary.x_min, boundary.y_max - boundary.y_min))
+        # the range of the occupied grid cells
+        cells = list(self._walls.cells) + list(self._point_cells)
+        self._cell_range: tuple[int, int, int, int] = (min(i for i, _ in cells), min(j for _, j in cells),
+                                                       max(i for i, _ in cells), max(j for _, j in cells))
+
+    def __repr__(self) -> str:
+        return f'RoomLocator: {len(self.room.nav_points)} nav points, {len(self._walls)} walls'
+
+    def contains(self, point: Point) -> bool:
+        """
+        Checks if a point is suitable for navigation, i.e. on or inside the virtual boundary and not inside a barrier.
+        """
+        if not self._boundary.surrounds_or_hits_point(point):
+            return False
+        return not any(self._barriers[k].surrounds_point(point)
+                       for k in self._barrier_cells.get(self._walls.cell(point.x, point.y), ()))
+
+    def _hits_nav_point(self, edge: Edge, cells: list[tuple[int, int]], normal: tuple[float, float, float],
+                        band: float) -> bool:
+        """
+        Checks if an edge (running through the given grid cells) runs through a nav_point that is not one of its end
+        points.
+        """
+        nx, ny, offset = normal
+        found = set()
+        for cell in cells:
+            found.update(self._point_cells.get(cell, ()))
+        for i in found:
+            nav_point = self.room.nav_points[i]
+            if abs(nx * nav_point.x + ny * nav_point.y - offset) > band or nav_point in edge.points:
+                continue
+            if edge.contains_point(nav_point):
+                return True
+        return False
+
+    def _cuts_wall(self, edge: Edge, cells: list[tuple[int, int]], normal: tuple[float, float, float],
+                   band: float) -> bool:
+        """
+        Checks if an edge (running through the given grid cells) cuts a wall or a corner of the virtual polygons, like
+        `Polygon.cuts_edge`.
+        """
+        nx, ny, offset = normal
+        x1, y1, x2, y2 = edge.p1.x, edge.p1.y, edge.p2.x, edge.p2.y
+        for i in self._walls.query_cells(cells):
+            wx1, wy1, wx2, wy2, wnx, wny, wall_offset, wall_band = self._wall_lines[i]
+            wall_band = max(band, wall_band)
+            side1, side2 = nx * wx1 + ny * wy1 - offset, nx * wx2 + ny * wy2 - offset
+            # both wall ends clearly on the same side of the edge
+            if (side1 > wall_band and side2 > wall_band) or (side1 < -wall_band and side2 < -wall_band):
+                continue
+            side3, side4 = wnx * x1 + wny * y1 - wall_offset, wnx * x2 + wny * y2 - wall_offset
+            # both edge ends clearly on the same side of the wall
+            if (side3 > wall_band and side4 > wall_band) or (side3 < -wall_band and side4 < -wall_band):
+                continue
+            # clear crossing
+            if min(abs(side1), abs(side2), abs(side3), abs(side4)) > wall_band:
+                return True
+            # near cases
+            wall = self._walls.edges[i]
+            if Edge.intersection(wall, edge):
+                return True
+            for corner in wall.points:
+                if corner not in edge.points and edge.contains_point(corner):
+                    return True
+        return False
+
+    def is_visible(self, point1: Point, point2: Point) -> bool:
+        """
+        Checks if the connection between two points is suitable for navigation, like `Room._valid_nav_edge`.
+        """
+        if point1 == point2:
+            return True
+        edge = Edge(point1, point2)
+        band = _band(edge.length)
+        normal = _normal(edge)
+        # the edge must not cut any other nav_point, polygon point, or polygon edge
+        cells = self._walls.cells_of_segment(edge)
+        if self._hits_nav_point(edge, cells, normal, band) or self._cuts_wall(edge, cells, normal, band):
+            return False
+        # the edge must be inside the room and not inside a barrier
+        return self.contains(edge.middle_point)
+
+    def _rings(self, cell: tuple[int, int]) -> int:
+        """
+        Returns the number of rings of grid cells around a cell that cover all occupied cells.
+        """
+        i_min, j_min, i_max, j_max = self._cell_range
+        return max(cell[0] - i_min, i_max - cell[0], cell[1] - j_min, j_max - cell[1], 0)
+
+    def _hide_sectors(self, point: Point, wall: int, limits: list[float]):
+        """
+        Lowers the distances of the sectors around a point beyond which the given wall hides all nav_points.
+
+        A nav_point is hidden if the connection from the point clearly crosses the wall: both wall ends are clearly
+        off the connection on both sides, and the point and the nav_point are clearly on both sides of the wall.
+        """
+        x1, y1, x2, y2, nx, ny, offset, wall_band = self._wall_lines[wall]
+        # a little more than the band of any connection, so that rounding never hides a visible nav_point
+        band = max(self._max_band, wall_band) + std_tolerance
+        height = nx * point.x + ny * point.y - offset
+        if abs(height) <= band:
+            return
+        # the unit normal of the wall pointing away from the point
+        mx, my = (-nx, -ny) if height > 0 else (nx, ny)
+        angle1, angle2 = math.atan2(y1 - point.y, x1 - point.x), math.atan2(y2 - point.y, x2 - point.x)
+        distance1, distance2 = math.hypot(x1 - point.x, y1 - point.y), math.hypot(x2 - point.x, y2 - point.y)
+        span = (angle2 - angle1) % (2 * math.pi)
+        if span > math.pi:
+            angle1, distance1, distance2, span = angle2, distance2, distance1, 2 * math.pi - span
+        width = 2 * math.pi / self.sectors
+        for sector in range(math.ceil(angle1 / width), math.floor((angle1 + span) / width)):
+            low, high = sector * width, (sector + 1) * width
+            # the wall ends are clearly off every connection in the sector
+            if distance1 * min(math.sin(low - angle1), math.sin(high - angle1)) <= band or \
+                    distance2 * min(math.sin(angle1 + span - low), math.sin(angle1 + span - high)) <= band:
+                continue
+            # the distance beyond which the nav_points are clearly behind the wall
+            cosine = min(mx * math.cos(low) + my * math.sin(low), mx * math.cos(high) + my * math.sin(high))
+            limits[sector % self.sectors] = min(limits[sector % self.sectors], (abs(height) + band) / cosine)
+
+    def _candidates(self, point: Point, radius: Optional[float]) -> list[tuple[int, float]]:
+        """
+        Returns the indices of the nav_points that are not hidden by a wall from a point, with their distances.
+        """
+        limits = [math.inf] * self.sectors
+        origin = self._walls.cell(point.x, point.y)
+        rings = self._rings(origin)
+        cell_size = self._walls.cell_size
+        seen = set()
+        for ring in range(rings + 1):
+            # all walls outside the visited rings are at least this far away, so they cannot hide nearer nav_points
+            reach = max(ring - 1, 0) * cell_size
+            if max(limits) < reach or (radius is not None and radius < reach):
+                break
+            for wall in self._walls.query_cells(self._walls.ring(origin, ring)):
+                if wall not in seen:
+                    seen.add(wall)
+                    self._hide_sectors(point, wall, limits)
+        reach = min(max(limits), math.inf if radius is None else radius)
+        width = 2 * math.pi / self.sectors
+        candidates = []
+        if not math.isinf(reach):
+            rings = min(rings, math.ceil(reach / cell_size) + 1)
+        for ring in range(rings + 1):
+            for cell in self._walls.ring(origin, ring):
+                for i in self._point_cells.get(cell, ()):
+                    nav_point = self.room.nav_points[i]
+                    dx, dy = nav_point.x - point.x, nav_point.y - point.y
+                    distance = math.hypot(dx, dy)
+                    sector = math.floor((math.atan2(dy, dx) % (2 * math.pi)) / width) % self.sectors
+                    if distance <= limits[sector] and (radius is None or distance <= radius):
+                        candidates.append((i, distance))
+        return sorted(candidates)
+
+    def visible_nav_points(self, point: Point, radius: Optional[float] = None) -> list[tuple[int, float]]:
+        """
+        Returns the indices of all nav_points visible from a point with their distances.
+
+        If a radius is given, only nav_points within it are considered. Closed nav_points and connections through
+        closure zones are left out.
+        """
+        if not self.contains(point):
+            raise RuntimeError(f'Point {point} is not inside the navigable area of room {self.room}')
+        visible = []
+        for i, distance in self._candidates(point, radius):
+            nav_point = self.room.nav_points[i]
+            if not self.graph.node_closures[i] and self.is_visible(point, nav_point) \
+                    and not self.closures.blocks(point, nav_point):
+                visible.append((i, distance))
+        return visible
+
+    def route(self, start: Point, end: Point, radius: Optional[float] = None) -> tuple[float, list[Point]]:
+        """
+        Calculates the length and the points of the shortest path between two arbitrary points of the room.
+
+        Both points are connected to the graph only for this query. If a radius is given and there is no path via
+        the nav_points within it, the query is repeated with all nav_points. Returns infinity and no points if there
+        is no path.
+        """
+        start_links = self.visible_nav_points(start, radius)
+        end_links = dict(self.visible_nav_points(end, radius))
+        if self.is_visible(start, end) and not self.closures.blocks(start, end):
+            return math.hypot(end.x - start.x, end.y - start.y), [start, end]
+        dist, prev_edge = self.graph.dijkstra(dict(start_links), set(end_links))
+        best = min(end_links, key=lambda node: dist[node] + end_links[node], default=None)
+        if best is None or math.isinf(dist[best]):
+            # the nav_points within the radius may just not be connected
+            return self.route(start, end) if radius is not None else (math.inf, [])
+        path = [self.graph.points[node] for node in self.graph.path_to(prev_edge, best)]
+        return dist[best] + end_links[best], [start] + path + [end]
@@ -0,0 +1,71 @@
+from typing import Union
+
+from core.edge import Edge
+from core.edge_store import EdgeStore
+from core.point import Point
+from core.polygon import Polygon
+
+
+class RoomPaths:
+    """
+    A class to represent the results of `find_paths` for a room, as returned by `Room.compute_paths` without
+    modifying the room.
+
+    It has the same attributes as a room after `find_paths`, so that it can be used in its place (e.g. for
+    `NavGraph.from_room` or `RoomHierarchy`). The results are never modified after their creation.
+
+    Args
+    ----
+    virtual_boundary : Polygon
+        The virtual outer polygon inside the real outer polygon of the room.
+    virtual_barriers : list[Polygon]
+        The virtual polygons outside the real obstacle polygons.
+    virtual_doors : list[Point]
+        The virtual doors on the virtual polygons.
+    nav_points : list[Point]
+        The points used for calculating the navigation paths.
+    nav_edges : list[Edge] or EdgeStore
+        The edges defining routes for navigation.
+    doors : list[Point]
+        The doors of the room.
+
+    Attributes
+    ----------
+    virtual_boundary : Polygon
+        The virtual outer polygon inside the real outer polygon of the room.
+    virtual_barriers : list[Polygon]
+        The virtual polygons outside the real obstacle polygons.
+    virtual_doors : list[Point]
+        The virtual doors on the virtual polygons.
+    nav_points : list[Point]
+        The points used for calculating the navigation paths.
+    nav_edges : list[Edge] or EdgeStore
+        The edges defining routes for navigation.
+    doors : list[Point]
+        The doors of the room.
+    """
+
+    def __init__(self, virtual_boundary: Polygon, virtual_barriers: list[Polygon], virtual_doors: list[Point],
+                 nav_points: list[Point], nav_edges: Union[list[Edge], EdgeStore], doors: list[Point]):
+        self.virtual_boundary: Polygon = virtual_boundary
+        self.virtual_barriers: list[Polygon] = virtual_barriers
+        self.virtual_doors: list[Point] = virtual_doors
+        self.nav_points: list[Point] = nav_points
+        self.nav_edges: Union[list[Edge], EdgeStore] = nav_edges
+        self.doors: list[Point] = doors
+
+    def __repr__(self) -> str:
+        return f'RoomPaths: {len(self.nav_points)} nav_points, {len(self.nav_edges)} nav_edges'
+
+    def apply(self, room):
+        """
+        Sets the results as the results of `find_paths` of the given room (with the same doors). Door distances of
+        former results are reset.
+        """
+        room.virtual_boundary = self.virtual_boundary
+        room.virtual_barriers = self.virtual_barriers
+        room.virtual_doors = self.virtual_doors
+        room.nav_points = self.nav_points
+        room.nav_edges = self.nav_edges
+        room.door_distances = None
+        room.door_predecessors = None
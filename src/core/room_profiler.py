@@ -0,0 +1,229 @@
+import cProfile
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from core.room import Room
+
+
+profile_modes = ('sample', 'cprofile')
+
+
+class StackSampler:
+    """
+    A class to sample the call stack of a thread at a fixed interval from a timer thread, as a profiler with low
+    overhead.
+
+    The sampled thread runs at full speed between the samples; it only waits for the lock of the interpreter while a
+    sample is taken. The stacks are counted in the collapsed format of flame graphs (one line per stack, from the
+    outermost frame on, and its number of samples), so that the share of a function in the run is its share of the
+    samples. Code that runs shorter than the interval may not be sampled at all.
+
+    Args
+    ----
+    interval : float
+        The time in [seconds] between two samples.
+
+    Attributes
+    ----------
+    interval : float
+        The time in [seconds] between two samples.
+    stacks : Counter
+        The number of samples of every collapsed stack.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval: float = interval
+        self.stacks: Counter = Counter()
+        self._thread_id: Optional[int] = None
+        self._stop: threading.Event = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return f'StackSampler: {sum(self.stacks.values())} samples of {len(self.stacks)} stacks'
+
+    def enable(self):
+        """
+        Starts to sample the calling thread.
+        """
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._timer = threading.Thread(target=self._run, daemon=True)
+        self._timer.start()
+
+    def disable(self):
+        """
+        Stops the sampling; the samples taken so far are kept.
+        """
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+
+    def _run(self):
+        """
+        Takes a sample of the sampled thread every interval until the sampling is stopped.
+        """
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None:
+                names.append(f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def dump_stats(self, path: str):
+        """
+        Saves the collapsed stacks with their number of samples, e.g. as input of a flame graph.
+        """
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class SlowRoomProfiler:
+    """
+    A class to capture the rooms for which `Room.find_paths` takes longer than a time threshold, for offline
+    reproduction and optimization.
+
+    Every room is timed, and the slowest ones are kept in a top list. For a room above the threshold, its geometry and
+    path finding values are saved as JSON (readable with `Room.from_dict`), and the profile of its run next to it. No
+    room is ever run a second time, so every room is profiled while it runs, and the profile is only kept for the slow
+    ones. The profiling mode weighs the cost for every room against the detail of the kept profiles:
+
+    - 'sample' (default): the stack is sampled from a timer thread (see `StackSampler`) and saved as collapsed stacks
+      ('.stacks'). It costs little, but only shows where the time goes, not how often a function is called.
+    - 'cprofile': `find_paths` runs under the deterministic profiler `cProfile`, whose profile is saved for `pstats`
+      ('.prof'). It counts every call, but slows every room down, also the fast ones.
+    - None: no profile, only the geometry is captured.
+
+    Args
+    ----
+    directory : str
+        The directory the captured rooms and profiles are stored in. It is created if it does not exist.
+    threshold : float
+        The time in [seconds] above which a room is captured.
+    top : int
+        The number of slowest rooms to keep.
+    profile : str, optional
+        The profiling mode, 'sample', 'cprofile' or None.
+    interval : float
+        The time in [seconds] between two samples of the 'sample' mode.
+
+    Attributes
+    ----------
+    directory : str
+        The directory the captured rooms and profiles are stored in.
+    threshold : float
+        The time in [seconds] above which a room is captured.
+    top : int
+        The number of slowest rooms to keep.
+    profile : str, optional
+        The profiling mode, 'sample', 'cprofile' or None.
+    interval : float
+        The time in [seconds] between two samples of the 'sample' mode.
+    """
+
+    def __init__(self, directory: str, threshold: float, top: int = 10, profile: Optional[str] = 'sample',
+                 interval: float = 0.01):
+        if profile is not None and profile not in profile_modes:
+            raise RuntimeError(f'Unknown profiling mode {profile}, choose one of {list(profile_modes)} or None')
+        self.directory: str = directory
+        self.threshold: float = threshold
+        self.top: int = top
+        self.profile: Optional[str] = profile
+        self.interval: float = interval
+        os.makedirs(self.directory, exist_ok=True)
+        self._slowest: list[tuple[float, str]] = []
+
+    def __repr__(self) -> str:
+        return f'SlowRoomProfiler({self.directory}): threshold {self.threshold}s, {len(self._slowest)} rooms kept'
+
+    @property
+    def slowest(self) -> list[tuple[float, str]]:
+        """
+        Returns the time in [seconds] and the id of the slowest rooms, from the slowest one on.
+        """
+        return sorted(self._slowest, reverse=True)
+
+    def record(self, room_id: str, seconds: float):
+        """
+        Records the time of a room for the top list.
+        """
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, (seconds, str(room_id)))
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (seconds, str(room_id)))
+
+    def _path(self, room_id: str, suffix: str) -> str:
+        """
+        Returns the file path of a captured file of a room, with the room id made safe for file names.
+        """
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', str(room_id)) + suffix)
+
+    @contextmanager
+    def profiling(self) -> Iterator[Optional[Union[StackSampler, cProfile.Profile]]]:
+        """
+        Runs the enclosed code under the profiler of the profiling mode, and gives its profile (None without one).
+
+        The profiler is stopped even if the code is interrupted, e.g. by the time limit of
+        `core.batch_runner.run_room`, so that the profile covers the run up to there.
+        """
+        if self.profile is None:
+            yield None
+            return
+        profile = StackSampler(self.interval) if self.profile == 'sample' else cProfile.Profile()
+        profile.enable()
+        try:
+            yield profile
+        finally:
+            profile.disable()
+
+    def capture(self, room: Room, room_id: str, nat_dist: float, sharp_angle: float, seconds: float,
+                profile: Optional[Union[StackSampler, cProfile.Profile]] = None, **options) -> str:
+        """
+        Saves the geometry and the path finding values of a room, and the profile of its run if given (see
+        `profiling`), and returns the path of the saved geometry.
+        """
+        # backends given as instances are saved by their name
+        saved_options = {key: getattr(value, 'name', value) for key, value in options.items()}
+        path = self._path(room_id, '.json')
+        with open(path, 'w') as file:
+            json.dump({'id': room_id, 'seconds': seconds, 'nat_dist': nat_dist, 'sharp_angle': sharp_angle,
+                       'options': saved_options, 'room': room.to_dict()}, file)
+        if profile is not None:
+            profile.dump_stats(self._path(room_id, '.stacks' if isinstance(profile, StackSampler) else '.prof'))
+        return path
+
+    def find_paths(self, room: Room, room_id: str, nat_dist: float, sharp_angle: float, **options):
+        """
+        Runs `find_paths` for a room (under the profiler of the profiling mode), records its time, and captures the
+        room if it exceeds the threshold.
+
+        Returns the results of `find_paths`.
+        """
+        with self.profiling() as profile:
+            start = time.perf_counter()
+            results = room.find_paths(nat_dist, sharp_angle, **options)
+            seconds = time.perf_counter() - start
+        self.record(room_id, seconds)
+        if seconds > self.threshold:
+            self.capture(room, room_id, nat_dist, sharp_angle, seconds, profile, **options)
+        return results
+
+    def write_summary(self) -> str:
+        """
+        Saves the top list of the slowest rooms as JSON and returns its path.
+        """
+        path = os.path.join(self.directory, 'slowest.json')
+        with open(path, 'w') as file:
+            json.dump([{'id': room_id, 'seconds': seconds} for seconds, room_id in self.slowest], file, indent=1)
+        return path
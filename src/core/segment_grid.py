@@ -0,0 +1,151 @@
+import math
+from typing import Optional
+
+from core.edge import Edge
+from core.point import Point
+
+
+class SegmentGrid:
+    """
+    A class to represent a uniform grid index over edges for fast spatial lookups.
+
+    Every edge is registered in all grid cells its bounding box overlaps. A lookup only has to check the edges
+    registered in the cells overlapping the query, instead of all edges.
+
+    Args
+    ----
+    edges : list[Edge]
+        The edges to index.
+    cell_size : float, optional
+        The side length of a grid cell. It is derived from the extent and the number of edges if not given.
+
+    Attributes
+    ----------
+    edges : list[Edge]
+        The indexed edges.
+    cell_size : float
+        The side length of a grid cell.
+    cells : dict[tuple[int, int], list[int]]
+        The indices of the edges that are registered in a grid cell.
+    """
+
+    def __init__(self, edges: list[Edge], cell_size: Optional[float] = None):
+        self.edges: list[Edge] = edges
+        self.cell_size: float = cell_size if cell_size is not None else self._default_cell_size()
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        for i, edge in enumerate(self.edges):
+            self._register(i, edge)
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def _default_cell_size(self) -> float:
+        """
+        Calculates a cell size so that every cell holds about one edge on average.
+        """
+        if not self.edges:
+            return 1.
+        xs = [p.x for edge in self.edges for p in edge.points]
+        ys = [p.y for edge in self.edges for p in edge.points]
+        extent = max(max(xs) - min(xs), max(ys) - min(ys), 1.)
+        return extent / max(math.sqrt(len(self.edges)), 1.)
+
+    def cell(self, x: float, y: float) -> tuple[int, int]:
+        """
+        Returns the grid cell coordinates of a position.
+        """
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _cells_of_box(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[tuple[int, int]]:
+        """
+        Returns all grid cells overlapping an axis aligned box.
+        """
+        i_min, j_min = self.cell(x_min, y_min)
+        i_max, j_max = self.cell(x_max, y_max)
+        return [(i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+
+    def cells_of_segment(self, edge: Edge) -> list[tuple[int, int]]:
+        """
+        Returns all grid cells a segment runs through, together with their neighbouring cells, each of them once.
+
+        Unlike the cells of its bounding box, this only grows with the length of the segment and not with the area.
+        """
+        x1, y1, x2, y2 = edge.p1.x, edge.p1.y, edge.p2.x, edge.p2.y
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        i_min, i_max = self.cell(x1, y1)[0], self.cell(x2, y2)[0]
+        slope = (y2 - y1) / (x2 - x1) if x2 > x1 else 0.
+        # the rows the segment runs through in every column
+        lows, highs = [], []
+        for i in range(i_min, i_max + 1):
+            # the part of the segment inside the column
+            x_start, x_end = max(x1, i * self.cell_size), min(x2, (i + 1) * self.cell_size)
+            if x2 > x1:
+                y_start, y_end = y1 + (x_start - x1) * slope, y1 + (x_end - x1) * slope
+            else:
+                y_start, y_end = y1, y2
+            lows.append(math.floor(min(y_start, y_end) / self.cell_size))
+            highs.append(math.floor(max(y_start, y_end) / self.cell_size))
+        # the rows of neighbouring columns overlap, as the segment is continuous
+        cells = []
+        for k in range(-1, len(lows) + 1):
+            near = slice(max(k - 1, 0), k + 2)
+            cells += [(i_min + k, j) for j in range(min(lows[near]) - 1, max(highs[near]) + 2)]
+        return cells
+
+    def _register(self, index: int, edge: Edge):
+        """
+        Adds an edge index to all cells overlapping the edge's bounding box.
+        """
+        for cell in self._cells_of_box(min(edge.p1.x, edge.p2.x), min(edge.p1.y, edge.p2.y),
+                                       max(edge.p1.x, edge.p2.x), max(edge.p1.y, edge.p2.y)):
+            self.cells.setdefault(cell, []).append(index)
+
+    @staticmethod
+    def ring(cell: tuple[int, int], distance: int) -> list[tuple[int, int]]:
+        """
+        Returns the grid cells at the given distance (in cells, in both directions) around a cell.
+        """
+        i, j = cell
+        if distance == 0:
+            return [cell]
+        cells = [(i + di, j + dj) for di in (-distance, distance) for dj in range(-distance, distance + 1)]
+        return cells + [(i + di, j + dj) for dj in (-distance, distance) for di in range(-distance + 1, distance)]
+
+    def query_cells(self, cells: list[tuple[int, int]]) -> list[int]:
+        """
+        Returns the indices of all edges registered in the given grid cells, in the order the edges were indexed.
+        """
+        found = set()
+        for cell in cells:
+            found.update(self.cells.get(cell, ()))
+        return sorted(found)
+
+    def query_box(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[int]:
+        """
+        Returns the indices of all edges that may overlap the given box, in the order the edges were indexed.
+
+        The result may contain edges near the box; callers must do the exact check themselves.
+        """
+        return self.query_cells(self._cells_of_box(x_min, y_min, x_max, y_max))
+
+    def query_point(self, pt: Point, radius: float = 0.) -> list[int]:
+        """
+        Returns the indices of all edges that may lie within the given radius around a point.
+        """
+        return self.query_box(pt.x - radius, pt.y - radius, pt.x + radius, pt.y + radius)
+
+    def query_edge(self, edge: Edge) -> list[int]:
+        """
+        Returns the indices of all edges that may touch or cut the given edge.
+        """
+        return self.query_box(min(edge.p1.x, edge.p2.x), min(edge.p1.y, edge.p2.y),
+                              max(edge.p1.x, edge.p2.x), max(edge.p1.y, edge.p2.y))
+
+    def query_segment(self, edge: Edge) -> list[int]:
+        """
+        Returns the indices of all edges that may touch or cut the given edge (or come closer than one cell).
+
+        Only the cells along the edge are visited, which is much faster than `query_edge` for long diagonal edges.
+        """
+        return self.query_cells(self.cells_of_segment(edge))
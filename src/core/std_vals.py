@@ -10,3 +10,15 @@ std_tolerance = 0.001
 
 door_tolerance = 0.1
 """Defines the tolerance in [meter] in which doors (points) are considered to belong to an edge."""
+
+tile_overlap = 0.1
+"""Defines the overlap of neighbouring tiles in the tiled path finding mode, relative to the tile size."""
+
+portal_spacing = 3.
+"""Defines the distance in [meter] between two portal points on a tile border in the tiled path finding mode."""
+
+nearest_sectors = 8
+"""Defines the number of angular sectors around a nav_point searched for nearest nav_points in the approximate mode."""
+
+library_version = '0.2.2'
+"""Defines the version of the path finding algorithm. Cached results of other versions are not reused."""
@@ -0,0 +1,70 @@
+"""
+Measurement of the path-length stretch of approximate navigation graphs (see the `nearest` and `tile_size` options of
+`Room.find_paths`) against the exact visibility graph.
+
+The stretch of a door pair is the ratio of its shortest path length in the approximate graph to the one in the exact
+graph, so it is at least 1. Pairs connected in the exact graph but not in the approximate one are counted separately;
+the `nearest` option searches on until it joins all parts the exact graph joins, so for it there are none.
+"""
+import math
+import random
+from typing import Optional, Union
+
+from core.geometry_backend import GeometryBackend
+from core.nav_graph import NavGraph
+from core.room import Room
+
+
+def door_pairs(room: Room, samples: int, seed: int = 0) -> list[tuple[int, int]]:
+    """
+    Returns all pairs of door indices of a room, or a random sample of them if there are more than the given number.
+    """
+    pairs = [(i, j) for i in range(len(room.doors)) for j in range(i + 1, len(room.doors))]
+    if len(pairs) <= samples:
+        return pairs
+    return sorted(random.Random(seed).sample(pairs, samples))
+
+
+def door_pair_distances(graph: NavGraph, nav_points: int, pairs: list[tuple[int, int]]) -> list[float]:
+    """
+    Calculates the shortest distances of door pairs in the graph of a room with the given number of nav_points, with
+    one search per distinct first door.
+    """
+    targets: dict[int, set[int]] = {}
+    for i, j in pairs:
+        targets.setdefault(i, set()).add(nav_points + j)
+    distances = {}
+    for i, nodes in targets.items():
+        dist, _ = graph.dijkstra({nav_points + i: 0.}, nodes)
+        for node in nodes:
+            distances[i, node - nav_points] = dist[node]
+    return [distances[pair] for pair in pairs]
+
+
+def path_stretch(room: Room, nat_dist: float, sharp_angle: float, samples: int = 50, seed: int = 0,
+                 backend: Optional[Union[str, GeometryBackend]] = None) -> dict:
+    """
+    Measures the stretch of the paths of a room after an approximate `find_paths` against the exact graph on a
+    sample of door pairs, and summarizes it as a dictionary (e.g. for JSON): the number of measured pairs, the
+    maximum and mean stretch, and the number of pairs that are only connected in the exact graph.
+
+    The exact graph is calculated with the same values without modifying the room (see `Room.compute_paths`).
+    """
+    exact = room.compute_paths(nat_dist, sharp_angle, backend=backend)
+    pairs = door_pairs(room, samples, seed)
+    approximate_distances = door_pair_distances(NavGraph.from_room(room), len(room.nav_points), pairs)
+    exact_distances = door_pair_distances(NavGraph.from_room(exact), len(exact.nav_points), pairs)
+    stretches, disconnected = [], 0
+    for approximate_distance, exact_distance in zip(approximate_distances, exact_distances):
+        if math.isinf(exact_distance):
+            continue
+        if math.isinf(approximate_distance):
+            disconnected += 1
+        else:
+            stretches.append(approximate_distance / exact_distance if exact_distance > 0 else 1.)
+    return {
+        'pairs': len(stretches) + disconnected,
+        'max_stretch': max(stretches) if stretches else None,
+        'mean_stretch': sum(stretches) / len(stretches) if stretches else None,
+        'disconnected': disconnected,
+    }
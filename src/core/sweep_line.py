@@ -0,0 +1,300 @@
+"""
+Detection and repair of self-intersecting polygons with a Bentley-Ottmann sweep line.
+
+A vertical line sweeps over the polygon from left to right. It stops at the event points (the corners and the
+crossings found so far) and keeps the edges it currently passes ordered from bottom to top. Edges can only cross
+after they became neighbours in this order, so only neighbours are tested. This needs O((n + k) log n) steps for n
+edges with k intersections, instead of O(n²) for testing all pairs.
+
+The sweep calculates with exact fractions, so that rounding errors can never break the order of the edges.
+As everywhere in this library, points within `std_tolerance` are considered equal. Edges that do not cross but come
+closer than the tolerance always have a corner near the other edge, these are found with a spatial grid instead.
+"""
+import heapq
+import math
+from fractions import Fraction
+from typing import Optional
+
+from core.edge import Edge
+from core.point import Point
+from core.segment_grid import SegmentGrid
+from core.std_vals import *
+
+
+def signed_area(points: list[Point]) -> float:
+    """
+    Calculates the area enclosed by the points, positive if they are ordered counterclockwise.
+    """
+    return sum(p.x * q.y - q.x * p.y for p, q in zip(points, points[1:] + points[:1])) / 2
+
+
+class _Segment:
+    """
+    A class to represent a polygon edge in the sweep, running from its left (or lower) to its right (or upper) end.
+
+    Args
+    ----
+    index : int
+        The index of the edge in the polygon.
+    p1, p2 : tuple[Fraction, Fraction]
+        The exact coordinates of both ends.
+
+    Attributes
+    ----------
+    index : int
+        The index of the edge in the polygon.
+    left, right : tuple[Fraction, Fraction]
+        The exact coordinates of the left (or lower) and the right (or upper) end.
+    slope : Fraction, optional
+        The slope of the edge, None for vertical edges.
+    """
+
+    __slots__ = ('index', 'left', 'right', 'slope')
+
+    def __init__(self, index: int, p1: tuple[Fraction, Fraction], p2: tuple[Fraction, Fraction]):
+        self.index: int = index
+        self.left, self.right = (p1, p2) if p1 <= p2 else (p2, p1)
+        dx = self.right[0] - self.left[0]
+        self.slope: Optional[Fraction] = (self.right[1] - self.left[1]) / dx if dx != 0 else None
+
+    def y_at(self, x: Fraction, y: Fraction) -> Fraction:
+        """
+        Returns the y coordinate of the edge on the sweep line at x. Vertical edges return y, clipped to their ends.
+        """
+        if self.slope is None:
+            return min(max(y, self.left[1]), self.right[1])
+        return self.left[1] + (x - self.left[0]) * self.slope
+
+    def order_right_of_event(self) -> tuple[bool, Fraction]:
+        """
+        Returns the key that orders edges passing the same event point from bottom to top right of it.
+        """
+        return self.slope is None, self.slope if self.slope is not None else Fraction(0)
+
+
+def _crossing(s1: _Segment, s2: _Segment) -> Optional[tuple[Fraction, Fraction]]:
+    """
+    Returns the exact point two edges share, or None if they share none or overlap collinearly.
+    """
+    (x1, y1), (x2, y2) = s1.left, s1.right
+    (x3, y3), (x4, y4) = s2.left, s2.right
+    denominator = (x2 - x1) * (y4 - y3) - (y2 - y1) * (x4 - x3)
+    if denominator == 0:
+        return None
+    t = ((x3 - x1) * (y4 - y3) - (y3 - y1) * (x4 - x3)) / denominator
+    u = ((x3 - x1) * (y2 - y1) - (y3 - y1) * (x2 - x1)) / denominator
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return x1 + t * (x2 - x1), y1 + t * (y2 - y1)
+    return None
+
+
+def _distance_to_edge(point: Point, p1: Point, p2: Point) -> float:
+    """
+    Calculates the euclidean distance of a point to the edge between two points.
+    """
+    dx, dy = p2.x - p1.x, p2.y - p1.y
+    t = min(max(((point.x - p1.x) * dx + (point.y - p1.y) * dy) / (dx * dx + dy * dy), 0.), 1.)
+    return math.hypot(p1.x + t * dx - point.x, p1.y + t * dy - point.y)
+
+
+def _crossing_pairs(points: list[Point], report):
+    """
+    Sweeps over the edges of a polygon and reports every pair of edges sharing a point.
+    """
+    n = len(points)
+    coords = [(Fraction(p.x), Fraction(p.y)) for p in points]
+    segments = [_Segment(i, coords[i], coords[(i + 1) % n]) for i in range(n)]
+    starts: dict[tuple[Fraction, Fraction], list[_Segment]] = {}
+    for segment in segments:
+        starts.setdefault(segment.left, []).append(segment)
+    queue = list(set(coords))
+    heapq.heapify(queue)
+    queued = set(queue)
+    status: list[_Segment] = []
+
+    def lower_bound(x: Fraction, y: Fraction) -> int:
+        # the first position in the status at or above y
+        low, high = 0, len(status)
+        while low < high:
+            middle = (low + high) // 2
+            if status[middle].y_at(x, y) < y:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def check(s1: _Segment, s2: _Segment, event: tuple[Fraction, Fraction]):
+        # queue the crossing of two neighbours if it is still ahead
+        point = _crossing(s1, s2)
+        if point is not None and point > event and point not in queued:
+            queued.add(point)
+            heapq.heappush(queue, point)
+
+    while queue:
+        event = heapq.heappop(queue)
+        x, y = event
+        upper = starts.get(event, [])
+        first = lower_bound(x, y)
+        last = first
+        while last < len(status) and status[last].y_at(x, y) == y:
+            last += 1
+        # all edges starting at or passing the event point share it
+        meeting = upper + status[first:last]
+        for k, s1 in enumerate(meeting):
+            for s2 in meeting[k + 1:]:
+                report(s1.index, s2.index)
+        # remove the edges ending at the event point, and reorder the passing ones as they are right of it
+        inserted = sorted(upper + [s for s in status[first:last] if s.right != event],
+                          key=_Segment.order_right_of_event)
+        status[first:last] = inserted
+        if not inserted:
+            if 0 < first < len(status):
+                check(status[first - 1], status[first], event)
+        else:
+            if first > 0:
+                check(status[first - 1], status[first], event)
+            after = first + len(inserted)
+            if after < len(status):
+                check(status[after - 1], status[after], event)
+
+
+def self_intersections(points: list[Point]) -> list[tuple[int, int]]:
+    """
+    Finds all pairs of edges of a polygon that intersect or come closer than the tolerance, given by their edge
+    indices (edge i runs from point i to point i + 1).
+
+    Neighbouring edges meeting in their common corner are not reported, but they are if they overlap.
+    The points must not contain repetitions.
+    """
+    n = len(points)
+    found: set[tuple[int, int]] = set()
+
+    def report(i: int, j: int):
+        if i == j:
+            return
+        # neighbouring edges only meet in their common corner, unless one folds back onto the other
+        if (j + 1) % n == i:
+            i, j = j, i
+        if (i + 1) % n == j and _distance_to_edge(points[i], points[j], points[(j + 1) % n]) > std_tolerance \
+                and _distance_to_edge(points[(j + 1) % n], points[i], points[j]) > std_tolerance:
+            return
+        found.add((min(i, j), max(i, j)))
+
+    _crossing_pairs(points, report)
+    # corners nearer to other edges than the tolerance
+    grid = SegmentGrid([Edge(points[i], points[(i + 1) % n]) for i in range(n)])
+    for k, corner in enumerate(points):
+        for i in grid.query_point(corner, std_tolerance):
+            if i not in (k, (k - 1) % n) and _distance_to_edge(corner, points[i], points[(i + 1) % n]) <= std_tolerance:
+                report(i, k)
+                report(i, (k - 1) % n)
+    return sorted(found)
+
+
+def _contact_points(points: list[Point], i: int, j: int) -> list[Point]:
+    """
+    Returns the points where two edges of a polygon intersect or come closer than the tolerance.
+    """
+    n = len(points)
+    a1, a2, b1, b2 = points[i], points[(i + 1) % n], points[j], points[(j + 1) % n]
+    contacts = [p for p in (a1, a2) if _distance_to_edge(p, b1, b2) <= std_tolerance]
+    contacts += [p for p in (b1, b2) if _distance_to_edge(p, a1, a2) <= std_tolerance]
+    crossing = _crossing(_Segment(i, (Fraction(a1.x), Fraction(a1.y)), (Fraction(a2.x), Fraction(a2.y))),
+                         _Segment(j, (Fraction(b1.x), Fraction(b1.y)), (Fraction(b2.x), Fraction(b2.y))))
+    if crossing is not None:
+        contacts.append(Point(float(crossing[0]), float(crossing[1])))
+    return contacts
+
+
+def _valid_piece(points: list[Point], counterclockwise: bool) -> bool:
+    """
+    Checks if a piece of a split polygon runs in the given direction and is no sliver, i.e. is on average wider than
+    the tolerance.
+    """
+    if len(points) < 3:
+        return False
+    area = signed_area(points)
+    perimeter = sum(math.hypot(q.x - p.x, q.y - p.y) for p, q in zip(points, points[1:] + points[:1]))
+    return (area > 0) == counterclockwise and abs(area) > std_tolerance * perimeter
+
+
+def split_polygon(points: list[Point], counterclockwise: bool, _depth: int = 3) -> list[list[Point]]:
+    """
+    Splits a self-intersecting polygon at its intersections into simple pieces.
+
+    Only the pieces running in the given direction are returned, the others are inverted (e.g. where an offset
+    polygon folds over itself in a narrow corridor). Slivers narrower than the tolerance are dropped.
+    The points must not contain repetitions.
+    """
+    n = len(points)
+    pairs = self_intersections(points)
+    if not pairs:
+        return [list(points)] if _valid_piece(points, counterclockwise) else []
+
+    # every contact point is added to both edges, points equal within the tolerance are merged
+    nodes: list[Point] = list(points)
+    # the mergeable nodes by their exact coordinates and by their cells of the tolerance's size
+    exact: dict[tuple[float, float], int] = {}
+    cells: dict[tuple[int, int], list[int]] = {}
+    corner_nodes = list(range(n))
+    on_edge: list[list[int]] = [[] for _ in range(n)]
+
+    def node_of(point: Point, node: Optional[int] = None) -> int:
+        if (point.x, point.y) in exact:
+            return exact[point.x, point.y]
+        i, j = math.floor(point.x / std_tolerance), math.floor(point.y / std_tolerance)
+        # points equal within the tolerance are at most one cell apart, the first merged node is taken
+        near = [k for di in (-1, 0, 1) for dj in (-1, 0, 1) for k in cells.get((i + di, j + dj), ())
+                if nodes[k] == point]
+        if near:
+            return min(near)
+        if node is None:
+            nodes.append(point)
+            node = len(nodes) - 1
+        exact[point.x, point.y] = node
+        cells.setdefault((i, j), []).append(node)
+        return node
+
+    for corner in sorted({c for pair in pairs for i in pair for c in (i, (i + 1) % n)}):
+        corner_nodes[corner] = node_of(points[corner], corner)
+    for i, j in pairs:
+        for contact in _contact_points(points, i, j):
+            node = node_of(contact)
+            on_edge[i].append(node)
+            on_edge[j].append(node)
+
+    # walk around the polygon through all contact points
+    sequence = []
+    for i in range(n):
+        start = points[i]
+        sequence.append(corner_nodes[i])
+        end = corner_nodes[(i + 1) % n]
+        for node in sorted(set(on_edge[i]), key=lambda k: math.hypot(nodes[k].x - start.x, nodes[k].y - start.y)):
+            if node != sequence[-1] and node != end:
+                sequence.append(node)
+
+    # cut off a loop whenever the walk returns to a node it has already visited
+    loops = []
+    stack: list[int] = []
+    positions: dict[int, int] = {}
+    for node in sequence + sequence[:1]:
+        if node in positions:
+            position = positions[node]
+            loops.append(stack[position:])
+            for removed in stack[position + 1:]:
+                del positions[removed]
+            del stack[position + 1:]
+        else:
+            positions[node] = len(stack)
+            stack.append(node)
+
+    pieces = []
+    for piece in ([nodes[k] for k in loop] for loop in loops):
+        if not _valid_piece(piece, counterclockwise):
+            continue
+        # merging points within the tolerance can leave new contacts, these are split once more
+        if _depth > 0 and len(piece) < len(sequence):
+            pieces += split_polygon(piece, counterclockwise, _depth - 1)
+        else:
+            pieces.append(piece)
+    return pieces
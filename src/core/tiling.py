@@ -0,0 +1,128 @@
+"""
+Spatial tiling of a room's navigation points.
+
+Large open rooms are split into square tiles that overlap their neighbours by a margin. Visibility is then only tested
+between navigation points that share a tile, which replaces the quadratic all-pairs step by a sum of small quadratic
+steps. The tiles are stitched by portal points placed on the inner tile borders. Each portal point belongs to both
+neighbouring tiles, so a path can cross a border through the closest portal.
+
+Path-length stretch
+-------------------
+An exact shortest path consists of straight edges between navigation points. An edge that lies in one (overlapping)
+tile is kept unchanged. An edge crossing a tile border is replaced by a detour through the closest portal on that
+border, which is at most half the portal spacing away from the crossing point. Each crossed border therefore adds at
+most one portal spacing to the path length:
+
+    tiled length <= exact length + (number of crossed tile borders) * portal spacing
+
+This holds as long as the free space around the crossing point is at least half a portal spacing wide, i.e. the
+portal spacing should be smaller than the narrowest corridor that crosses a tile border.
+"""
+import math
+from typing import Iterator
+
+from core.point import Point
+
+_worker_room = None
+"""The room a worker process validates nav edges for (set by `init_worker`)."""
+
+
+def tile_grid(points: list[Point], tile_size: float) -> tuple[float, float, int, int]:
+    """
+    Returns the origin and the number of tiles in x and y direction that cover all points.
+    """
+    x_min = min(p.x for p in points)
+    y_min = min(p.y for p in points)
+    x_tiles = max(math.ceil((max(p.x for p in points) - x_min) / tile_size), 1)
+    y_tiles = max(math.ceil((max(p.y for p in points) - y_min) / tile_size), 1)
+    return x_min, y_min, x_tiles, y_tiles
+
+
+def portal_points(grid: tuple[float, float, int, int], tile_size: float, portal_spacing: float) -> list[Point]:
+    """
+    Returns evenly spaced points on all inner tile borders of a tile grid (see `tile_grid`).
+
+    The returned points still have to be checked for being inside the room.
+    """
+    x_min, y_min, x_tiles, y_tiles = grid
+    x_max = x_min + x_tiles * tile_size
+    y_max = y_min + y_tiles * tile_size
+    portals = []
+    # vertical borders
+    y_count = math.ceil((y_max - y_min) / portal_spacing)
+    for a in range(1, x_tiles):
+        x = x_min + a * tile_size
+        portals += [Point(x, y_min + (k + 0.5) * (y_max - y_min) / y_count) for k in range(y_count)]
+    # horizontal borders
+    x_count = math.ceil((x_max - x_min) / portal_spacing)
+    for b in range(1, y_tiles):
+        y = y_min + b * tile_size
+        portals += [Point(x_min + (k + 0.5) * (x_max - x_min) / x_count, y) for k in range(x_count)]
+    return portals
+
+
+def tile_ranges(points: list[Point], grid: tuple[float, float, int, int], tile_size: float,
+                margin: float) -> list[tuple[int, int, int, int]]:
+    """
+    Returns for every point the range of tiles (first and last column, first and last row) of a tile grid (see
+    `tile_grid`) it belongs to, with the tiles enlarged by the margin.
+    """
+    x_min, y_min, _, _ = grid
+    return [(math.floor((p.x - x_min - margin) / tile_size), math.floor((p.x - x_min + margin) / tile_size),
+             math.floor((p.y - y_min - margin) / tile_size), math.floor((p.y - y_min + margin) / tile_size))
+            for p in points]
+
+
+def tile_members(ranges: list[tuple[int, int, int, int]]) -> dict[tuple[int, int], list[int]]:
+    """
+    Returns the indices of the points of every tile from the tile ranges of the points.
+    """
+    members: dict[tuple[int, int], list[int]] = {}
+    for index, (a_min, a_max, b_min, b_max) in enumerate(ranges):
+        for a in range(a_min, a_max + 1):
+            for b in range(b_min, b_max + 1):
+                members.setdefault((a, b), []).append(index)
+    return members
+
+
+def tile_pairs(points: list[Point], grid: tuple[float, float, int, int], tile_size: float,
+               overlap: float) -> Iterator[tuple[list[tuple[int, int]], list[int]]]:
+    """
+    Yields the index pairs of points that share a tile of a tile grid (see `tile_grid`, enlarged by the overlap) tile
+    by tile, together with the indices of all points of that tile.
+
+    The grid must be the one the portal points were placed on (see `portal_points`), otherwise the portals miss the
+    tile borders and the tiles are not stitched.
+
+    A pair is only listed for the first tile both points share, which follows from their tile ranges, so that no set
+    of all pairs is kept. An edge between two points of a tile lies inside the enlarged tile, so only the points of
+    the tile can lie on it.
+    """
+    # the tolerance makes points on a tile border belong to both neighbouring tiles
+    ranges = tile_ranges(points, grid, tile_size, overlap + 1e-9 * tile_size)
+    members = tile_members(ranges)
+    for tile in sorted(members):
+        indices = members[tile]
+        pairs = []
+        for n, i in enumerate(indices):
+            for j in indices[n + 1:]:
+                # the first tile of the shared tile range
+                if (max(ranges[i][0], ranges[j][0]), max(ranges[i][2], ranges[j][2])) == tile:
+                    pairs.append((i, j))
+        yield pairs, indices
+
+
+def init_worker(room):
+    """
+    Stores the room in a worker process, so that it is only transferred once.
+    """
+    global _worker_room
+    _worker_room = room
+
+
+def valid_pairs(pairs: list[tuple[int, int]], near: list[int]) -> list[tuple[int, int]]:
+    """
+    Returns the index pairs of the worker's room nav_points that form valid nav edges, checking only the given
+    nav_points near them.
+    """
+    return _worker_room.valid_nav_pairs(pairs, near)
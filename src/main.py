@@ -1,11 +1,28 @@
 from core.std_vals import *
+from testing.test_fuzzing import *
+from testing.test_navigation import *
 from testing.test_polygons import *
 from testing.test_rooms import *
+from testing.test_storage import *
 
 
 def main():
     polygon_contains()
     test_room_1(natural_distance, double_corner_points_angle)
+    test_building(natural_distance, double_corner_points_angle)
+    test_door_matching(natural_distance, double_corner_points_angle)
+    test_tiled_paths(natural_distance, double_corner_points_angle)
+    test_triangulation()
+    test_nav_mesh(natural_distance, double_corner_points_angle)
+    test_nearest_nav_edges(natural_distance, double_corner_points_angle)
+    test_room_hierarchy(natural_distance, double_corner_points_angle)
+    test_egress(natural_distance, double_corner_points_angle)
+    test_kd_tree()
+    test_room_cache(natural_distance, double_corner_points_angle)
+    test_projection()
+    test_room_profiler(natural_distance, double_corner_points_angle)
+    test_batch_runner(natural_distance, double_corner_points_angle)
+    fuzz_against_shapely(rounds=50, print_throughput=False)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import random
+import time
+
+from core.edge import Edge
+from core.geometry_backend import GeometryBackend, NumpyBackend, ShapelyBackend
+from core.point import Point
+from core.polygon import Polygon
+from core.std_vals import *
+
+from shapely import geometry
+
+
+predicates = ['hits_point', 'surrounds_point', 'cuts_edge']
+
+
+def random_polygon(rng: random.Random, corners: int) -> list[Point]:
+    """
+    Returns the points of a random star-shaped polygon, with some collinear and near-degenerate corners inserted.
+    """
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(corners))
+    points = []
+    for angle in angles:
+        radius = rng.uniform(2., 50.)
+        points.append(Point(round(radius * math.cos(angle), rng.choice([0, 1, 3, 6])),
+                            round(radius * math.sin(angle), rng.choice([0, 1, 3, 6]))))
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(points))
+        p1, p2 = points[i], points[(i + 1) % len(points)]
+        t = rng.choice([0.5, rng.random()])
+        # exactly collinear or slightly pushed off the edge
+        offset = rng.choice([0., std_tolerance / 10, std_tolerance, 10 * std_tolerance])
+        points.insert(i + 1, Point(p1.x + t * (p2.x - p1.x) + offset, p1.y + t * (p2.y - p1.y) - offset))
+    return points
+
+
+def random_queries(rng: random.Random, points: list[Point], count: int) -> list[Point]:
+    """
+    Returns random points near a polygon: uniformly spread, on corners, on edges, and just next to edges.
+    """
+    x_min, x_max = min(p.x for p in points) - 5, max(p.x for p in points) + 5
+    y_min, y_max = min(p.y for p in points) - 5, max(p.y for p in points) + 5
+    queries = []
+    for _ in range(count):
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(Point(rng.uniform(x_min, x_max), rng.uniform(y_min, y_max)))
+            continue
+        i = rng.randrange(len(points))
+        p1, p2 = points[i], points[(i + 1) % len(points)]
+        if kind == 1:
+            queries.append(Point(p1.x, p1.y))
+            continue
+        t = rng.random()
+        offset = 0. if kind == 2 else rng.choice([-1, 1]) * rng.choice([std_tolerance / 2, 2 * std_tolerance, 0.1])
+        queries.append(Point(p1.x + t * (p2.x - p1.x) + offset, p1.y + t * (p2.y - p1.y) + offset))
+    return queries
+
+
+def random_segments(rng: random.Random, points: list[Point], queries: list[Point], count: int) -> list[Edge]:
+    """
+    Returns random edges between corners and query points.
+    """
+    segments = []
+    candidates = points + queries
+    while len(segments) < count:
+        p1, p2 = rng.choice(candidates), rng.choice(candidates)
+        if p1 != p2:
+            segments.append(Edge(p1, p2))
+    return segments
+
+
+def shapely_reference(predicate: str, points: list[Point], query) -> bool:
+    """
+    Evaluates a predicate with plain shapely, with the tolerance applied as distance.
+    """
+    shapely_polygon = geometry.Polygon([(p.x, p.y) for p in points])
+    ring = shapely_polygon.exterior
+    if predicate == 'hits_point':
+        return ring.distance(geometry.Point(query.x, query.y)) <= std_tolerance
+    if predicate == 'surrounds_point':
+        shapely_point = geometry.Point(query.x, query.y)
+        return shapely_polygon.contains(shapely_point) and ring.distance(shapely_point) > std_tolerance
+    # shorten the edge at both ends, touching is not cutting
+    shift = min(2 * std_tolerance / query.length, 0.5)
+    dx, dy = query.p2.x - query.p1.x, query.p2.y - query.p1.y
+    line = geometry.LineString([(query.p1.x + shift * dx, query.p1.y + shift * dy),
+                                (query.p2.x - shift * dx, query.p2.y - shift * dy)])
+    corner_hit = line.distance(geometry.MultiPoint([(p.x, p.y) for p in points])) <= std_tolerance
+    return corner_hit or (line.intersects(ring) and not line.covered_by(ring.buffer(std_tolerance)))
+
+
+def own_result(predicate: str, polygon: Polygon, query) -> bool:
+    """
+    Evaluates a predicate with the pure Python implementation.
+    """
+    return getattr(polygon, predicate)(query)
+
+
+def valid_polygon(points: list[Point]):
+    """
+    Returns the polygon of the given points, or None if it is corrupted or self-intersecting.
+    """
+    try:
+        polygon = Polygon(list(points))
+    except RuntimeError:
+        return None
+    if not geometry.Polygon([(p.x, p.y) for p in polygon.points]).is_valid:
+        return None
+    return polygon
+
+
+def mismatches(predicate: str, points: list[Point], query) -> bool:
+    """
+    Checks whether the own implementation and shapely disagree (False if the polygon is invalid).
+    """
+    polygon = valid_polygon(points)
+    if polygon is None:
+        return False
+    return own_result(predicate, polygon, query) != shapely_reference(predicate, polygon.points, query)
+
+
+def minimize(predicate: str, points: list[Point], query) -> list[Point]:
+    """
+    Removes as many corners as possible and rounds the coordinates as far as possible, keeping the mismatch.
+    """
+    points = list(points)
+    # remove corners
+    changed = True
+    while changed and len(points) > 3:
+        changed = False
+        for i in range(len(points)):
+            candidate = points[:i] + points[i + 1:]
+            if mismatches(predicate, candidate, query):
+                points = candidate
+                changed = True
+                break
+    # round coordinates
+    for digits in range(0, 7):
+        candidate = [Point(round(p.x, digits), round(p.y, digits)) for p in points]
+        if mismatches(predicate, candidate, query):
+            return candidate
+    return points
+
+
+def save_counterexample(out_dir: str, number: int, predicate: str, points: list[Point], query):
+    """
+    Writes a counterexample as JSON file for offline reproduction.
+    """
+    polygon = Polygon(list(points))
+    if isinstance(query, Edge):
+        query_data = [[query.p1.x, query.p1.y], [query.p2.x, query.p2.y]]
+    else:
+        query_data = [query.x, query.y]
+    with open(os.path.join(out_dir, f'{predicate}_{number:04d}.json'), 'w') as file:
+        json.dump({
+            'predicate': predicate,
+            'polygon': [[p.x, p.y] for p in points],
+            'query': query_data,
+            'own': own_result(predicate, polygon, query),
+            'shapely': shapely_reference(predicate, polygon.points, query),
+        }, file, indent=1)
+
+
+def throughput(backend: GeometryBackend, polygons: list[Polygon], queries: list[list[Point]],
+               segments: list[list[Edge]]) -> dict[str, float]:
+    """
+    Measures how many checks per second a backend does for every predicate.
+    """
+    results = {}
+    for predicate, method, inputs in [('hits_point', backend.hits_points, queries),
+                                      ('surrounds_point', backend.surrounds_points, queries),
+                                      ('cuts_edge', backend.cuts_edges, segments)]:
+        start = time.perf_counter()
+        for polygon, batch in zip(polygons, inputs):
+            method(polygon, batch)
+        duration = time.perf_counter() - start
+        results[predicate] = sum(len(batch) for batch in inputs) / max(duration, 1e-9)
+    return results
+
+
+def fuzz_against_shapely(rounds=200, queries_per_polygon=200, seed=0, out_dir=None, max_saved=20,
+                         print_throughput=True):
+    """
+    Compares the own polygon predicates with shapely on random polygons, queries, and edges.
+
+    Mismatches between the own predicates and plain shapely are often caused by the different tolerance models
+    (angular vs. distance) and are only counted. If an output directory is given, they are minimized and saved there as
+    JSON files. The shapely and numpy backends must never disagree with the own predicates, otherwise an AssertionError
+    is raised. Finally, the throughput of all backends is printed if requested.
+    """
+    print('\n' + '--- Fuzzing polygon predicates against shapely ---' + '\n')
+    rng = random.Random(seed)
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    python_backend = GeometryBackend()
+    shapely_backend = ShapelyBackend()
+    numpy_backend = NumpyBackend()
+    # checks, mismatches to shapely, mismatches of the shapely backend, mismatches of the numpy backend
+    counts = {predicate: [0, 0, 0, 0] for predicate in predicates}
+    saved = 0
+    invalid = 0
+    polygons, all_queries, all_segments = [], [], []
+
+    for _ in range(rounds):
+        polygon = valid_polygon(random_polygon(rng, rng.randint(3, 30)))
+        if polygon is None:
+            invalid += 1
+            continue
+        queries = random_queries(rng, polygon.points, queries_per_polygon)
+        segments = random_segments(rng, polygon.points, queries, queries_per_polygon)
+        polygons.append(polygon)
+        all_queries.append(queries)
+        all_segments.append(segments)
+
+        backend_results = [{'hits_point': backend.hits_points(polygon, queries),
+                            'surrounds_point': backend.surrounds_points(polygon, queries),
+                            'cuts_edge': backend.cuts_edges(polygon, segments)}
+                           for backend in [shapely_backend, numpy_backend]]
+        for predicate in predicates:
+            inputs = segments if predicate == 'cuts_edge' else queries
+            for k, query in enumerate(inputs):
+                counts[predicate][0] += 1
+                own = own_result(predicate, polygon, query)
+                for column, results in enumerate(backend_results, 2):
+                    if own != results[predicate][k]:
+                        counts[predicate][column] += 1
+                if own != shapely_reference(predicate, polygon.points, query):
+                    counts[predicate][1] += 1
+                    if out_dir is not None and saved < max_saved:
+                        saved += 1
+                        save_counterexample(out_dir, saved, predicate,
+                                            minimize(predicate, polygon.points, query), query)
+
+    print('Polygons:', len(polygons), '- invalid and skipped:', invalid)
+    for predicate, (checks, shapely_mismatches, shapely_backend_mismatches, numpy_backend_mismatches) in counts.items():
+        print(f'{predicate}: {checks} checks, {shapely_mismatches} mismatches to shapely, '
+              f'{shapely_backend_mismatches} mismatches of the shapely backend, '
+              f'{numpy_backend_mismatches} mismatches of the numpy backend')
+    if out_dir is not None:
+        print('Saved counterexamples:', saved, 'in', out_dir)
+    print()
+
+    if print_throughput:
+        print('Throughput [checks per second]:')
+        for backend in [python_backend, shapely_backend, numpy_backend]:
+            results = throughput(backend, polygons, all_queries, all_segments)
+            print(f'{backend.name:>8}:', ', '.join(f'{predicate} {rate:,.0f}' for predicate, rate in results.items()))
+
+    mismatches = {predicate: checks[2] + checks[3] for predicate, checks in counts.items() if checks[2] + checks[3]}
+    assert not mismatches, f'The backends disagree with the own predicates: {mismatches}'
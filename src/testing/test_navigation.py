@@ -0,0 +1,159 @@
+import math
+import random
+
+from core.egress import exit_field, room_egress
+from core.kd_tree import KDTree
+from core.nav_graph import NavGraph
+from core.navmesh import _orientation, _Triangulation
+from core.point import Point
+from core.polygon import Polygon
+from core.room import Room
+from core.room_hierarchy import RoomHierarchy
+
+
+def corridor(length: float, width: float, x: float = 0., y: float = 0.) -> Room:
+    # a long thin room with doors at both ends and one on a side
+    return Room(Polygon([Point(x, y), Point(x + length, y), Point(x + length, y + width), Point(x, y + width)]), [],
+                [Point(x, y + width / 2), Point(x + length, y + width / 2), Point(x + length / 3, y)])
+
+
+def convex_hull(coords: list[tuple[float, float]]) -> list[int]:
+    # the indices of the corners of the convex hull, counterclockwise
+    order = sorted(range(len(coords)), key=lambda i: coords[i])
+    chains = []
+    for indices in (order, order[::-1]):
+        chain = []
+        for i in indices:
+            while len(chain) >= 2 and _orientation(coords[chain[-2]], coords[chain[-1]], coords[i]) <= 0:
+                chain.pop()
+            chain.append(i)
+        chains += chain[:-1]
+    return chains
+
+
+def test_triangulation():
+    # thin strips and points far off the origin, whose convex hull a finite enclosing triangle would not cover fully
+    rng = random.Random(0)
+    point_sets = [[(rng.uniform(0., 1000.), rng.uniform(0., 0.5)) for _ in range(300)],
+                  [(1e7 + rng.uniform(0., 10.), -3e6 + rng.uniform(0., 10.)) for _ in range(300)],
+                  [(200. * i / 40, 1e4 - math.sqrt(1e8 - (200. * i / 40 - 100.) ** 2)) for i in range(41)]]
+    for coords in point_sets:
+        triangulation = _Triangulation(coords)
+        edges = {frozenset((corners[i], corners[i - 1])) for corners in triangulation.corners for i in range(3)}
+        hull = convex_hull(coords)
+        assert all(frozenset(edge) in edges for edge in zip(hull, hull[1:] + hull[:1]))
+        assert all(triangulation.orientation(*corners) == 1 for corners in triangulation.corners)
+    print('Triangulierung:', len(point_sets), 'Punktmengen mit vollständiger konvexer Hülle')
+
+
+def test_nav_mesh(natural_distance: float, sharp_angle: float):
+    # the routes of the mesh are as long as the door distances of the visibility graph, also for thin rooms far off
+    # the origin
+    rooms = [Room.sample, lambda: corridor(1000., 2.), lambda: corridor(1000., 2., 3e7, -2e7)]
+    print()
+    for make_room in rooms:
+        room, mesh_room = make_room(), make_room()
+        room.find_paths(natural_distance, sharp_angle)
+        room.door_distance_matrix()
+        mesh = mesh_room.find_mesh(natural_distance, sharp_angle)
+        for i in range(len(room.doors)):
+            for j in range(i + 1, len(room.doors)):
+                length, path = mesh.door_route(i, j)
+                assert math.isclose(length, room.door_distance(i, j), rel_tol=1e-9)
+                assert path[0] == room.doors[i] and path[-1] == room.doors[j]
+        print('Navigation Mesh:', mesh)
+
+
+def scattered_walls(seed: int, walls: int) -> Room:
+    # a square room with thin walls at random, which leave nav_points in pockets
+    rng = random.Random(seed)
+    barriers = []
+    for _ in range(walls):
+        x, y = rng.uniform(5., 90.), rng.uniform(5., 90.)
+        w, h = rng.choice([(0.3, rng.uniform(3., 20.)), (rng.uniform(3., 20.), 0.3)])
+        barriers.append(Polygon([Point(x, y), Point(x + w, y), Point(x + w, y + h), Point(x, y + h)], False))
+    return Room(Polygon([Point(0., 0.), Point(100., 0.), Point(100., 100.), Point(0., 100.)]), barriers,
+                [Point(0., 50.), Point(100., 50.), Point(50., 0.), Point(50., 100.)])
+
+
+def walled_ring(seed: int, walls: int) -> Room:
+    # the room with scattered walls and a closed ring of walls, whose inside is apart from the doors
+    room = scattered_walls(seed, walls)
+    for x, y, w, h in [(60., 60., 20., 0.4), (60., 79.6, 20., 0.4), (60., 60., 0.4, 20.), (79.6, 60., 0.4, 20.)]:
+        room.barriers.append(Polygon([Point(x, y), Point(x + w, y), Point(x + w, y + h), Point(x, y + h)], False))
+    return room
+
+
+def test_nearest_nav_edges(natural_distance: float, sharp_angle: float):
+    # the nearest connections alone leave nav_points of these rooms apart, in pockets between the walls and inside
+    # the ring; the further search joins them wherever the full visibility graph does
+    for room in (scattered_walls(32, 25), walled_ring(5, 25)):
+        room.find_paths(natural_distance, sharp_angle, nearest=1)
+        exact = room.compute_paths(natural_distance, sharp_angle)
+        assert len(room.nav_edges) < len(exact.nav_edges)
+        reachable, _ = NavGraph.from_room(room).dijkstra({0: 0.})
+        exact_reachable, _ = NavGraph.from_room(exact).dijkstra({0: 0.})
+        assert [math.isinf(d) for d in reachable] == [math.isinf(d) for d in exact_reachable]
+        print('Nächste Nachbarn:', len(room.nav_edges), 'von', len(exact.nav_edges), 'Kanten, gleich erreichbar,',
+              sum(map(math.isinf, reachable)), 'abgetrennt')
+
+
+def test_room_hierarchy(natural_distance: float, sharp_angle: float):
+    room = Room.sample()
+    room.find_paths(natural_distance, sharp_angle)
+    hierarchy = RoomHierarchy(room, 10.)
+    graph = hierarchy.graph
+    for source in range(0, len(graph.points), 3):
+        dist, prev_edge = graph.dijkstra({source: 0.})
+        for target in range(len(graph.points)):
+            length, path = hierarchy.shortest_path(source, target)
+            assert math.isclose(length, dist[target]) or math.isinf(length) and math.isinf(dist[target])
+            if path:
+                assert path[0] == source and path[-1] == target
+                assert math.isclose(sum(math.hypot(graph.points[u].x - graph.points[v].x,
+                                                   graph.points[u].y - graph.points[v].y)
+                                        for u, v in zip(path, path[1:])), length)
+    print('Hierarchie:', hierarchy)
+
+
+def test_egress(natural_distance: float, sharp_angle: float):
+    room = Room.sample()
+    room.find_paths(natural_distance, sharp_angle)
+    room.door_distance_matrix()
+    exits = [0, 3]
+    dist, nearest = exit_field(room, exits)
+    for door in range(len(room.doors)):
+        node = len(room.nav_points) + door
+        expected = min(room.door_distance(door, e) for e in exits)
+        assert math.isclose(dist[node], expected, abs_tol=1e-9)
+        assert nearest[node] in exits and math.isclose(room.door_distance(door, nearest[node]), expected, abs_tol=1e-9)
+    summary = room_egress(room, exits, (5., 20.))
+    assert summary['worst_distance'] == max(dist[:len(room.nav_points)])
+    assert summary['unreachable'] == 0 and summary['isochrones'][5.] <= summary['isochrones'][20.]
+    print('Fluchtwege:', summary)
+
+
+def test_kd_tree(rounds: int = 20):
+    rng = random.Random(0)
+    for _ in range(rounds):
+        # rounded coordinates, so that points with the same distance or on sector borders are common
+        points = [Point(round(rng.uniform(0., 50.)), round(rng.uniform(0., 50.))) for _ in range(rng.randint(1, 200))]
+        tree = KDTree(points, leaf_size=rng.choice([1, 4, 8]))
+        query = Point(round(rng.uniform(-10., 60.)), round(rng.uniform(-10., 60.)))
+        k, sectors = rng.randint(1, 3), rng.choice([1, 4, 8])
+        found = tree.nearest_in_sectors(query, k, sectors)
+        # the k-th distance of every sector must match a brute force search, ties may be broken either way
+        width = 2 * math.pi / sectors
+        by_sector: dict[int, list[float]] = {}
+        for p in points:
+            dx, dy = p.x - query.x, p.y - query.y
+            if dx * dx + dy * dy > 0:
+                s = math.floor((math.atan2(dy, dx) % (2 * math.pi)) / width) % sectors
+                by_sector.setdefault(s, []).append(dx * dx + dy * dy)
+        found_by_sector: dict[int, list[float]] = {}
+        for i in found:
+            dx, dy = points[i].x - query.x, points[i].y - query.y
+            s = math.floor((math.atan2(dy, dx) % (2 * math.pi)) / width) % sectors
+            found_by_sector.setdefault(s, []).append(dx * dx + dy * dy)
+        assert {s: sorted(d)[:k] for s, d in by_sector.items()} == {s: sorted(d) for s, d in found_by_sector.items()}
+    print('KD-Baum:', rounds, 'Suchen wie Brute Force')
@@ -1,4 +1,12 @@
+import json
+import math
+
+from core import tiling
+from core.building import Building, Connector, Floor
+from core.point import Point
+from core.polygon import Polygon
 from core.room import Room
+from core.std_vals import door_tolerance, portal_spacing, std_tolerance
 
 
 def test_room_1(natural_distance: float, sharp_angle: float, print_for_tex=False):
@@ -21,6 +29,94 @@ def test_room_1(natural_distance: float, sharp_angle: float, print_for_tex=False
         print_for_latex(room)
 
 
+def test_building(natural_distance: float, sharp_angle: float):
+    # two floors with the sample room, and a side room next to the first one sharing its door at (50, 15)
+    side_room = Room(Polygon([Point(50., 5.), Point(60., 5.), Point(60., 25.), Point(50., 25.)]), [],
+                     [Point(50., 15.05), Point(60., 15.)])
+    lower, upper = Room.sample(), Room.sample()
+    for room in (lower, side_room, upper):
+        room.find_paths(natural_distance, sharp_angle)
+    stairs = Connector('stairs', 0, Point(40., 35.), 1, Point(40., 35.), 10.)
+    building = Building([Floor(0, [lower, side_room]), Floor(1, [upper])], [stairs])
+
+    length, route = building.route(0, 1, Point(60., 15.), 1, 0, Point(0., 30.), expand=True)
+    expected = side_room.door_distance(1, 0) + lower.door_distance(4, 3) + stairs.cost + upper.door_distance(3, 0)
+    print()
+    print('Gebäude:', building)
+    print('Route über zwei Etagen (', round(length, 4), '):\t', route, sep='')
+    assert math.isclose(length, expected)
+    assert [level for level, _ in route] == sorted(level for level, _ in route)
+
+    # the merged graph of all rooms gives the same distance as the overlay of the doors
+    graph, levels = building.flat_graph()
+    start = graph.points.index(Point(60., 15.))
+    end = next(node for node, p in enumerate(graph.points) if levels[node] == 1 and p == Point(0., 30.))
+    assert math.isclose(graph.dijkstra({start: 0.})[0][end], expected)
+
+    closure = building.close_connector(stairs)
+    assert math.isinf(building.route(0, 1, Point(60., 15.), 1, 0, Point(0., 30.))[0])
+    building.lift(closure)
+    assert math.isclose(building.route(0, 1, Point(60., 15.), 1, 0, Point(0., 30.))[0], expected)
+
+    fields = building.egress_fields([(1, Point(0., 30.))])
+    dist, exits = fields[(0, 1)]
+    assert math.isclose(dist[len(side_room.nav_points) + 1], expected) and exits[len(side_room.nav_points) + 1] == 0
+
+    # the door distances are valid JSON, and paths need predecessors
+    json.dumps(upper.paths_to_dict(), allow_nan=False)
+    try:
+        side_room.door_path(0, 1)
+        raise AssertionError('Door paths without predecessors must fail')
+    except ValueError:
+        pass
+
+    try:
+        building.close_door(0, Point(25., 25.))
+        raise AssertionError('Closing an unknown door must fail')
+    except KeyError:
+        pass
+
+
+def test_door_matching(natural_distance: float, sharp_angle: float):
+    # doors slightly off an axis-parallel wall (e.g. after a projection) still belong to it within door_tolerance
+    boundary = Polygon([Point(0., 0.), Point(20., 0.), Point(20., 10.), Point(0., 10.)])
+    room = Room(boundary, [], [Point(-door_tolerance / 2, 5.), Point(20. + door_tolerance / 2, 3.)])
+    room.find_paths(natural_distance, sharp_angle)
+    room.door_distance_matrix()
+    assert not math.isinf(room.door_distance(0, 1))
+    print()
+    print('Türen neben der Wand:', room.doors, '->', room.virtual_doors)
+
+    try:
+        Room(boundary, [], [Point(-2 * door_tolerance, 5.), Point(20., 5.)]).find_paths(natural_distance, sharp_angle)
+        raise AssertionError('Doors beyond door_tolerance must not belong to a wall')
+    except RuntimeError:
+        pass
+
+
+def test_tiled_paths(natural_distance: float, sharp_angle: float):
+    # the portals lie on the borders of the tiles, also if no nav_point lies at the corner of the virtual boundary
+    def make_room() -> Room:
+        return Room(Polygon([Point(0., 0.), Point(100., 0.), Point(100., 30.), Point(0., 30.)]),
+                    [Polygon([Point(40., 10.), Point(45., 10.), Point(45., 20.), Point(40., 20.)], False)],
+                    [Point(20., 0.), Point(80., 30.)])
+
+    exact = make_room()
+    exact.find_paths(natural_distance, sharp_angle)
+    exact.door_distance_matrix()
+    print()
+    for tile_size in (7., 10., 12.):
+        room = make_room()
+        room.find_paths(natural_distance, sharp_angle, tile_size=tile_size)
+        room.door_distance_matrix()
+        # every inner tile border is crossed at most once and adds at most one portal spacing (see `core.tiling`)
+        _, _, x_tiles, y_tiles = tiling.tile_grid(room.virtual_boundary.points, tile_size)
+        bound = exact.door_distance(0, 1) + (x_tiles - 1 + y_tiles - 1) * portal_spacing
+        assert exact.door_distance(0, 1) - std_tolerance <= room.door_distance(0, 1) <= bound
+        print('Kacheln (', tile_size, '):\t', round(room.door_distance(0, 1), 4), ' statt ',
+              round(exact.door_distance(0, 1), 4), sep='')
+
+
 def print_for_latex(room: Room):
     # some space
     print('\n')
@@ -0,0 +1,120 @@
+import io
+import json
+import math
+import os
+import pstats
+import shutil
+import tempfile
+
+from core.batch_runner import BatchRunner, run_room
+from core.edge_store import EdgeStore
+from core.point import Point
+from core.projection import LocalProjection
+from core.room import Room
+from core.room_cache import RoomCache
+from core.room_profiler import SlowRoomProfiler
+
+
+def test_room_cache(natural_distance: float, sharp_angle: float):
+    directory = tempfile.mkdtemp()
+    try:
+        cache = RoomCache(directory)
+        computed, restored = Room.sample(), Room.sample()
+        cache.find_paths(computed, natural_distance, sharp_angle)
+        cache.find_paths(restored, natural_distance, sharp_angle)
+        assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+        assert restored.nav_points == computed.nav_points
+        assert [(e.p1, e.p2) for e in restored.nav_edges] == [(e.p1, e.p2) for e in computed.nav_edges]
+
+        # other values and a memory budget; the budget does not change the key
+        budget = Room.sample()
+        cache.find_paths(budget, natural_distance, sharp_angle, memory_budget=1)
+        assert isinstance(budget.nav_edges, EdgeStore) and len(budget.nav_edges) == len(computed.nav_edges)
+        cache.find_paths(Room.sample(), 2 * natural_distance, sharp_angle)
+        assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+
+        # the least recently used result is evicted first, and a new instance sees the remaining ones
+        cache.max_size = cache.size - 1
+        cache.find_paths(Room.sample(), natural_distance, sharp_angle, nearest=4)
+        assert len(cache) == 2
+        reopened = RoomCache(directory)
+        assert reopened.get(RoomCache.key(Room.sample(), natural_distance, sharp_angle)) is None
+        assert reopened.get(RoomCache.key(Room.sample(), 2 * natural_distance, sharp_angle)) is not None
+        print()
+        print('Cache:', len(cache), 'Räume,', cache.hits, 'Treffer,', cache.misses, 'Fehlschläge')
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_projection():
+    # a room of the size of the sample room in WGS84, close to Munich
+    room = Room.sample()
+    lon0, lat0 = 11.5755, 48.1372
+    geographic = {'boundary': [[lon0 + p.x / 75000., lat0 + p.y / 111000.] for p in room.boundary.points],
+                  'barriers': [[[lon0 + p.x / 75000., lat0 + p.y / 111000.] for p in b.points] for b in room.barriers],
+                  'doors': [[lon0 + d.x / 75000., lat0 + d.y / 111000.] for d in room.doors], 'id': 'sample'}
+    projection = LocalProjection.around([geographic])
+    local = projection.project_rooms([geographic])[0]
+    back = projection.unproject_rooms([local])[0]
+    assert local['id'] == 'sample'
+    for key in ('boundary', 'doors'):
+        assert all(math.isclose(a, b, abs_tol=1e-10) for c, d in zip(geographic[key], back[key]) for a, b in zip(c, d))
+
+    # the origin is projected to (0|0), and a degree of latitude is about 111.2 km there
+    origin, north = projection.project_points([Point(projection.lon0, projection.lat0),
+                                               Point(projection.lon0, projection.lat0 + 0.01)])
+    assert math.isclose(origin.x, 0., abs_tol=1e-6) and math.isclose(origin.y, 0., abs_tol=1e-6)
+    assert math.isclose(north.y, 1112.4, abs_tol=1.) and math.isclose(north.x, 0., abs_tol=1e-6)
+    print('Projektion:', projection)
+
+
+def test_room_profiler(natural_distance: float, sharp_angle: float):
+    directory = tempfile.mkdtemp()
+    try:
+        # a fast room is sampled as well, but leaves nothing behind
+        profiler = SlowRoomProfiler(directory, 60.)
+        profiler.find_paths(Room.sample(), 'fast', natural_distance, sharp_angle)
+        assert profiler.slowest[0][1] == 'fast' and os.listdir(directory) == []
+
+        # every room is slow, and the sampled stacks are the ones of its only run
+        profiler = SlowRoomProfiler(directory, 0., interval=0.001)
+        profiler.find_paths(Room.sample(), 'sample', natural_distance, sharp_angle)
+        with open(os.path.join(directory, 'sample.stacks')) as file:
+            stacks = [line.rsplit(' ', 1) for line in file]
+        assert sum(int(count) for _, count in stacks) > 0 and any('room.py:find_paths' in s for s, _ in stacks)
+
+        # the deterministic profiler, also up to the time limit
+        profiler = SlowRoomProfiler(directory, 0., profile='cprofile')
+        profiler.find_paths(Room.sample(), 'cprofile', natural_distance, sharp_angle)
+        assert pstats.Stats(os.path.join(directory, 'cprofile.prof')).total_calls > 0
+        result = run_room('timeout', Room.sample().to_dict(), natural_distance, sharp_angle, 0.01, profiler)
+        assert result['status'] == 'timeout' and os.path.exists(os.path.join(directory, 'timeout.prof'))
+
+        # without profiling only the geometry is captured
+        profiler = SlowRoomProfiler(directory, 0., profile=None)
+        result = run_room('plain', Room.sample().to_dict(), natural_distance, sharp_angle, None, profiler)
+        assert result['capture'].endswith('plain.json')
+        assert not any(name.startswith('plain.') and name != 'plain.json' for name in os.listdir(directory))
+        with open(result['capture']) as file:
+            assert Room.from_dict(json.load(file)['room']).doors == Room.sample().doors
+        print('Profiler:', sorted(os.listdir(directory)))
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_batch_runner(natural_distance: float, sharp_angle: float):
+    directory = tempfile.mkdtemp()
+    try:
+        # the capture of the room with the overlong id fails outside of its path finding, which only fails that room
+        rooms = [('sample', Room.sample().to_dict()), ('x' * 300, Room.sample().to_dict()),
+                 ('other', Room.sample().to_dict())]
+        for workers in (1, 2):
+            output = io.StringIO()
+            runner = BatchRunner(natural_distance, sharp_angle, workers, None, SlowRoomProfiler(directory, 0.))
+            summary = runner.run(rooms, output, progress=None)
+            assert summary == {'ok': 2, 'timeout': 0, 'error': 1}
+            results = {result['id']: result for result in map(json.loads, output.getvalue().splitlines())}
+            assert results['x' * 300]['status'] == 'error' and results['sample']['status'] == 'ok'
+        print('Batch:', summary)
+    finally:
+        shutil.rmtree(directory)